@@ -0,0 +1,163 @@
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+import json
+import logging
+import queue
+import threading
+import time
+
+from database import write_session
+from models import AuditLog
+from events import publish_change
+from config import settings
+from metrics import CallbackMetric, audit_flush_duration, audit_write_delay
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class AuditWriter:
+    """
+    Background audit pipeline
+
+    Requests enqueue audit events into a bounded queue and return immediately.
+    A writer thread flushes them in one transaction per batch, every
+    `flush_interval_ms` or as soon as `batch_size` events are waiting.
+    Events are dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, queue_size: int = 10000, batch_size: int = 500, flush_interval_ms: int = 200):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+        self.enqueued_total = 0
+        self.dropped_total = 0
+        self.written_total = 0
+        self.failed_total = 0
+        self.flushes_total = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Flush everything still queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, user_id: Optional[int] = None, action: str = "", resource_type: str = "",
+                resource_id: Optional[int] = None, details: Optional[dict] = None,
+                ip_address: Optional[str] = None) -> bool:
+        """Queue an audit event; returns False if it had to be dropped"""
+        event = {
+            "user_id": user_id,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "details": json.dumps(details) if details else None,
+            "ip_address": ip_address,
+            "timestamp": datetime.utcnow()
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped_total += 1
+            return False
+        self.enqueued_total += 1
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._flush(batch)
+
+        # Drain events that arrived while stopping
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for start in range(0, len(batch), self.batch_size):
+            self._flush(batch[start:start + self.batch_size])
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        """Insert a batch of events in a single transaction"""
+        start_time = time.perf_counter()
+        rows = [AuditLog(**event) for event in batch]
+        try:
+            # Keep attributes loaded after commit so the change feed needs no refresh queries
+            with write_session(expire_on_commit=False) as db:
+                db.add_all(rows)
+        except Exception as e:
+            self.failed_total += len(batch)
+            logger.error(f"Failed to write {len(batch)} audit events: {str(e)}")
+            return
+
+        self.written_total += len(batch)
+        self.flushes_total += 1
+        self.last_flush_seconds = time.perf_counter() - start_time
+        audit_flush_duration.observe(self.last_flush_seconds)
+        audit_write_delay.observe((datetime.utcnow() - batch[0]["timestamp"]).total_seconds())
+        for row in rows:
+            publish_change("audit", "created", row)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and write/drop counters"""
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued_total": self.enqueued_total,
+            "dropped_total": self.dropped_total,
+            "written_total": self.written_total,
+            "failed_total": self.failed_total,
+            "flushes_total": self.flushes_total,
+            "last_flush_seconds": round(self.last_flush_seconds, 4)
+        }
+
+# Global audit writer instance
+audit_writer = AuditWriter(
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS
+)
+
+# Read on every /metrics scrape
+CallbackMetric("audit_queue_depth", "Audit events waiting to be written", lambda: audit_writer._queue.qsize())
+CallbackMetric("audit_events_dropped_total", "Audit events dropped because the queue was full",
+               lambda: audit_writer.dropped_total, kind="counter")
+CallbackMetric("audit_events_failed_total", "Audit events lost to failed writes",
+               lambda: audit_writer.failed_total, kind="counter")
@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import func, select
+
+from config import settings
+from database import engine, write_session
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# audit-<YYYY-MM>-<first id>.jsonl.gz: one part per archival run that touched the month
+ARCHIVE_NAME = re.compile(r"^audit-(\d{4})-(\d{2})-(\d+)\.jsonl\.gz$")
+# Rows deleted per write transaction, so the audit writer is never held up for long
+DELETE_BATCH_SIZE = 5000
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def next_month(moment: datetime) -> datetime:
+    return month_start(month_start(moment) + timedelta(days=32))
+
+class AuditArchive:
+    """
+    Monthly buckets of audit events: rows in `audit_logs`, older months as gzipped JSONL files
+
+    `archive()` moves every month that lies entirely before the retention
+    cutoff out of the table: the month is written to a new part file
+    (written to a temporary name and renamed, then fsynced) before its rows
+    are deleted in small transactions. A run interrupted between the two
+    leaves rows that the next run archives again; readers skip those
+    duplicates, as a month's parts and their rows are in id order.
+    """
+
+    def __init__(self, directory: str, retention_days: int = 0, archive_retention_days: int = 0):
+        self.directory = Path(directory)
+        self.retention_days = retention_days
+        self.archive_retention_days = archive_retention_days
+
+    def archive(self, now: Optional[datetime] = None) -> int:
+        """Archive and delete whole months older than the retention period; returns the rows moved"""
+        if self.retention_days <= 0:
+            return 0
+        now = now or datetime.utcnow()
+        boundary = month_start(now - timedelta(days=self.retention_days))
+        moved = 0
+        month = None
+        while True:
+            # Each pass starts after the previous month, so rows the month's range missed cannot stall it
+            statement = select(func.min(AuditLog.timestamp))
+            if month is not None:
+                statement = statement.where(AuditLog.timestamp >= next_month(month))
+            with engine.connect() as connection:
+                oldest = connection.execute(statement).scalar()
+            if oldest is None or oldest >= boundary:
+                break
+            month = month_start(oldest)
+            moved += self._archive_month(month)
+        self._remove_expired_archives(now)
+        if moved:
+            self._reclaim_space()
+            logger.info(f"Archived {moved} audit events older than {boundary:%Y-%m-%d}")
+        return moved
+
+    def _archive_month(self, month: datetime) -> int:
+        in_month = (AuditLog.timestamp >= month, AuditLog.timestamp < next_month(month))
+        with engine.connect() as connection:
+            first_id, last_id = connection.execute(
+                select(func.min(AuditLog.id), func.max(AuditLog.id)).where(*in_month)
+            ).one()
+        if first_id is None:
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"audit-{month:%Y-%m}-{first_id}.jsonl.gz"
+        temp_path = path.with_name(path.name + ".tmp")
+
+        written = 0
+        with gzip.open(temp_path, "wt", encoding="utf-8") as archive:
+            with engine.connect() as connection:
+                rows = connection.execution_options(yield_per=1000).execute(
+                    select(AuditLog.__table__).where(*in_month, AuditLog.id <= last_id).order_by(AuditLog.id)
+                )
+                for row in rows.mappings():
+                    archive.write(json.dumps(_serialize(row)) + "\n")
+                    written += 1
+        with open(temp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        # Rows are gone only after the part holding them is on disk
+        while True:
+            with write_session() as db:
+                ids = db.execute(
+                    select(AuditLog.id).where(*in_month, AuditLog.id <= last_id).limit(DELETE_BATCH_SIZE)
+                ).scalars().all()
+                if ids:
+                    db.execute(AuditLog.__table__.delete().where(AuditLog.id.in_(ids)))
+            if len(ids) < DELETE_BATCH_SIZE:
+                break
+        return written
+
+    def _remove_expired_archives(self, now: datetime):
+        if self.archive_retention_days <= 0 or not self.directory.is_dir():
+            return
+        cutoff = month_start(now - timedelta(days=self.archive_retention_days))
+        for part in self.parts():
+            # A month is only removed once all of it is past the cutoff
+            if next_month(part["month"]) <= cutoff:
+                part["path"].unlink(missing_ok=True)
+                logger.info(f"Removed expired audit archive {part['path'].name}")
+
+    def _reclaim_space(self):
+        # Only databases created with auto_vacuum=INCREMENTAL can hand pages back without a full VACUUM
+        if engine.dialect.name != "sqlite":
+            return
+        with engine.connect() as connection:
+            if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+                connection.exec_driver_sql("PRAGMA incremental_vacuum")
+
+    def parts(self) -> List[Dict[str, Any]]:
+        """Archive part files, oldest first"""
+        parts = []
+        if not self.directory.is_dir():
+            return parts
+        for path in self.directory.iterdir():
+            match = ARCHIVE_NAME.match(path.name)
+            if match:
+                year, month, first_id = (int(group) for group in match.groups())
+                parts.append({"month": datetime(year, month, 1), "first_id": first_id, "path": path})
+        parts.sort(key=lambda part: (part["month"], part["first_id"]))
+        return parts
+
+    def months(self) -> List[Dict[str, Any]]:
+        """Archived months with their part count and compressed size"""
+        months: Dict[datetime, Dict[str, Any]] = {}
+        for part in self.parts():
+            entry = months.setdefault(part["month"], {"month": f"{part['month']:%Y-%m}", "parts": 0, "bytes": 0})
+            entry["parts"] += 1
+            entry["bytes"] += part["path"].stat().st_size
+        return list(months.values())
+
+    def read(self, since: Optional[datetime] = None, until: Optional[datetime] = None, user_id: Optional[int] = None,
+             resource_type: Optional[str] = None, after: Optional[Tuple[datetime, int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Archived events month by month, in id order within a month, optionally filtered
+
+        Only the parts of months overlapping [since, until) are opened. `after`
+        is the (timestamp, id) of the last event already returned; parts that
+        end before it are skipped without being opened.
+        """
+        after_month, after_id = (month_start(after[0]), after[1]) if after else (None, 0)
+        months: Dict[datetime, List[Dict[str, Any]]] = {}
+        for part in self.parts():
+            month = part["month"]
+            if since is not None and next_month(month) <= since or until is not None and month >= until:
+                continue
+            if after_month is not None and month < after_month:
+                continue
+            months.setdefault(month, []).append(part)
+
+        for month, parts in months.items():
+            # Ids only increase within a month; anything not above the last one is a duplicate
+            last_id = after_id if month == after_month else 0
+            for index, part in enumerate(parts):
+                following = parts[index + 1]["first_id"] if index + 1 < len(parts) else None
+                if following is not None and following <= last_id + 1:
+                    continue
+                for event in _read_part(part["path"]):
+                    if event["id"] <= last_id:
+                        continue
+                    last_id = event["id"]
+                    timestamp = datetime.fromisoformat(event["timestamp"])
+                    if since is not None and timestamp < since or until is not None and timestamp >= until:
+                        continue
+                    if user_id and event["user_id"] != user_id:
+                        continue
+                    if resource_type and event["resource_type"] != resource_type:
+                        continue
+                    yield {**event, "timestamp": timestamp}
+
+def _serialize(row) -> Dict[str, Any]:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+def _read_part(path: Path) -> Iterator[Dict[str, Any]]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                yield json.loads(line)
+    except FileNotFoundError:
+        pass  # removed by retention meanwhile
+    except (OSError, EOFError, ValueError) as e:
+        logger.warning(f"Audit archive {path.name} is damaged, skipping the rest of it: {str(e)}")
+
+# Global archive instance
+audit_archive = AuditArchive(
+    directory=settings.AUDIT_ARCHIVE_DIR,
+    retention_days=settings.AUDIT_RETENTION_DAYS,
+    archive_retention_days=settings.AUDIT_ARCHIVE_RETENTION_DAYS
+)
+
+def archive_audit_logs() -> int:
+    """Scheduled job: move expired audit months to the archive"""
+    start_time = time.perf_counter()
+    try:
+        moved = audit_archive.archive()
+    except Exception as e:
+        logger.error(f"Audit archival failed: {str(e)}")
+        return 0
+    if moved:
+        logger.info(f"Audit archival took {time.perf_counter() - start_time:.1f}s")
+    return moved
@@ -3,22 +3,42 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-import crud
-from database import get_db
-from schemas import TokenData
+import async_crud
+from database import get_async_db, AsyncSessionLocal
+from schemas import TokenData, User
+from cache import principal_cache
+from passwords import pwd_context, hasher
 from config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    """
+    Check credentials with bcrypt running in the password process pool
+
+    If the stored hash was made with outdated parameters it is transparently
+    replaced by a fresh one.
+    """
+    user = await async_crud.get_user_by_email(db, email=email)
+    if not user:
+        return None
+    # Keep the loaded user but give the pooled connection back while bcrypt runs
+    db.expunge(user)
+    await db.rollback()
+    valid, new_hash = await hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        await async_crud.update_user_password_hash(db, user.id, new_hash)
+    return user
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -30,21 +50,61 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_subject(token: str) -> Optional[str]:
+    """Verify a JWT and return its subject (the user's email), or None if invalid"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+async def get_principal(email: str, db: Optional[AsyncSession] = None) -> Optional[User]:
+    """
+    Return the authenticated user for an email, from the principal cache when possible
+
+    A session is only opened (or used) on a cache miss.
+    """
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    if db is None:
+        async with AsyncSessionLocal() as db:
+            user = await async_crud.get_user_by_email(db, email=email)
+    else:
+        user = await async_crud.get_user_by_email(db, email=email)
+    if user is None:
+        return None
+    principal = User.model_validate(user)
+    principal_cache.set(email, principal)
+    return principal
+
+async def _authenticate(token: Optional[str], db: Optional[AsyncSession] = None) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+    email = decode_subject(token) if token else None
+    if email is None:
         raise credentials_exception
-    user = crud.get_user_by_email(db, email=token_data.email)
+    token_data = TokenData(email=email)
+    user = await get_principal(token_data.email, db)
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await _authenticate(token, db)
+
+async def get_stream_user(request: Request, token: Optional[str] = None):
+    """
+    Authenticate a long-lived stream
+
+    Browsers' EventSource cannot send headers, so the token may also be passed
+    as a `token` query parameter. No session is held for the lifetime of the stream.
+    """
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.startswith("Bearer "):
+        token = auth_header[7:]
+    return await _authenticate(token)
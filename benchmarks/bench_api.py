@@ -0,0 +1,143 @@
+"""
+API throughput benchmark
+
+Measures requests per second and latency percentiles of the authenticated
+list endpoints against seeded tables, then the cost of the audit middleware:
+the same cheap authenticated request with and without the middleware installed.
+
+    python -m benchmarks.bench_api --requests 2000 --concurrency 16 --rows 10000
+"""
+import argparse
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database, percentiles, write_results
+
+LIST_ENDPOINTS = ["/agents/", "/scripts/", "/tasks/", "/audit/"]
+
+def seed(rows: int):
+    """Insert `rows` agents, scripts, completed tasks and audit logs"""
+    import hashlib
+
+    from database import engine
+    from models import Agent, AuditLog, Script, ScriptContent, Task
+
+    now = datetime.utcnow()
+    content = "print('hello')\n"
+    content_hash = hashlib.sha256(content.encode()).hexdigest()
+    with engine.begin() as connection:
+        connection.execute(ScriptContent.__table__.insert(),
+                           [{"hash": content_hash, "content": content, "size": len(content), "created_at": now}])
+        connection.execute(Agent.__table__.insert(), [
+            {"name": f"agent {i}", "description": "benchmark agent", "status": "active"} for i in range(rows)
+        ])
+        connection.execute(Script.__table__.insert(), [
+            {"name": f"script {i}", "description": "benchmark script", "content_hash": content_hash,
+             "filename": f"script_{i}.py", "updated_at": now} for i in range(rows)
+        ])
+        connection.execute(Task.__table__.insert(), [
+            {"name": f"task {i}", "description": "", "script_id": i + 1, "agent_id": i + 1, "status": "completed",
+             "created_at": now, "updated_at": now} for i in range(rows)
+        ])
+        connection.execute(AuditLog.__table__.insert(), [
+            {"action": "GET /tasks/", "resource_type": "api", "timestamp": now - timedelta(seconds=i),
+             "details": '{"method": "GET", "path": "/tasks/", "status_code": 200}', "ip_address": "127.0.0.1"}
+            for i in range(rows)
+        ])
+
+async def load(client, path: str, headers: dict, requests: int, concurrency: int) -> dict:
+    """Send `requests` GETs with at most `concurrency` in flight"""
+    latencies = []
+    failures = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def get():
+        nonlocal failures
+        async with slots:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(get() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 2),
+        "latency": percentiles(latencies)
+    }
+
+@contextmanager
+def without_middleware(app, dispatch):
+    """Remove an @app.middleware function for the duration; Starlette rebuilds the stack on the next request"""
+    installed = app.user_middleware
+    app.user_middleware = [m for m in installed if m.kwargs.get("dispatch") is not dispatch]
+    app.middleware_stack = None
+    try:
+        yield
+    finally:
+        app.user_middleware = installed
+        app.middleware_stack = None
+
+async def run(args) -> dict:
+    import httpx
+
+    import auth
+    import crud
+    import main
+    from database import SessionLocal
+    from schemas import UserCreate
+
+    seed(args.rows)
+    db = SessionLocal()
+    crud.create_user(db, UserCreate(email="bench@example.com", password="bench-password"))
+    db.close()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'bench@example.com'})}"}
+
+    results = {"rows": args.rows, "concurrency": args.concurrency, "endpoints": {}}
+    await main.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for path in LIST_ENDPOINTS:
+                # Warm the connection pool and principal cache
+                await load(client, path, headers, args.concurrency, args.concurrency)
+                results["endpoints"][path] = await load(client, path, headers, args.requests, args.concurrency)
+
+            # Audit middleware overhead on a request that does little else
+            with_audit = await load(client, "/users/me/", headers, args.requests, args.concurrency)
+            with without_middleware(main.app, main.audit_middleware):
+                await load(client, "/users/me/", headers, args.concurrency, args.concurrency)
+                without_audit = await load(client, "/users/me/", headers, args.requests, args.concurrency)
+    finally:
+        await main.shutdown_event()
+
+    overhead = 1 / with_audit["requests_per_second"] - 1 / without_audit["requests_per_second"]
+    results["audit_middleware"] = {
+        "path": "/users/me/",
+        "with_middleware": with_audit,
+        "without_middleware": without_audit,
+        "overhead_us_per_request": round(overhead * 1e6, 1),
+        "overhead_percent": round(overhead * without_audit["requests_per_second"] * 100, 1)
+    }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=10000, help="rows seeded per table")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    use_temp_database()
+    write_results("api", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
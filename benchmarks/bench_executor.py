@@ -0,0 +1,79 @@
+"""
+Script executor benchmark
+
+Runs a short script through execute_script from concurrent threads, as the
+execution engine does, and reports runs per second and latency percentiles
+for the warm worker pool and for fresh interpreters.
+
+    python -m benchmarks.bench_executor --runs 500 --concurrency 8
+"""
+import argparse
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_temp_database, percentiles, write_results
+
+SCRIPT = "total = sum(i * i for i in range(10000))\nprint(total)\n"
+
+def measure(executor, runs: int, concurrency: int) -> dict:
+    content_hash = hashlib.sha256(SCRIPT.encode()).hexdigest()
+    latencies = []
+    failures = 0
+
+    def execute(_):
+        nonlocal failures
+        started = time.perf_counter()
+        result = executor.execute_script(SCRIPT, "bench.py", content_hash=content_hash)
+        latencies.append(time.perf_counter() - started)
+        if not result["success"]:
+            failures += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        # Warm up: start the interpreters and fill the bytecode cache
+        list(threads.map(execute, range(concurrency)))
+        latencies.clear()
+        failures = 0
+        start = time.perf_counter()
+        list(threads.map(execute, range(runs)))
+        elapsed = time.perf_counter() - start
+    return {
+        "runs": runs,
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "runs_per_second": round(runs / elapsed, 2),
+        "latency": percentiles(latencies)
+    }
+
+def run(args) -> dict:
+    from config import settings
+    from executor import ScriptExecutor
+
+    results = {"concurrency": args.concurrency, "modes": {}}
+    for mode in args.modes:
+        executor = ScriptExecutor(
+            memory_limit=settings.EXECUTOR_MEMORY_LIMIT_MB * 1024 * 1024,
+            pool_size=args.concurrency if mode == "worker" else 0,
+            pool_max_runs=settings.EXECUTOR_POOL_MAX_RUNS,
+            bytecode_cache_dir=settings.BYTECODE_CACHE_DIR
+        )
+        try:
+            results["modes"][mode] = measure(executor, args.runs, args.concurrency)
+        finally:
+            executor.stop_pool()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=500, help="script runs per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads calling execute_script")
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=["worker", "cold"],
+                        help="comma-separated: worker (warm pool) and/or cold (fresh interpreter per run)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    use_temp_database()
+    write_results("executor", run(args), args.output)
+
+if __name__ == "__main__":
+    main()
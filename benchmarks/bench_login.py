@@ -0,0 +1,92 @@
+"""
+Login throughput benchmark
+
+Measures /token logins per second through the password process pool and
+divides by the number of pool workers, next to the single-thread bcrypt
+verify rate as a baseline.
+
+    python -m benchmarks.bench_login --logins 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import use_temp_database, percentiles, write_results
+
+async def run(args) -> dict:
+    import httpx
+
+    import main
+    import crud
+    from database import SessionLocal
+    from passwords import pwd_context, hasher
+    from schemas import UserCreate
+
+    db = SessionLocal()
+    crud.create_user(db, UserCreate(email="bench@example.com", password="bench-password"))
+    stored_hash = crud.get_user_by_email(db, "bench@example.com").hashed_password
+    db.close()
+
+    # Baseline: synchronous verify on one core
+    start = time.perf_counter()
+    for _ in range(args.baseline):
+        pwd_context.verify("bench-password", stored_hash)
+    baseline_rate = args.baseline / (time.perf_counter() - start)
+
+    await main.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            form = {"username": "bench@example.com", "password": "bench-password"}
+            # Warm the worker processes
+            await asyncio.gather(*(client.post("/token", data=form) for _ in range(hasher.workers)))
+
+            latencies = []
+            failures = 0
+            slots = asyncio.Semaphore(args.concurrency)
+
+            async def login():
+                nonlocal failures
+                async with slots:
+                    started = time.perf_counter()
+                    response = await client.post("/token", data=form)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        failures += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(login() for _ in range(args.logins)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await main.shutdown_event()
+
+    throughput = args.logins / elapsed
+    return {
+        "bcrypt_rounds": int(os.environ["BCRYPT_ROUNDS"]),
+        "pool_workers": hasher.workers,
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(throughput, 2),
+        "logins_per_second_per_core": round(throughput / hasher.workers, 2),
+        "single_thread_verify_per_second": round(baseline_rate, 2),
+        "latency": percentiles(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--baseline", type=int, default=20, help="single-thread verifies for the baseline")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    use_temp_database()
+    write_results("login", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Scheduler firing accuracy benchmark
+
+Schedules one-shot tasks spread evenly over a window, starts the scheduler
+(importing them into the job store) and records how late each one starts
+against its scheduled time. Task execution is replaced by a stub, so the
+numbers are the scheduler's own: job store lookups, removal of fired jobs
+and event loop delay.
+
+    python -m benchmarks.bench_scheduler_firing --jobs 10000 --window 10
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import use_temp_database, percentiles, write_results
+
+# Scheduled time per task id, and the start delay of each fired task
+_scheduled = {}
+_lags = []
+
+async def record_start(task_id: int, admission=None):
+    """Stands in for scheduler.execute_task"""
+    _lags.append((datetime.now(timezone.utc) - _scheduled[task_id]).total_seconds())
+
+def add_tasks(jobs: int, first: datetime, window: float):
+    """Insert pending tasks from `first` to `first` + `window`, evenly spaced"""
+    from database import engine
+    from models import Task
+
+    step = window / jobs
+    rows = []
+    for i in range(jobs):
+        run_at = first + timedelta(seconds=i * step)
+        _scheduled[i + 1] = run_at.replace(tzinfo=timezone.utc)
+        rows.append({"id": i + 1, "name": f"task {i}", "description": "", "script_id": 1, "agent_id": 1,
+                     "status": "pending", "scheduled_time": run_at, "created_at": first, "updated_at": first})
+    with engine.begin() as connection:
+        for offset in range(0, len(rows), 10000):
+            connection.execute(Task.__table__.insert(), rows[offset:offset + 10000])
+
+async def run(args) -> dict:
+    from apscheduler.events import EVENT_JOB_MISSED
+
+    from database import engine
+    from models import Base
+    import scheduler
+
+    Base.metadata.create_all(bind=engine)
+    # Jobs created from here on call the stub
+    scheduler.execute_task = record_start
+    first = datetime.utcnow() + timedelta(seconds=args.lead)
+    add_tasks(args.jobs, first, args.window)
+
+    missed = 0
+
+    def on_missed(event):
+        nonlocal missed
+        if event.job_id.startswith("task_"):
+            missed += 1
+
+    scheduler.scheduler.add_listener(on_missed, EVENT_JOB_MISSED)
+    started = time.perf_counter()
+    scheduler.start_scheduler()
+    import_seconds = time.perf_counter() - started
+    if datetime.utcnow() > first:
+        print(f"warning: the import took longer than --lead ({import_seconds:.1f}s); early tasks start late", file=sys.stderr)
+
+    deadline = time.monotonic() + args.lead + args.window + args.timeout
+    while len(_lags) + missed < args.jobs and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    scheduler.scheduler.shutdown(wait=False)
+    await asyncio.sleep(0)
+
+    return {
+        "jobs": args.jobs,
+        "window_seconds": args.window,
+        "scheduled_per_second": round(args.jobs / args.window, 2),
+        "import_seconds": round(import_seconds, 3),
+        "fired": len(_lags),
+        "missed": missed,
+        "not_fired": args.jobs - len(_lags) - missed,
+        "lag": percentiles(_lags)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--window", type=float, default=10, help="seconds over which the run times are spread")
+    parser.add_argument("--lead", type=float, default=5, help="seconds from start-up to the first run time")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for stragglers after the window")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    use_temp_database()
+    write_results("scheduler_firing", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
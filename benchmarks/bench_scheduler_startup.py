@@ -0,0 +1,86 @@
+"""
+Scheduler startup benchmark
+
+For each task count, measures the first start (bulk import of pending
+scheduled tasks into the persistent job store) and a restart with the jobs
+already stored. Restart time should stay flat as the number of tasks grows.
+
+    python -m benchmarks.bench_scheduler_startup --tasks 1000,10000,100000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database, write_results
+
+def add_tasks(count: int, start_id: int):
+    """Insert pending tasks scheduled a day ahead"""
+    from database import engine
+    from models import Task
+
+    run_at = datetime.utcnow() + timedelta(days=1)
+    rows = [
+        {"name": f"task {i}", "description": "", "script_id": 1, "agent_id": 1, "status": "pending",
+         "scheduled_time": run_at + timedelta(seconds=i), "created_at": run_at, "updated_at": run_at}
+        for i in range(start_id, start_id + count)
+    ]
+    with engine.begin() as connection:
+        for offset in range(0, len(rows), 10000):
+            connection.execute(Task.__table__.insert(), rows[offset:offset + 10000])
+
+async def measure_start() -> float:
+    import scheduler
+
+    started = time.perf_counter()
+    scheduler.start_scheduler()
+    # Let the first wakeup (next run time lookup) happen
+    await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    # AsyncIOScheduler shuts down on its next loop iteration
+    scheduler.scheduler.shutdown(wait=False)
+    await asyncio.sleep(0)
+    return elapsed
+
+async def run(args) -> dict:
+    from sqlalchemy import func, select
+
+    from database import engine
+    from models import Base
+    import scheduler
+
+    Base.metadata.create_all(bind=engine)
+    scheduler.jobstore.jobs_t.create(bind=engine, checkfirst=True)
+    results = {}
+    total = 0
+    for count in args.tasks:
+        add_tasks(count - total, total)
+        total = count
+        # Force the import path by emptying the job store
+        with engine.begin() as connection:
+            connection.execute(scheduler.jobstore.jobs_t.delete())
+
+        first_start = await measure_start()
+        restarts = [await measure_start() for _ in range(args.restarts)]
+        with engine.connect() as connection:
+            stored = connection.execute(select(func.count()).select_from(scheduler.jobstore.jobs_t)).scalar()
+        results[str(count)] = {
+            "first_start_seconds": round(first_start, 3),
+            "restart_seconds": round(min(restarts), 4),
+            "stored_jobs": stored
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", default="1000,10000,100000", help="comma-separated task counts")
+    parser.add_argument("--restarts", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    args.tasks = sorted(int(n) for n in args.tasks.split(","))
+
+    use_temp_database()
+    write_results("scheduler_startup", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
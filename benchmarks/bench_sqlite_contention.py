@@ -0,0 +1,160 @@
+"""
+SQLite write contention benchmark
+
+Runs concurrent task-status writers, batched audit writers and list readers
+against a fresh database for each configuration and reports throughput,
+"database is locked" errors and write latency. Configurations:
+
+  default                 rollback journal, SQLite defaults, unserialized writes
+  performance             WAL profile from database.py, unserialized writes
+  performance+serialized  WAL profile, writes through database.write_session()
+
+    python -m benchmarks.bench_sqlite_contention --seconds 5 --writers 8
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.common import use_temp_database, percentiles, write_results
+
+CONFIGURATIONS = (
+    ("default", "default", False),
+    ("performance", "performance", False),
+    ("performance+serialized", "performance", True),
+)
+
+def run_configuration(args, directory: str, profile: str, serialized: bool) -> dict:
+    from sqlalchemy.exc import OperationalError
+
+    import crud
+    import database
+    from models import Base, Task, AuditLog
+
+    path = os.path.join(directory, f"contention-{profile}-{int(serialized)}.db")
+    engine = database.create_db_engine(f"sqlite:///{path}", profile=profile)
+    # Point the app's sessions (and write_session) at this configuration's engine
+    database.SessionLocal.configure(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with database.write_session() as db:
+        db.add_all([Task(name=f"task {i}", description="", script_id=1, agent_id=1) for i in range(args.tasks)])
+
+    counters = {"status_updates": 0, "audit_rows": 0, "reads": 0, "locked_errors": 0, "other_errors": 0}
+    write_latencies = []
+    read_latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.seconds
+
+    def record(counter: str, amount: int, latencies: list, elapsed: float):
+        with lock:
+            counters[counter] += amount
+            latencies.append(elapsed)
+
+    def guarded(operation):
+        try:
+            operation()
+        except OperationalError as e:
+            with lock:
+                counters["locked_errors" if "locked" in str(e) else "other_errors"] += 1
+
+    def status_writer(worker: int):
+        i = 0
+        while time.perf_counter() < stop_at:
+            task_id = (worker * 7919 + i) % args.tasks + 1
+            i += 1
+
+            def update():
+                started = time.perf_counter()
+                if serialized:
+                    with database.write_session() as db:
+                        crud.update_task(db, task_id, {"status": "running" if i % 2 else "completed"})
+                else:
+                    db = database.SessionLocal()
+                    try:
+                        crud.update_task(db, task_id, {"status": "running" if i % 2 else "completed"})
+                    finally:
+                        db.close()
+                record("status_updates", 1, write_latencies, time.perf_counter() - started)
+
+            guarded(update)
+
+    def audit_writer():
+        while time.perf_counter() < stop_at:
+            def insert():
+                started = time.perf_counter()
+                rows = [AuditLog(action="execute", resource_type="task", resource_id=n, timestamp=datetime.utcnow())
+                        for n in range(args.audit_batch)]
+                if serialized:
+                    with database.write_session() as db:
+                        db.add_all(rows)
+                else:
+                    db = database.SessionLocal()
+                    try:
+                        db.add_all(rows)
+                        db.commit()
+                    finally:
+                        db.close()
+                record("audit_rows", len(rows), write_latencies, time.perf_counter() - started)
+
+            guarded(insert)
+            time.sleep(args.audit_interval)
+
+    def reader():
+        while time.perf_counter() < stop_at:
+            def read():
+                started = time.perf_counter()
+                db = database.SessionLocal()
+                try:
+                    crud.get_audit_logs(db, limit=100)
+                    crud.get_tasks(db, limit=100)
+                finally:
+                    db.close()
+                record("reads", 1, read_latencies, time.perf_counter() - started)
+
+            guarded(read)
+
+    threads = [threading.Thread(target=status_writer, args=(n,)) for n in range(args.writers)]
+    threads.append(threading.Thread(target=audit_writer))
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    return {
+        **counters,
+        "seconds": round(elapsed, 3),
+        "status_updates_per_second": round(counters["status_updates"] / elapsed, 1),
+        "audit_rows_per_second": round(counters["audit_rows"] / elapsed, 1),
+        "reads_per_second": round(counters["reads"] / elapsed, 1),
+        "write_latency": percentiles(write_latencies),
+        "read_latency": percentiles(read_latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=8, help="task status writer threads")
+    parser.add_argument("--readers", type=int, default=4, help="list reader threads")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--audit-batch", type=int, default=200, help="rows per audit batch")
+    parser.add_argument("--audit-interval", type=float, default=0.05, help="seconds between audit batches")
+    parser.add_argument("--only", choices=[name for name, _, _ in CONFIGURATIONS], help="run a single configuration")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    directory = use_temp_database()
+    results = {}
+    for name, profile, serialized in CONFIGURATIONS:
+        if args.only and args.only != name:
+            continue
+        results[name] = run_configuration(args, directory, profile, serialized)
+    write_results("sqlite_contention", results, args.output)
+
+if __name__ == "__main__":
+    main()
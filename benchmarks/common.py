@@ -0,0 +1,57 @@
+from typing import Dict, Any, List, Optional
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+
+def use_temp_database() -> str:
+    """
+    Point the app at a fresh SQLite file
+
+    Must be called before any app module is imported, since the engine is
+    created from settings at import time.
+    """
+    directory = tempfile.mkdtemp(prefix="automa-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+    os.environ.setdefault("RUN_OUTPUT_DIR", os.path.join(directory, "run_output"))
+    os.environ.setdefault("BYTECODE_CACHE_DIR", os.path.join(directory, "bytecode_cache"))
+    # Benchmarks are run from the project root
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    return directory
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and max of latency samples, in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+def write_results(name: str, results: Dict[str, Any], output: Optional[str] = None) -> Dict[str, Any]:
+    """Print benchmark results as JSON and optionally write them to a file"""
+    report = {
+        "benchmark": name,
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return report
@@ -0,0 +1,54 @@
+"""
+Compare two benchmark reports
+
+Prints every numeric result present in both reports (single benchmark or
+suite) with the relative change from the baseline. Whether higher is better
+depends on the metric: throughput should rise, latencies should fall.
+
+    python -m benchmarks.compare baseline.json results.json
+"""
+import argparse
+import json
+from typing import Dict, Iterator, Tuple
+
+def numeric_results(value, path: str = "") -> Iterator[Tuple[str, float]]:
+    """(dotted path, value) for each number in a report's results"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from numeric_results(item, f"{path}.{key}" if path else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path, value
+
+def load_results(filename: str) -> Dict[str, float]:
+    with open(filename) as f:
+        report = json.load(f)
+    results = report["results"]
+    if report["benchmark"] == "suite":
+        results = {name: sub.get("results", {}) for name, sub in results["benchmarks"].items()}
+    return dict(numeric_results(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument("--threshold", type=float, default=0, help="only show changes of at least this many percent")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    results = load_results(args.results)
+    rows = []
+    for path, before in baseline.items():
+        if path not in results:
+            continue
+        after = results[path]
+        change = (after - before) / before * 100 if before else 0.0
+        if abs(change) >= args.threshold:
+            rows.append((path, before, after, change))
+
+    width = max((len(path) for path, *_ in rows), default=6)
+    print(f"{'metric':<{width}}  {'baseline':>12}  {'results':>12}  {'change':>8}")
+    for path, before, after, change in rows:
+        print(f"{path:<{width}}  {before:>12g}  {after:>12g}  {change:>+7.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark suite
+
+Runs each benchmark in its own process (each needs a fresh database and
+settings read at import) and combines their reports into one JSON document,
+to be compared with benchmarks.compare.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --quick --only api,executor
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import write_results
+
+# Arguments per benchmark: full run, then --quick for a smoke check
+SUITE = {
+    "api": ("benchmarks.bench_api", [], ["--requests", "300", "--rows", "1000"]),
+    "executor": ("benchmarks.bench_executor", [], ["--runs", "50"]),
+    "scheduler_firing": ("benchmarks.bench_scheduler_firing", [], ["--jobs", "1000", "--window", "2", "--lead", "2"]),
+    "scheduler_startup": ("benchmarks.bench_scheduler_startup", ["--tasks", "1000,10000"], ["--tasks", "1000"]),
+    "login": ("benchmarks.bench_login", [], ["--logins", "50", "--rounds", "4"]),
+    "sqlite_contention": ("benchmarks.bench_sqlite_contention", [], ["--seconds", "1"]),
+}
+
+def run_benchmark(module: str, arguments: list) -> dict:
+    """Run one benchmark module and return its report"""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "report.json")
+        completed = subprocess.run([sys.executable, "-m", module, *arguments, "--output", output],
+                                   stdout=subprocess.DEVNULL)
+        if completed.returncode != 0:
+            return {"error": f"exited with status {completed.returncode}"}
+        with open(output) as f:
+            return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", type=lambda value: value.split(","), default=list(SUITE),
+                        help=f"comma-separated benchmarks out of {','.join(SUITE)}")
+    parser.add_argument("--quick", action="store_true", help="small sizes, to check the suite runs")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    unknown = set(args.only) - set(SUITE)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    reports = {}
+    for name in args.only:
+        module, full, quick = SUITE[name]
+        print(f"running {name}", file=sys.stderr)
+        reports[name] = run_benchmark(module, quick if args.quick else full)
+    write_results("suite", {"quick": args.quick, "benchmarks": reports}, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CGROUP_MOUNT = Path("/sys/fs/cgroup")
+CONTROLLERS = ("cpu", "memory", "pids")
+CPU_PERIOD_US = 100000
+# Leaf that this process moves into when run cgroups are created under its own cgroup
+SERVICE_LEAF = "service"
+
+class CgroupUnavailable(Exception):
+    """Raised when no usable cgroup v2 hierarchy is delegated to this process"""
+
+def _write(path: Path, value: str):
+    # cgroupfs files take one unbuffered write per value
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.write(fd, value.encode())
+    finally:
+        os.close(fd)
+
+def _read_keyed(path: Path) -> Dict[str, int]:
+    """Parse a flat keyed file such as cpu.stat or memory.events"""
+    values = {}
+    for line in path.read_text().splitlines():
+        key, _, value = line.partition(" ")
+        if value.isdigit():
+            values[key] = int(value)
+    return values
+
+class RunCgroup:
+    """A leaf cgroup holding one cold run or one pool worker"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def attach_self(self):
+        """Move the calling process into this cgroup (used from preexec_fn in the child)"""
+        _write(self.path / "cgroup.procs", "0")
+
+    def cpu_time(self) -> Optional[float]:
+        """CPU seconds used by all processes that ran in the cgroup"""
+        try:
+            return _read_keyed(self.path / "cpu.stat")["usage_usec"] / 1e6
+        except (OSError, KeyError):
+            return None
+
+    def memory_peak(self) -> Optional[int]:
+        """Highest memory use in bytes since the cgroup was created (Linux 5.19+)"""
+        try:
+            return int((self.path / "memory.peak").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def open_peak(self) -> Optional[int]:
+        """
+        Descriptor of memory.peak with the peak reset for it (Linux 6.12+)
+
+        Reading it through `read_peak` gives the peak since the reset, which
+        measures a single run in a long-lived worker. None if unsupported.
+        """
+        try:
+            fd = os.open(self.path / "memory.peak", os.O_RDWR)
+        except OSError:
+            return None
+        try:
+            os.write(fd, b"reset\n")
+        except OSError:
+            os.close(fd)
+            return None
+        return fd
+
+    @staticmethod
+    def read_peak(fd: int) -> Optional[int]:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            return int(os.read(fd, 64))
+        except (OSError, ValueError):
+            return None
+        finally:
+            os.close(fd)
+
+    def oom_kills(self) -> int:
+        try:
+            return _read_keyed(self.path / "memory.events").get("oom_kill", 0)
+        except OSError:
+            return 0
+
+    def remove(self):
+        """Kill anything left in the cgroup and remove it"""
+        try:
+            _write(self.path / "cgroup.kill", "1")
+        except OSError:
+            pass  # Linux < 5.14, or already gone
+        # The kernel removes killed processes asynchronously
+        for _ in range(100):
+            try:
+                self.path.rmdir()
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.01)
+        logger.warning(f"Could not remove cgroup {self.path}")
+
+class CgroupManager:
+    """
+    Creates per-run cgroup v2 leaves with memory, CPU and process limits
+
+    Run cgroups are created under a delegated cgroup (`path`, or this
+    process's own cgroup). cgroup v2 does not allow processes in a cgroup
+    whose controllers are delegated to children, so when the own cgroup is
+    used its processes (this one and helpers such as the password hashing
+    pool) first move into a `service` leaf of it. If anything
+    is missing (cgroup v1, no delegation, controllers not enabled) the
+    manager stays unavailable and the executor keeps using rlimits.
+    """
+
+    def __init__(self, mode: str = "auto", path: str = ""):
+        self.mode = mode
+        self.path = path
+        self.root: Optional[Path] = None
+        self._checked = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        if not self._checked:
+            self.start()
+        return self.root is not None
+
+    def start(self) -> bool:
+        """Set up the delegated cgroup once; returns whether the backend is available"""
+        with self._lock:
+            if self._checked:
+                return self.root is not None
+            self._checked = True
+            if self.mode == "off" or not sys.platform.startswith("linux"):
+                return False
+            try:
+                self.root = self._prepare()
+            except (CgroupUnavailable, OSError) as e:
+                log = logger.warning if self.path else logger.info
+                log(f"cgroup v2 limits unavailable, using rlimits: {str(e)}")
+                return False
+            logger.info(f"Script runs are limited by cgroups under {self.root}")
+            return True
+
+    def create(self, kind: str, memory_limit: int, cpu_limit: float, pids_limit: int) -> RunCgroup:
+        """Create a leaf cgroup limited to `memory_limit` bytes, `cpu_limit` CPUs and `pids_limit` tasks"""
+        cgroup = RunCgroup(self.root / f"{kind}-{os.getpid()}-{uuid.uuid4().hex}")
+        cgroup.path.mkdir()
+        try:
+            _write(cgroup.path / "memory.max", str(memory_limit))
+            _write(cgroup.path / "cpu.max", f"{max(1000, int(cpu_limit * CPU_PERIOD_US))} {CPU_PERIOD_US}")
+            _write(cgroup.path / "pids.max", str(pids_limit))
+            # Kill the whole run on OOM, not just its largest process
+            _write(cgroup.path / "memory.oom.group", "1")
+        except OSError:
+            cgroup.remove()
+            raise
+        try:
+            _write(cgroup.path / "memory.swap.max", "0")
+        except OSError:
+            pass  # no swap accounting
+        return cgroup
+
+    def _prepare(self) -> Path:
+        if not (CGROUP_MOUNT / "cgroup.controllers").is_file():
+            raise CgroupUnavailable(f"{CGROUP_MOUNT} is not a cgroup v2 mount")
+        own = self._own_cgroup()
+        root = Path(self.path) if self.path else own
+        available = (root / "cgroup.controllers").read_text().split()
+        missing = [c for c in CONTROLLERS if c not in available]
+        if missing:
+            raise CgroupUnavailable(f"controllers not delegated to {root}: {', '.join(missing)}")
+
+        if root == own:
+            leaf = root / SERVICE_LEAF
+            leaf.mkdir(exist_ok=True)
+            for pid in (root / "cgroup.procs").read_text().split():
+                try:
+                    _write(leaf / "cgroup.procs", pid)
+                except ProcessLookupError:
+                    pass  # exited meanwhile
+        self._remove_stale(root)
+        _write(root / "cgroup.subtree_control", " ".join(f"+{c}" for c in CONTROLLERS))
+        return root
+
+    @staticmethod
+    def _own_cgroup() -> Path:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                return CGROUP_MOUNT / line[3:].lstrip("/")
+        raise CgroupUnavailable("process is not in a cgroup v2 hierarchy")
+
+    @staticmethod
+    def _remove_stale(root: Path):
+        """Remove run and worker cgroups left behind by processes that no longer exist"""
+        for path in root.iterdir():
+            kind, _, rest = path.name.partition("-")
+            owner = rest.partition("-")[0]
+            if kind not in ("run", "worker") or not owner.isdigit() or not path.is_dir():
+                continue
+            if not Path(f"/proc/{owner}").exists():
+                RunCgroup(path).remove()
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional
+import hashlib
+
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    """Strong entity tag for a representation identified by `parts` (hashes, timestamps)"""
+    raw = ":".join(part.isoformat() if isinstance(part, datetime) else str(part) for part in parts)
+    return f'"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers `etag` (weak comparison, as RFC 9110 asks for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def set_etag(response: Response, etag: Optional[str]):
+    """Tag a response; `no-cache` makes clients revalidate instead of reusing it blindly"""
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
@@ -7,6 +7,73 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Password hashing: bcrypt cost and the process pool doing the work (0 workers = one per core)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+    # Cache of authenticated users so requests do not look the user up every time
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+    PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./automa.db")
+    # Async driver URL; derived from DATABASE_URL for SQLite (sqlite+aiosqlite://)
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+    # Connection pool (file databases) and SQLite tuning profile: "performance" or "default"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    SQLITE_PROFILE: str = os.getenv("SQLITE_PROFILE", "performance")
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: str = os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")
+    SQLITE_MMAP_SIZE: str = os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE: str = os.getenv("SQLITE_CACHE_SIZE", "-65536")  # negative = KiB
+    # Takes effect on new databases (existing ones need a VACUUM); lets deleted pages be returned
+    SQLITE_AUTO_VACUUM: str = os.getenv("SQLITE_AUTO_VACUUM", "INCREMENTAL")
+    # Bearer token required by /metrics (empty = no authentication, e.g. behind a private network)
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    # Seconds the /stats dashboard summary is cached for
+    STATS_CACHE_TTL: int = int(os.getenv("STATS_CACHE_TTL", "5"))
+    # Largest batch accepted by the bulk endpoints
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+    # Batched audit writer for API request logging
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL_MS: int = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "200"))
+    # Audit retention (opt-in): whole months older than AUDIT_RETENTION_DAYS move to
+    # compressed JSONL files (0, the default, keeps everything in the database), which
+    # are deleted after AUDIT_ARCHIVE_RETENTION_DAYS (0 keeps them forever)
+    AUDIT_RETENTION_DAYS: int = int(os.getenv("AUDIT_RETENTION_DAYS", "0"))
+    AUDIT_ARCHIVE_DIR: str = os.getenv("AUDIT_ARCHIVE_DIR", "./audit_archive")
+    AUDIT_ARCHIVE_RETENTION_DAYS: int = int(os.getenv("AUDIT_ARCHIVE_RETENTION_DAYS", "0"))
+    # Scheduler catch-up: overdue runs within the grace period still run (0 = no limit),
+    # several overdue runs of the same job are coalesced into one
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "3600"))
+    SCHEDULER_COALESCE: bool = os.getenv("SCHEDULER_COALESCE", "true").lower() == "true"
+    # Execution engine: concurrent runs, admission queue and per-agent concurrency
+    EXECUTION_WORKERS: int = int(os.getenv("EXECUTION_WORKERS", "4"))
+    EXECUTION_QUEUE_SIZE: int = int(os.getenv("EXECUTION_QUEUE_SIZE", "100"))
+    EXECUTION_PER_AGENT_LIMIT: int = int(os.getenv("EXECUTION_PER_AGENT_LIMIT", "2"))
+    # Warm interpreter pool for script execution (0 disables it)
+    EXECUTOR_POOL_SIZE: int = int(os.getenv("EXECUTOR_POOL_SIZE", str(EXECUTION_WORKERS)))
+    EXECUTOR_POOL_MAX_RUNS: int = int(os.getenv("EXECUTOR_POOL_MAX_RUNS", "50"))
+    # cgroup v2 limits per run ("auto" uses them when a delegated cgroup is available, "off"
+    # keeps rlimits only); runs get memory.max, cpu.max (in CPUs) and pids.max
+    EXECUTOR_CGROUPS: str = os.getenv("EXECUTOR_CGROUPS", "auto")
+    EXECUTOR_CGROUP_PATH: str = os.getenv("EXECUTOR_CGROUP_PATH", "")  # default: this process's cgroup
+    EXECUTOR_MEMORY_LIMIT_MB: int = int(os.getenv("EXECUTOR_MEMORY_LIMIT_MB", "100"))
+    EXECUTOR_CPU_LIMIT: float = float(os.getenv("EXECUTOR_CPU_LIMIT", "1"))
+    EXECUTOR_PIDS_LIMIT: int = int(os.getenv("EXECUTOR_PIDS_LIMIT", "64"))
+    # Compiled scripts of pool workers, by content hash and interpreter version (empty = in memory only)
+    BYTECODE_CACHE_DIR: str = os.getenv("BYTECODE_CACHE_DIR", "./bytecode_cache")
+    # Script validation results kept in memory, by content hash
+    SCRIPT_VALIDATION_CACHE_SIZE: int = int(os.getenv("SCRIPT_VALIDATION_CACHE_SIZE", "4096"))
+    # Per-run output spooling: head and tail retained per stream, the rest is dropped
+    RUN_OUTPUT_DIR: str = os.getenv("RUN_OUTPUT_DIR", "./run_output")
+    RUN_OUTPUT_HEAD_BYTES: int = int(os.getenv("RUN_OUTPUT_HEAD_BYTES", str(1024 * 1024)))
+    RUN_OUTPUT_TAIL_BYTES: int = int(os.getenv("RUN_OUTPUT_TAIL_BYTES", str(1024 * 1024)))
+    RUN_OUTPUT_PREVIEW_BYTES: int = int(os.getenv("RUN_OUTPUT_PREVIEW_BYTES", "4096"))
+    RUN_OUTPUT_RETENTION_DAYS: int = int(os.getenv("RUN_OUTPUT_RETENTION_DAYS", "7"))
+    # Output per stream added to the full-text index for each run, head and tail (0 = not indexed)
+    RUN_OUTPUT_SEARCH_BYTES: int = int(os.getenv("RUN_OUTPUT_SEARCH_BYTES", str(64 * 1024)))
 
 settings = Settings()
@@ -1,31 +1,55 @@
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 import json
 from datetime import datetime
+from typing import Optional, Tuple
 
-from models import User, Agent, Script, Task, AuditLog
+from models import User, Agent, Script, ScriptContent, Task, TaskRun, AuditLog
 from schemas import UserCreate, AgentCreate, ScriptCreate, TaskCreate, AuditLogCreate
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from events import publish_change
+from cache import principal_cache
+from passwords import hash_password
+from script_store import hash_content
+from metrics import instrument_module, db_query_duration
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password)
 
 # User CRUD
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None):
+    """Create a user; pass `hashed_password` when the hash was computed off the request path"""
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    principal_cache.pop(db_user.email)
+    return db_user
+
+def update_user_password_hash(db: Session, user_id: int, hashed_password: str):
+    db_user = db.query(User).filter(User.id == user_id).first()
+    if db_user:
+        db_user.hashed_password = hashed_password
+        db.commit()
+        principal_cache.pop(db_user.email)
     return db_user
 
+def _page_by_id(query, model, skip: int, limit: int, after_id: Optional[int]):
+    """One page ordered by id; keyset on `after_id` when given, otherwise offset"""
+    query = query.order_by(model.id)
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
 # Agent CRUD
-def get_agents(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Agent).offset(skip).limit(limit).all()
+def get_agents(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return _page_by_id(db.query(Agent), Agent, skip, limit, after_id)
 
 def get_agent(db: Session, agent_id: int):
     return db.query(Agent).filter(Agent.id == agent_id).first()
@@ -35,6 +59,7 @@ def create_agent(db: Session, agent: AgentCreate):
     db.add(db_agent)
     db.commit()
     db.refresh(db_agent)
+    publish_change("agent", "created", db_agent)
     return db_agent
 
 def update_agent(db: Session, agent_id: int, agent: AgentCreate):
@@ -44,6 +69,7 @@ def update_agent(db: Session, agent_id: int, agent: AgentCreate):
             setattr(db_agent, key, value)
         db.commit()
         db.refresh(db_agent)
+        publish_change("agent", "updated", db_agent)
     return db_agent
 
 def delete_agent(db: Session, agent_id: int):
@@ -51,29 +77,54 @@ def delete_agent(db: Session, agent_id: int):
     if db_agent:
         db.delete(db_agent)
         db.commit()
+        publish_change("agent", "deleted", db_agent)
     return db_agent
 
 # Script CRUD
-def get_scripts(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Script).offset(skip).limit(limit).all()
+# Columns of the script list; the body is only loaded for a single script
+SCRIPT_SUMMARY_COLUMNS = (Script.id, Script.name, Script.description, Script.filename,
+                          Script.content_hash, Script.updated_at, ScriptContent.size)
+
+def get_scripts(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    """Script summaries (no body), see SCRIPT_SUMMARY_COLUMNS"""
+    query = db.query(*SCRIPT_SUMMARY_COLUMNS).outerjoin(ScriptContent, Script.content_hash == ScriptContent.hash)
+    return _page_by_id(query, Script, skip, limit, after_id)
 
 def get_script(db: Session, script_id: int):
     return db.query(Script).filter(Script.id == script_id).first()
 
+def get_script_content_hash(db: Session, script_id: int) -> Optional[str]:
+    """The hash of a script's body, without loading the body"""
+    return db.query(Script.content_hash).filter(Script.id == script_id).scalar()
+
+def store_script_content(db: Session, source: str) -> str:
+    """Store a script body once per distinct source; returns its hash"""
+    digest = hash_content(source)
+    if db.get(ScriptContent, digest) is None:
+        db.add(ScriptContent(hash=digest, content=source, size=len(source.encode("utf-8"))))
+    return digest
+
+def _script_fields(db: Session, script: ScriptCreate) -> dict:
+    fields = script.dict()
+    fields["content_hash"] = store_script_content(db, fields.pop("content"))
+    return fields
+
 def create_script(db: Session, script: ScriptCreate):
-    db_script = Script(**script.dict())
+    db_script = Script(**_script_fields(db, script))
     db.add(db_script)
     db.commit()
     db.refresh(db_script)
+    publish_change("script", "created", db_script)
     return db_script
 
 def update_script(db: Session, script_id: int, script: ScriptCreate):
     db_script = db.query(Script).filter(Script.id == script_id).first()
     if db_script:
-        for key, value in script.dict().items():
+        for key, value in _script_fields(db, script).items():
             setattr(db_script, key, value)
         db.commit()
         db.refresh(db_script)
+        publish_change("script", "updated", db_script)
     return db_script
 
 def delete_script(db: Session, script_id: int):
@@ -81,11 +132,12 @@ def delete_script(db: Session, script_id: int):
     if db_script:
         db.delete(db_script)
         db.commit()
+        publish_change("script", "deleted", db_script)
     return db_script
 
 # Task CRUD
-def get_tasks(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Task).offset(skip).limit(limit).all()
+def get_tasks(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return _page_by_id(db.query(Task), Task, skip, limit, after_id)
 
 def get_task(db: Session, task_id: int):
     return db.query(Task).filter(Task.id == task_id).first()
@@ -95,6 +147,7 @@ def create_task(db: Session, task: TaskCreate):
     db.add(db_task)
     db.commit()
     db.refresh(db_task)
+    publish_change("task", "created", db_task)
     return db_task
 
 def update_task(db: Session, task_id: int, updates: dict):
@@ -105,13 +158,16 @@ def update_task(db: Session, task_id: int, updates: dict):
                 setattr(db_task, key, value)
         db.commit()
         db.refresh(db_task)
+        publish_change("task", "updated", db_task)
     return db_task
 
 def delete_task(db: Session, task_id: int):
     db_task = db.query(Task).filter(Task.id == task_id).first()
     if db_task:
+        db.query(TaskRun).filter(TaskRun.task_id == task_id).delete(synchronize_session=False)
         db.delete(db_task)
         db.commit()
+        publish_change("task", "deleted", db_task)
     return db_task
 
 # Audit Log CRUD
@@ -120,17 +176,33 @@ def create_audit_log(db: Session, audit_log: AuditLogCreate):
     db.add(db_audit_log)
     db.commit()
     db.refresh(db_audit_log)
+    publish_change("audit", "created", db_audit_log)
     return db_audit_log
 
-def get_audit_logs(db: Session, skip: int = 0, limit: int = 100, user_id: int = None, resource_type: str = None):
+def get_audit_logs(db: Session, skip: int = 0, limit: int = 100, user_id: int = None, resource_type: str = None,
+                   before: Optional[Tuple[datetime, int]] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None):
+    """Newest first; `before` is the (timestamp, id) of the last row of the previous page"""
     query = db.query(AuditLog)
     if user_id:
         query = query.filter(AuditLog.user_id == user_id)
     if resource_type:
         query = query.filter(AuditLog.resource_type == resource_type)
-    return query.order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
-
-from typing import Optional
+    # A time range is a range scan of the timestamp indexes
+    if since is not None:
+        query = query.filter(AuditLog.timestamp >= since)
+    if until is not None:
+        query = query.filter(AuditLog.timestamp < until)
+    query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+    if before is not None:
+        timestamp, audit_id = before
+        query = query.filter(or_(
+            AuditLog.timestamp < timestamp,
+            and_(AuditLog.timestamp == timestamp, AuditLog.id < audit_id)
+        ))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def log_action(db: Session, user_id: Optional[int] = None, action: str = "", resource_type: str = "",
                resource_id: Optional[int] = None, details: Optional[dict] = None, ip_address: Optional[str] = None):
@@ -145,3 +217,6 @@ def log_action(db: Session, user_id: Optional[int] = None, action: str = "", res
         ip_address=ip_address
     )
     return create_audit_log(db, audit_log)
+
+# Time every public function (db_query_duration_seconds); other modules import the wrapped versions
+instrument_module(globals(), db_query_duration)
@@ -1,16 +1,181 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+import asyncio
+import threading
+
+from sqlalchemy import MetaData, create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 
 from config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def sqlite_pragmas() -> dict:
+    """PRAGMAs applied to every new SQLite connection by the performance profile"""
+    pragmas = {
+        # Before journal_mode: auto_vacuum only applies while the database is still empty
+        "auto_vacuum": settings.SQLITE_AUTO_VACUUM,
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "temp_store": "MEMORY",
+    }
+    # An empty setting leaves SQLite's own default in place
+    return {name: value for name, value in pragmas.items() if value != ""}
+
+def _engine_options(url: str) -> dict:
+    db_url = make_url(url)
+    pool = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT}
+    if db_url.get_backend_name() != "sqlite":
+        return pool
+    options = {"connect_args": {"check_same_thread": False}}
+    if db_url.database not in (None, "", ":memory:"):
+        # In-memory databases use a single shared connection, so only size file pools
+        options.update(pool)
+    return options
+
+def _apply_profile(db_engine: Engine, profile: str):
+    if db_engine.dialect.name != "sqlite" or profile != "performance":
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(db_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def create_db_engine(url: str, profile: str = settings.SQLITE_PROFILE) -> Engine:
+    """
+    Create the application engine
+
+    For SQLite the "performance" profile switches to WAL with
+    synchronous=NORMAL, waits on locks instead of failing with
+    "database is locked", and enlarges the page cache and memory map.
+    The "default" profile leaves SQLite's settings alone.
+    """
+    db_engine = create_engine(url, **_engine_options(url))
+    _apply_profile(db_engine, profile)
+    return db_engine
+
+def async_database_url(url: str) -> str:
+    """The async driver URL for a database URL (sqlite:// becomes sqlite+aiosqlite://)"""
+    db_url = make_url(url)
+    if db_url.drivername in ("sqlite", "sqlite+pysqlite"):
+        db_url = db_url.set(drivername="sqlite+aiosqlite")
+    return db_url.render_as_string(hide_password=False)
+
+def create_async_db_engine(url: str, profile: str = settings.SQLITE_PROFILE) -> AsyncEngine:
+    """Async engine with the same pool sizing and SQLite profile as create_db_engine()"""
+    db_engine = create_async_engine(url, **_engine_options(url))
+    _apply_profile(db_engine.sync_engine, profile)
+    return db_engine
+
+engine = create_db_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the API handlers and the scheduler. Objects stay loaded after commit,
+# since lazy refreshes are not possible on an async session.
+async_engine = create_async_db_engine(settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# SQLite allows one writer at a time; write-heavy paths queue on this lock
+# instead of contending for the database lock.
+_write_lock = threading.Lock()
+# Coroutines wait here first, so at most one of them waits for _write_lock in a thread
+_async_write_lock = asyncio.Lock()
+
+def sync_schema(metadata: MetaData):
+    """
+    Create missing tables, plus nullable columns and indexes added to existing ones
+
+    create_all() only creates whole tables, and the project has no migrations.
+    """
+    metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@contextmanager
+def write_session(db: Optional[Session] = None, **session_options) -> Iterator[Session]:
+    """
+    Serialize a write transaction with the other writers in this process
+
+    With `db` the caller's session is used and left open; otherwise a new
+    session is opened, committed on success and closed. Not for use on the
+    event loop; coroutines use async_write_session().
+    """
+    with _write_lock:
+        if db is not None:
+            yield db
+            return
+        session = SessionLocal(**session_options)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+@asynccontextmanager
+async def async_write_session(db: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Async variant of write_session()
+
+    Coroutines queue on an asyncio lock; only the first in line takes the
+    writer lock, waiting for it in a thread if a sync writer holds it, so
+    the event loop keeps running.
+    """
+    async with _async_write_lock:
+        await _acquire_write_lock()
+        try:
+            if db is not None:
+                yield db
+                return
+            async with AsyncSessionLocal() as session:
+                try:
+                    yield session
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+        finally:
+            _write_lock.release()
+
+async def _acquire_write_lock():
+    if _write_lock.acquire(blocking=False):
+        return
+    acquiring = asyncio.ensure_future(asyncio.to_thread(_write_lock.acquire))
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # The thread still gets the lock; give it back as soon as it does
+        acquiring.add_done_callback(lambda _: _write_lock.release())
+        raise
@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Dict, Any, Optional, Set
+import asyncio
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """A subscriber's bounded event queue; events are dropped when it falls behind"""
+
+    def __init__(self, broker: "EventBroker", channel: str, maxsize: int):
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within the timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class EventBroker:
+    """
+    In-process publish/subscribe for live updates
+
+    Events can be published from any thread (executor threads stream script
+    output through it); they are delivered on the event loop to every
+    subscriber of the channel.
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Deliver events on this loop"""
+        self._loop = loop
+
+    def has_subscribers(self, channel: str) -> bool:
+        return bool(self._channels.get(channel))
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel: str, event: Dict[str, Any]):
+        """Send an event to a channel's subscribers (thread-safe, never blocks)"""
+        if not self.has_subscribers(channel) or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(channel, event)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._deliver, channel, event)
+            except RuntimeError:
+                pass  # loop closed during shutdown
+
+    def _deliver(self, channel: str, event: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message"""
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+
+def task_channel(task_id: int) -> str:
+    return f"task:{task_id}"
+
+# Multiplexed feed of create/update/delete changes for the dashboard
+CHANGES_CHANNEL = "changes"
+
+# Columns that are never pushed over the change feed
+_EXCLUDED_COLUMNS = {"content", "hashed_password"}
+
+def publish_change(resource: str, action: str, obj):
+    """Publish a created/updated/deleted row to the change feed"""
+    if not broker.has_subscribers(CHANGES_CHANNEL):
+        return
+    if action == "deleted":
+        data = {"id": obj.id}
+    else:
+        data = {}
+        for column in obj.__table__.columns:
+            if column.name in _EXCLUDED_COLUMNS:
+                continue
+            value = getattr(obj, column.name)
+            data[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    broker.publish(CHANGES_CHANNEL, {"type": "change", "resource": resource, "action": action, "id": obj.id, "data": data})
+
+# Global broker instance
+broker = EventBroker()
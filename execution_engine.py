@@ -0,0 +1,195 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+import asyncio
+import logging
+import time
+
+from config import settings
+from metrics import CallbackMetric, executor_queue_wait
+
+logger = logging.getLogger(__name__)
+
+class EngineBusyError(Exception):
+    """Raised when the admission queue is full"""
+
+class Admission:
+    """A run that was admitted to the engine and is waiting for, or holding, a slot"""
+
+    def __init__(self, engine: "ExecutionEngine", agent_id: Optional[int]):
+        self.engine = engine
+        self.agent_id = agent_id
+        self.admitted_at = time.monotonic()
+        self.wait_time: Optional[float] = None
+        self.state = "queued"  # queued, running, done
+
+    async def __aenter__(self):
+        await self.engine._acquire(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.engine._release(self)
+
+    async def run(self, fn: Callable, *args):
+        """Run a blocking callable on the engine's worker threads"""
+        if self.engine._pool is None:
+            raise RuntimeError("Execution engine is not started")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.engine._pool, fn, *args)
+
+    def cancel(self):
+        """Give up a queued admission that will never be entered"""
+        if self.state == "queued":
+            self.engine._dequeue(self)
+
+class ExecutionEngine:
+    """
+    Bounded execution engine for script runs
+
+    Runs get a place in a bounded admission queue, then wait for a global slot
+    and a per-agent slot before their blocking work is handed to a dedicated
+    thread pool. All bookkeeping happens on the event loop thread.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 100, per_agent_limit: int = 2):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.per_agent_limit = per_agent_limit
+        # Created by start(); a shut-down pool cannot be reused
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._global = asyncio.Semaphore(workers)
+        self._agents: Dict[Optional[int], asyncio.Semaphore] = {}
+        self._agent_load: Dict[Optional[int], int] = {}
+
+        self.queued = 0
+        self.running = 0
+        # Queued runs blocked on their agent's limit; they do not compete for a global slot yet
+        self._waiting_for_agent = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.completed_total = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def has_capacity(self, agent_id: Optional[int]) -> bool:
+        """
+        Whether a run for this agent would start without waiting
+
+        Queued runs that have not reached their slots yet (e.g. the earlier
+        tasks of a bulk execution) count as taking a global slot, unless they
+        wait for their own agent's limit.
+        """
+        claims = self.running + self.queued - self._waiting_for_agent
+        return claims < self.workers and self._agent_load.get(agent_id, 0) < self.per_agent_limit
+
+    def admit(self, agent_id: Optional[int]) -> Admission:
+        """
+        Reserve a place in the admission queue
+
+        Raises:
+            EngineBusyError: if the queue is full
+        """
+        if self.queued >= self.queue_size:
+            self.rejected_total += 1
+            raise EngineBusyError("Execution queue is full")
+        self.queued += 1
+        self.admitted_total += 1
+        self._agent_load[agent_id] = self._agent_load.get(agent_id, 0) + 1
+        return Admission(self, agent_id)
+
+    async def _acquire(self, admission: Admission):
+        agent_slots = self._agents.setdefault(admission.agent_id, asyncio.Semaphore(self.per_agent_limit))
+        try:
+            blocked = agent_slots.locked()
+            if blocked:
+                self._waiting_for_agent += 1
+            try:
+                await agent_slots.acquire()
+            finally:
+                if blocked:
+                    self._waiting_for_agent -= 1
+            try:
+                await self._global.acquire()
+            except BaseException:
+                agent_slots.release()
+                raise
+        except BaseException:
+            self._dequeue(admission)
+            raise
+
+        self.queued -= 1
+        self.running += 1
+        admission.state = "running"
+        admission.wait_time = time.monotonic() - admission.admitted_at
+        self.wait_time_total += admission.wait_time
+        self.wait_time_max = max(self.wait_time_max, admission.wait_time)
+        executor_queue_wait.observe(admission.wait_time)
+
+    def _release(self, admission: Admission):
+        if admission.state != "running":
+            return
+        admission.state = "done"
+        self.running -= 1
+        self.completed_total += 1
+        self._global.release()
+        self._agents[admission.agent_id].release()
+        self._unload_agent(admission.agent_id)
+
+    def _dequeue(self, admission: Admission):
+        if admission.state != "queued":
+            return
+        admission.state = "done"
+        self.queued -= 1
+        self._unload_agent(admission.agent_id)
+
+    def _unload_agent(self, agent_id: Optional[int]):
+        load = self._agent_load.get(agent_id, 0) - 1
+        if load > 0:
+            self._agent_load[agent_id] = load
+        else:
+            # Forget idle agents so the maps do not grow without bound
+            self._agent_load.pop(agent_id, None)
+            self._agents.pop(agent_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, concurrency and wait-time counters"""
+        started = self.running + self.completed_total
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "per_agent_limit": self.per_agent_limit,
+            "queued": self.queued,
+            "running": self.running,
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+            "completed_total": self.completed_total,
+            "wait_time_avg": round(self.wait_time_total / started, 4) if started else 0.0,
+            "wait_time_max": round(self.wait_time_max, 4)
+        }
+
+    def start(self):
+        """Create the thread pool; the engine can be started again after shutdown()"""
+        if self._pool is not None:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="script-run")
+        # Semaphores bind to the event loop they first wait on
+        self._global = asyncio.Semaphore(self.workers)
+        self._agents.clear()
+
+    def shutdown(self):
+        """Stop accepting work on the thread pool"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+# Global engine instance
+engine = ExecutionEngine(
+    workers=settings.EXECUTION_WORKERS,
+    queue_size=settings.EXECUTION_QUEUE_SIZE,
+    per_agent_limit=settings.EXECUTION_PER_AGENT_LIMIT
+)
+
+# Read on every /metrics scrape
+CallbackMetric("executor_queue_depth", "Runs waiting for an execution slot", lambda: engine.queued)
+CallbackMetric("executor_running", "Runs holding an execution slot", lambda: engine.running)
+CallbackMetric("executor_rejected_total", "Runs rejected because the queue was full",
+               lambda: engine.rejected_total, kind="counter")
@@ -1,11 +1,23 @@
 import subprocess
 import os
+import select
+import signal
 import tempfile
+import threading
 import logging
+import functools
+import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Callable
 import time
 
+from config import settings
+from cgroups import CgroupManager, RunCgroup
+from output_spool import OutputSpool
+from sandbox_worker import HEADER, send_message
+from script_validator import validate_script
+from metrics import executor_spawn_duration, executor_run_duration, executor_timeouts
+
 # Import resource module only on Unix systems
 try:
     import resource
@@ -15,149 +27,695 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+WORKER_PATH = Path(__file__).resolve().parent / "sandbox_worker.py"
+WORKER_START_TIMEOUT = 10
+# Processes a script may run at once under rlimits (RLIMIT_NPROC); cgroups use pids_limit instead
+NPROC_LIMIT = 10
+
+_worker_spawn_time = executor_spawn_duration.labels("worker")
+_cold_spawn_time = executor_spawn_duration.labels("cold")
+_run_time = {mode: executor_run_duration.labels(mode) for mode in ("worker", "cold")}
+_timeouts = {mode: executor_timeouts.labels(mode) for mode in ("worker", "cold")}
+
+class PooledWorker:
+    """A pre-started sandboxed interpreter that runs scripts sent over a pipe"""
+
+    def __init__(self, executor: "ScriptExecutor"):
+        self.executor = executor
+        self.runs = 0
+        self.alive = False
+        self.process = None
+        self.cgroup: Optional[RunCgroup] = None
+        # Process (and process group) of the run in progress, forked by the worker
+        self.run_pid: Optional[int] = None
+        self._command_w = None
+        self._result_r = None
+        self._buffer = b""
+
+    def start(self):
+        """Spawn the interpreter and wait until it reports ready"""
+        spawn_started = time.perf_counter()
+        self.cgroup = self.executor._create_cgroup("worker")
+        command_r, self._command_w = os.pipe()
+        self._result_r, result_w = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                ['python3', str(WORKER_PATH), str(command_r), str(result_w)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=tempfile.gettempdir(),
+                env=self.executor._script_env(),
+                pass_fds=(command_r, result_w),
+                # The CPU limit covers the worker's whole life; each run gets its own soft budget.
+                # The process limit is set in each run, since the worker forks the runs.
+                preexec_fn=functools.partial(self.executor._set_limits,
+                                             self.executor.timeout * self.executor.pool_max_runs, self.cgroup,
+                                             nproc=False)
+            )
+        except Exception:
+            self._remove_cgroup()
+            raise
+        finally:
+            os.close(command_r)
+            os.close(result_w)
+
+        self.alive = True
+        reply = self._read_reply(time.monotonic() + WORKER_START_TIMEOUT, {})
+        if not reply or not reply.get("ready"):
+            self.terminate()
+            raise RuntimeError("Sandbox worker failed to start")
+        _worker_spawn_time.observe(time.perf_counter() - spawn_started)
+
+    def run(self, script_content: Optional[str], script_name: str, cwd: str,
+            stdout: OutputSpool, stderr: OutputSpool, content_hash: Optional[str] = None,
+            load_source: Optional[Callable[[], Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Run a script in this worker, streaming its output into the spools
+
+        With a `content_hash`, the source may be omitted: the worker runs its
+        cached code, and `load_source` is only called if the worker has none.
+
+        Returns:
+            The worker's reply: return_code, plus cpu_time and peak_rss_kb
+            (from the worker's cgroup when it has one, otherwise the resource
+            usage of the run's process)
+
+        Raises:
+            subprocess.TimeoutExpired: if the script did not finish within the executor timeout
+            RuntimeError: if the worker needs the source and it cannot be loaded
+        """
+        self.runs += 1
+        cpu_before = oom_before = peak_fd = None
+        if self.cgroup is not None:
+            cpu_before, oom_before = self.cgroup.cpu_time(), self.cgroup.oom_kills()
+            peak_fd = self.cgroup.open_peak()
+        message = {
+            "source": script_content,
+            "hash": content_hash,
+            "cache_dir": self.executor.bytecode_cache_dir,
+            "name": script_name,
+            "cwd": cwd,
+            "timeout": self.executor.timeout,
+            "nproc_limit": NPROC_LIMIT if self.cgroup is None else None
+        }
+        send_message(self._command_w, message)
+
+        deadline = time.monotonic() + self.executor.timeout
+        streams = {self.process.stdout.fileno(): stdout, self.process.stderr.fileno(): stderr}
+        try:
+            reply = self._read_reply(deadline, streams)
+            if reply is not None and reply.get("need_source"):
+                # Cache miss: the worker compiles the source and caches it for the next run
+                message["source"] = load_source() if load_source else None
+                if message["source"] is None:
+                    raise RuntimeError("Script source not found")
+                send_message(self._command_w, message)
+                reply = self._read_reply(deadline, streams)
+            if reply is not None and "started" in reply:
+                self.run_pid = reply["started"]
+                reply = self._read_reply(deadline, streams)
+        except Exception:
+            if peak_fd is not None:
+                os.close(peak_fd)
+            raise
+
+        self.run_pid = None
+        if reply is None:
+            # The worker itself died mid-run (killed from outside, out of memory)
+            self.alive = False
+            try:
+                return_code = self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                return_code = -1
+            reply = {"return_code": return_code, "breach": True}
+
+        # Output written before the reply may still be sitting in the pipes
+        while streams:
+            readable, _, _ = select.select(list(streams), [], [], 0)
+            if not readable:
+                break
+            for fd in readable:
+                chunk = os.read(fd, 65536)
+                if chunk:
+                    streams[fd].write(chunk)
+                else:
+                    del streams[fd]
+
+        if reply.get("breach"):
+            self.alive = False
+
+        if self.cgroup is not None:
+            cpu_after = self.cgroup.cpu_time()
+            # Without a per-run reset, the peak is the worker's high-water mark
+            peak = RunCgroup.read_peak(peak_fd) if peak_fd is not None else self.cgroup.memory_peak()
+            reply["cpu_time"] = round(cpu_after - cpu_before, 4) if cpu_after is not None and cpu_before is not None else None
+            reply["peak_rss_kb"] = peak // 1024 if peak is not None else None
+            reply["oom_killed"] = self.cgroup.oom_kills() > oom_before
+
+        return reply
+
+    def _read_reply(self, deadline: float, streams: Dict[int, OutputSpool]) -> Optional[Dict[str, Any]]:
+        """Collect stream output until a full reply arrives on the result pipe"""
+        while True:
+            # A chunk may have held more than one message
+            if len(self._buffer) >= HEADER.size:
+                size = HEADER.unpack_from(self._buffer)[0]
+                if len(self._buffer) >= HEADER.size + size:
+                    reply = json.loads(self._buffer[HEADER.size:HEADER.size + size])
+                    self._buffer = self._buffer[HEADER.size + size:]
+                    return reply
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.terminate(kill=True)
+                raise subprocess.TimeoutExpired(str(WORKER_PATH), self.executor.timeout)
+
+            readable, _, _ = select.select([*streams, self._result_r], [], [], remaining)
+            for fd in readable:
+                chunk = os.read(fd, 65536)
+                if fd != self._result_r:
+                    if chunk:
+                        streams[fd].write(chunk)
+                    continue
+                if not chunk:
+                    return None
+                self._buffer += chunk
+
+    def terminate(self, kill: bool = False):
+        """Stop the worker process and release its pipes"""
+        self.alive = False
+        if self.process is None:
+            return
+        if self._command_w is not None:
+            os.close(self._command_w)
+            self._command_w = None
+        if kill:
+            if self.run_pid is not None:
+                # The run and anything it started; the worker is not in that group
+                try:
+                    os.killpg(self.run_pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                self.run_pid = None
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self._result_r is not None:
+            os.close(self._result_r)
+            self._result_r = None
+        self.process.stdout.close()
+        self.process.stderr.close()
+        self._remove_cgroup()
+
+    def _remove_cgroup(self):
+        if self.cgroup is not None:
+            self.cgroup.remove()
+            self.cgroup = None
+
+class WorkerPool:
+    """Pool of warm sandbox workers, recycled after max_runs runs or a limit breach"""
+
+    def __init__(self, executor: "ScriptExecutor", size: int, max_runs: int):
+        self.executor = executor
+        self.size = size
+        self.max_runs = max_runs
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # Recycled workers not replaced yet, and the signal for the replenisher thread
+        self._replacements = 0
+        self._recycled = threading.Condition(self._lock)
+
+    def start(self):
+        """Pre-start all workers and the thread that replaces recycled ones"""
+        for _ in range(self.size):
+            self._replenish()
+        threading.Thread(target=self._replenish_recycled, name="worker-pool-replenisher", daemon=True).start()
+
+    def acquire(self) -> PooledWorker:
+        """Take an idle worker, spawning one if the pool is not full yet"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Worker pool is shut down")
+                if self._idle:
+                    return self._idle.pop()
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                self._cond.wait()
+
+        try:
+            return self._spawn()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, worker: PooledWorker):
+        """Return a worker to the pool or recycle it"""
+        recycle = not worker.alive or worker.runs >= self.max_runs
+        with self._cond:
+            if recycle or self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+
+        if recycle or self._closed:
+            worker.terminate()
+        if recycle:
+            with self._cond:
+                self._replacements += 1
+                self._recycled.notify()
+
+    def shutdown(self):
+        """Stop all idle workers; busy ones are stopped when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+            self._recycled.notify()
+        for worker in idle:
+            worker.terminate()
+
+    def _spawn(self) -> PooledWorker:
+        worker = PooledWorker(self.executor)
+        worker.start()
+        return worker
+
+    def _replenish_recycled(self):
+        """Replace recycled workers one at a time, until the pool is shut down"""
+        while True:
+            with self._cond:
+                while not self._closed and not self._replacements:
+                    self._recycled.wait()
+                if self._closed:
+                    return
+                self._replacements -= 1
+            self._replenish()
+
+    def _replenish(self):
+        """Start a worker so the next run finds it warm"""
+        with self._cond:
+            if self._closed or self._total >= self.size:
+                return
+            self._total += 1
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            logger.warning(f"Could not start sandbox worker: {str(e)}")
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            return
+        self.release(worker)
+
 class ScriptExecutor:
     """Basic script executor with sandboxing features"""
 
-    def __init__(self, timeout: int = 30, memory_limit: int = 100 * 1024 * 1024):  # 100MB
+    def __init__(self, timeout: int = 30, memory_limit: int = 100 * 1024 * 1024,  # 100MB
+                 pool_size: int = 0, pool_max_runs: int = 50, cpu_limit: float = 1.0, pids_limit: int = 64,
+                 cgroups: Optional[CgroupManager] = None, bytecode_cache_dir: Optional[str] = None):
         self.timeout = timeout
         self.memory_limit = memory_limit
+        # cpu_limit (CPUs) and pids_limit only apply under cgroups
+        self.cpu_limit = cpu_limit
+        self.pids_limit = pids_limit
+        self.pool_size = pool_size
+        self.pool_max_runs = pool_max_runs
+        # Per-run cgroup limits when available; rlimits otherwise
+        self.cgroups = cgroups
+        # .pyc files of pool workers by content hash; workers run in their own directories
+        self.bytecode_cache_dir = str(Path(bytecode_cache_dir).resolve()) if bytecode_cache_dir else None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def start_pool(self) -> Optional[WorkerPool]:
+        """Create and pre-start the warm worker pool if it is enabled"""
+        # The pool relies on select() over pipes and fork-time rlimits
+        if self.pool_size <= 0 or os.name == 'nt':
+            return None
+        if self.cgroups is not None:
+            # Set up before any worker exists; they are placed in their own cgroups
+            self.cgroups.start()
+        if self.bytecode_cache_dir:
+            Path(self.bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = WorkerPool(self, self.pool_size, self.pool_max_runs)
+                self._pool.start()
+        return self._pool
+
+    def stop_pool(self):
+        """Shut down the warm worker pool"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown()
 
-    def execute_script(self, script_content: str, script_name: str = "script.py") -> Dict[str, Any]:
+    def execute_script(self, script_content: Optional[str], script_name: str = "script.py",
+                       output_base: Optional[Path] = None,
+                       on_output: Optional[Callable[[str, str], None]] = None,
+                       content_hash: Optional[str] = None,
+                       load_source: Optional[Callable[[], Optional[str]]] = None) -> Dict[str, Any]:
         """
         Execute a Python script with basic sandboxing
 
         Args:
-            script_content: The Python script content as string
+            script_content: The Python script content as string; may be None
+                when `content_hash` and `load_source` are given
             script_name: Name of the script file
+            output_base: Path prefix for the stdout/stderr spool files; when not
+                given, output is spooled into the run's temporary directory
+            on_output: Called with (stream, line) for each output line as it is produced
+            content_hash: Hash of the script content; pool workers run their
+                cached compiled code for it without the source
+            load_source: Returns the source when it is needed after all (cache
+                miss, or a run in a fresh interpreter)
 
         Returns:
-            Dict containing execution results
+            Dict containing execution results; `output` and `error` hold the
+            beginning of each stream, the full (size-capped) output is in the spools
         """
         result = {
             "success": False,
             "output": "",
             "error": "",
             "return_code": None,
-            "execution_time": 0
+            "execution_time": 0,
+            "output_size": 0,
+            "output_truncated": False,
+            "cpu_time": None,
+            "peak_rss_kb": None,
+            "resource_limits": None  # cgroup or rlimit
         }
 
         # Create temporary directory for script execution
         with tempfile.TemporaryDirectory() as temp_dir:
-            script_path = Path(temp_dir) / script_name
+            base = Path(output_base) if output_base else Path(temp_dir) / "output"
+            stdout = OutputSpool(base.with_name(base.name + ".stdout"),
+                                 on_line=functools.partial(on_output, "stdout") if on_output else None)
+            stderr = OutputSpool(base.with_name(base.name + ".stderr"),
+                                 on_line=functools.partial(on_output, "stderr") if on_output else None)
+            if output_base:
+                result["output_path"] = str(stdout.path)
+                result["error_path"] = str(stderr.path)
 
-            # Write script content to file
-            try:
-                script_path.write_text(script_content)
-            except Exception as e:
-                result["error"] = f"Failed to write script: {str(e)}"
-                return result
-
-            # Execute the script
             start_time = time.time()
-
+            worker = None
             try:
-                # Basic sandboxing: run in subprocess with resource limits
-                env = os.environ.copy()
-                # Remove potentially dangerous environment variables
-                env.pop('LD_PRELOAD', None)
-                env.pop('LD_LIBRARY_PATH', None)
-
-                # Run the script with timeout and resource limits
-                process = subprocess.Popen(
-                    ['python3', str(script_path)],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    cwd=temp_dir,
-                    env=env,
-                    preexec_fn=self._set_limits if os.name != 'nt' else None
-                )
+                pool = self._pool or self.start_pool()
+                if pool is not None:
+                    try:
+                        worker = pool.acquire()
+                    except Exception as e:
+                        logger.warning(f"Worker pool unavailable, using a fresh interpreter: {str(e)}")
 
-                try:
-                    stdout, stderr = process.communicate(timeout=self.timeout)
-                    result["return_code"] = process.returncode
-                    result["output"] = stdout.decode('utf-8', errors='ignore')
-                    result["error"] = stderr.decode('utf-8', errors='ignore')
-                    result["success"] = process.returncode == 0
-
-                except subprocess.TimeoutExpired:
-                    process.kill()
-                    result["error"] = f"Script execution timed out after {self.timeout} seconds"
-                    result["return_code"] = -1
-
-            except Exception as e:
-                result["error"] = f"Execution failed: {str(e)}"
-                result["return_code"] = -1
+                if worker is not None:
+                    self._execute_in_worker(pool, worker, script_content, script_name, temp_dir, stdout, stderr, result,
+                                            content_hash, load_source)
+                else:
+                    if script_content is None and load_source is not None:
+                        script_content = load_source()
+                    self._execute_cold(script_content, script_name, temp_dir, stdout, stderr, result)
 
             finally:
                 execution_time = time.time() - start_time
+                _run_time["worker" if worker is not None else "cold"].observe(execution_time)
                 result["execution_time"] = round(execution_time, 2)
+                stdout.close()
+                stderr.close()
+                result["output_size"] = stdout.size + stderr.size
+                result["output_truncated"] = stdout.truncated or stderr.truncated
+                result["output"] = stdout.preview()
+                # Keep error messages from the executor itself
+                if not result["error"]:
+                    result["error"] = stderr.preview()
+                if output_base and settings.RUN_OUTPUT_SEARCH_BYTES > 0:
+                    # Text for the run's full-text index entry
+                    result["search_output"] = stdout.excerpt(settings.RUN_OUTPUT_SEARCH_BYTES)
+                    result["search_errors"] = stderr.excerpt(settings.RUN_OUTPUT_SEARCH_BYTES) or result["error"]
 
         return result
 
-    def _set_limits(self):
-        """Set resource limits for the subprocess (Unix only)"""
+    def _execute_cold(self, script_content: str, script_name: str, temp_dir: str,
+                      stdout: OutputSpool, stderr: OutputSpool, result: Dict[str, Any]):
+        """Run a script in a freshly started interpreter, filling in the result dict"""
+        script_path = Path(temp_dir) / script_name
+        if script_content is None:
+            result["error"] = "Script source not found"
+            return
+
+        # Write script content to file
+        try:
+            script_path.write_text(script_content)
+        except Exception as e:
+            result["error"] = f"Failed to write script: {str(e)}"
+            return
+
+        cgroup = self._create_cgroup("run")
+        result["resource_limits"] = "cgroup" if cgroup is not None else "rlimit"
+        try:
+            # Basic sandboxing: run in subprocess with resource limits
+            env = self._script_env()
+
+            # Run the script with timeout and resource limits
+            spawn_started = time.perf_counter()
+            process = subprocess.Popen(
+                ['python3', str(script_path)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=temp_dir,
+                env=env,
+                preexec_fn=functools.partial(self._set_limits, None, cgroup) if os.name != 'nt' else None
+            )
+
+            _cold_spawn_time.observe(time.perf_counter() - spawn_started)
+
+            # Stream both pipes into the spools while the script runs
+            pumps = [
+                threading.Thread(target=_pump, args=(process.stdout, stdout), daemon=True),
+                threading.Thread(target=_pump, args=(process.stderr, stderr), daemon=True)
+            ]
+            for pump in pumps:
+                pump.start()
+
+            try:
+                if hasattr(os, 'wait4'):
+                    self._wait_with_usage(process, result)
+                else:
+                    process.wait(timeout=self.timeout)
+                result["return_code"] = process.returncode
+                result["success"] = process.returncode == 0
+
+            except subprocess.TimeoutExpired:
+                _timeouts["cold"].inc()
+                process.kill()
+                process.wait()
+                result["error"] = f"Script execution timed out after {self.timeout} seconds"
+                result["return_code"] = -1
+
+            finally:
+                if cgroup is not None:
+                    # Usage of the whole run, including processes the script started; removing ends those
+                    self._read_cgroup_usage(cgroup, result)
+                    cgroup.remove()
+                # Child processes of the script may keep the pipes open
+                for pump in pumps:
+                    pump.join(timeout=1)
+
+        except Exception as e:
+            result["error"] = f"Execution failed: {str(e)}"
+            result["return_code"] = -1
+
+        finally:
+            if cgroup is not None:
+                cgroup.remove()
+
+    def _create_cgroup(self, kind: str) -> Optional[RunCgroup]:
+        """A limited cgroup for a run or pool worker, or None to use rlimits"""
+        if self.cgroups is None or not self.cgroups.available:
+            return None
+        try:
+            return self.cgroups.create(kind, self.memory_limit, self.cpu_limit, self.pids_limit)
+        except OSError as e:
+            logger.warning(f"Could not create cgroup, using rlimits: {str(e)}")
+            return None
+
+    def _read_cgroup_usage(self, cgroup: RunCgroup, result: Dict[str, Any]):
+        """Replace the rusage figures of a cold run with its cgroup's accounting"""
+        cpu_time = cgroup.cpu_time()
+        peak = cgroup.memory_peak()
+        if cpu_time is not None:
+            result["cpu_time"] = round(cpu_time, 4)
+        if peak is not None:
+            result["peak_rss_kb"] = peak // 1024
+        if cgroup.oom_kills() and not result["success"]:
+            result["error"] = self._memory_limit_error()
+
+    def _memory_limit_error(self) -> str:
+        return f"Script exceeded the memory limit of {self.memory_limit // (1024 * 1024)} MB"
+
+    def _wait_with_usage(self, process: subprocess.Popen, result: Dict[str, Any]):
+        """
+        Wait for a script process and record its CPU time and peak RSS
+
+        Reaps the child with wait4() so the resource usage of this one process
+        is available, which Popen.wait() discards.
+
+        Raises:
+            subprocess.TimeoutExpired: if the process was killed after the executor timeout
+        """
+        lock = threading.Lock()
+        state = {"reaped": False, "timed_out": False}
+
+        def kill():
+            with lock:
+                # Until it is reaped the pid cannot be reused, so killing is safe
+                if not state["reaped"]:
+                    state["timed_out"] = True
+                    os.kill(process.pid, signal.SIGKILL)
+
+        timer = threading.Timer(self.timeout, kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            with lock:
+                state["reaped"] = True
+            timer.cancel()
+
+        process.returncode = os.waitstatus_to_exitcode(status)
+        result["cpu_time"] = round(usage.ru_utime + usage.ru_stime, 4)
+        result["peak_rss_kb"] = usage.ru_maxrss
+        if state["timed_out"]:
+            raise subprocess.TimeoutExpired(process.args, self.timeout)
+
+    def _execute_in_worker(self, pool: WorkerPool, worker: PooledWorker, script_content: Optional[str], script_name: str,
+                           temp_dir: str, stdout: OutputSpool, stderr: OutputSpool, result: Dict[str, Any],
+                           content_hash: Optional[str] = None,
+                           load_source: Optional[Callable[[], Optional[str]]] = None):
+        """Run a script in a warm pool worker, filling in the result dict"""
+        try:
+            reply = worker.run(script_content, script_name, temp_dir, stdout, stderr, content_hash, load_source)
+            result["return_code"] = reply["return_code"]
+            result["success"] = result["return_code"] == 0
+            result["cpu_time"] = reply.get("cpu_time")
+            result["peak_rss_kb"] = reply.get("peak_rss_kb")
+            result["resource_limits"] = "cgroup" if worker.cgroup is not None else "rlimit"
+            if reply.get("oom_killed"):
+                result["error"] = self._memory_limit_error()
+
+        except subprocess.TimeoutExpired:
+            _timeouts["worker"].inc()
+            result["error"] = f"Script execution timed out after {self.timeout} seconds"
+            result["return_code"] = -1
+
+        except Exception as e:
+            worker.terminate(kill=True)
+            result["error"] = f"Execution failed: {str(e)}"
+            result["return_code"] = -1
+
+        finally:
+            pool.release(worker)
+
+    def _script_env(self) -> Dict[str, str]:
+        """Environment for script interpreters"""
+        env = os.environ.copy()
+        # Remove potentially dangerous environment variables
+        env.pop('LD_PRELOAD', None)
+        env.pop('LD_LIBRARY_PATH', None)
+        # Stdout is a pipe, which Python would block-buffer: on_output would only see lines at exit
+        env['PYTHONUNBUFFERED'] = '1'
+        return env
+
+    def _set_limits(self, cpu_limit: Optional[int] = None, cgroup: Optional[RunCgroup] = None, nproc: bool = True):
+        """
+        Set resource limits for the subprocess (Unix only)
+
+        In a cgroup, memory and process counts are limited by the cgroup
+        (memory.max, pids.max) rather than RLIMIT_AS, which also counts
+        address space that is reserved but never used, and RLIMIT_NPROC,
+        which counts every process of the user. Total CPU time stays an rlimit.
+        """
+        if cgroup is not None:
+            # Raises, failing the start, rather than running the script without its memory limit
+            cgroup.attach_self()
         if not HAS_RESOURCE:
             return
 
+        cpu_limit = cpu_limit or self.timeout
         try:
-            # Set memory limit
-            resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+            if cgroup is None:
+                # Set memory limit
+                resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+                # Prevent fork bombs
+                if nproc:
+                    resource.setrlimit(resource.RLIMIT_NPROC, (NPROC_LIMIT, NPROC_LIMIT))
             # Set CPU time limit
-            resource.setrlimit(resource.RLIMIT_CPU, (self.timeout, self.timeout))
-            # Prevent fork bombs
-            resource.setrlimit(resource.RLIMIT_NPROC, (10, 10))
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
         except Exception as e:
             logger.warning(f"Could not set resource limits: {str(e)}")
 
-    def validate_script(self, script_content: str) -> Dict[str, Any]:
+    def validate_script(self, script_content: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
         """
         Basic script validation
 
         Args:
             script_content: The Python script content
+            content_hash: Its content hash, if known (results are cached by hash)
 
         Returns:
             Dict with validation results
         """
-        result = {
-            "valid": True,
-            "warnings": [],
-            "errors": []
-        }
-
-        # Check for dangerous imports
-        dangerous_imports = [
-            'os.system', 'subprocess.call', 'subprocess.run', 'subprocess.Popen',
-            'eval', 'exec', 'importlib', 'sys.exit', 'os._exit'
-        ]
-
-        lines = script_content.split('\n')
-        for i, line in enumerate(lines, 1):
-            line = line.strip()
-            for dangerous in dangerous_imports:
-                if dangerous in line and not line.startswith('#'):
-                    result["warnings"].append(
-                        f"Line {i}: Potentially dangerous operation '{dangerous}' detected"
-                    )
-
-        # Check for file operations
-        file_operations = ['open(', 'file(', '.read()', '.write(']
-        for i, line in enumerate(lines, 1):
-            for op in file_operations:
-                if op in line and not line.startswith('#'):
-                    result["warnings"].append(
-                        f"Line {i}: File operation '{op}' detected - ensure proper sandboxing"
-                    )
+        return validate_script(script_content, content_hash)
 
-        return result
+def _pump(stream, spool: OutputSpool):
+    """Copy a pipe into a spool chunk by chunk until EOF"""
+    try:
+        for chunk in iter(lambda: stream.read1(65536), b""):
+            spool.write(chunk)
+    except (OSError, ValueError):
+        pass  # pipe closed while reading
+    finally:
+        stream.close()
 
 # Global executor instance
-executor = ScriptExecutor()
+executor = ScriptExecutor(
+    memory_limit=settings.EXECUTOR_MEMORY_LIMIT_MB * 1024 * 1024,
+    pool_size=settings.EXECUTOR_POOL_SIZE,
+    pool_max_runs=settings.EXECUTOR_POOL_MAX_RUNS,
+    cpu_limit=settings.EXECUTOR_CPU_LIMIT,
+    pids_limit=settings.EXECUTOR_PIDS_LIMIT,
+    cgroups=CgroupManager(settings.EXECUTOR_CGROUPS, settings.EXECUTOR_CGROUP_PATH),
+    bytecode_cache_dir=settings.BYTECODE_CACHE_DIR
+)
+
+def start_worker_pool():
+    """Pre-start the warm interpreter pool"""
+    executor.start_pool()
+
+def stop_worker_pool():
+    """Stop the warm interpreter pool"""
+    executor.stop_pool()
 
-def execute_python_script(script_content: str, script_name: str = "script.py") -> Dict[str, Any]:
+def execute_python_script(script_content: Optional[str], script_name: str = "script.py",
+                          output_base: Optional[Path] = None,
+                          on_output: Optional[Callable[[str, str], None]] = None,
+                          content_hash: Optional[str] = None,
+                          load_source: Optional[Callable[[], Optional[str]]] = None) -> Dict[str, Any]:
     """Convenience function to execute a Python script"""
-    return executor.execute_script(script_content, script_name)
+    return executor.execute_script(script_content, script_name, output_base, on_output, content_hash, load_source)
 
-def validate_python_script(script_content: str) -> Dict[str, Any]:
+def validate_python_script(script_content: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
     """Convenience function to validate a Python script"""
-    return executor.validate_script(script_content)
+    return executor.validate_script(script_content, content_hash)
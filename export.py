@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional, Sequence
+import csv
+import io
+import json
+import zlib
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from starlette.concurrency import iterate_in_threadpool
+
+from audit_archive import audit_archive
+from database import AsyncSessionLocal
+from models import AuditLog, TaskRun
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Rows fetched per round trip from the server-side cursor, and encoded per output chunk
+EXPORT_BATCH_SIZE = 1000
+
+AUDIT_EXPORT_COLUMNS = ["id", "timestamp", "user_id", "action", "resource_type", "resource_id", "details", "ip_address"]
+RUN_EXPORT_COLUMNS = ["id", "task_id", "run_id", "status", "started_at", "finished_at", "queue_wait", "wall_time",
+                      "cpu_time", "peak_rss_kb", "return_code", "output_path", "error_path", "error"]
+
+Batches = AsyncIterator[List[Sequence[Any]]]
+
+async def stream_rows(statement) -> Batches:
+    """
+    Rows of a Core select in batches of tuples, read through a server-side cursor
+
+    Uses its own session, since the response body is sent after the
+    request's dependencies have been closed.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+def audit_log_rows(user_id: Optional[int] = None, resource_type: Optional[str] = None,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None) -> Batches:
+    """Audit logs in the database, oldest first (the timestamp indexes give this order without sorting)"""
+    statement = select(*(AuditLog.__table__.c[name] for name in AUDIT_EXPORT_COLUMNS))
+    if user_id:
+        statement = statement.where(AuditLog.user_id == user_id)
+    if resource_type:
+        statement = statement.where(AuditLog.resource_type == resource_type)
+    if since is not None:
+        statement = statement.where(AuditLog.timestamp >= since)
+    if until is not None:
+        statement = statement.where(AuditLog.timestamp < until)
+    return stream_rows(statement.order_by(AuditLog.timestamp, AuditLog.id))
+
+async def archived_audit_rows(user_id: Optional[int] = None, resource_type: Optional[str] = None,
+                              since: Optional[datetime] = None, until: Optional[datetime] = None) -> Batches:
+    """Archived audit logs, month by month; the files are read in the thread pool, a batch at a time"""
+    events = audit_archive.read(since, until, user_id, resource_type)
+    rows = (tuple(event[name] for name in AUDIT_EXPORT_COLUMNS) for event in events)
+    async for batch in iterate_in_threadpool(_batched(rows, EXPORT_BATCH_SIZE)):
+        yield batch
+
+def task_run_rows(task_id: Optional[int] = None, status: Optional[str] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None) -> Batches:
+    """Task runs, oldest first"""
+    statement = select(*(TaskRun.__table__.c[name] for name in RUN_EXPORT_COLUMNS))
+    if task_id:
+        statement = statement.where(TaskRun.task_id == task_id)
+    if status:
+        statement = statement.where(TaskRun.status == status)
+    if since is not None:
+        statement = statement.where(TaskRun.started_at >= since)
+    if until is not None:
+        statement = statement.where(TaskRun.started_at < until)
+    return stream_rows(statement.order_by(TaskRun.started_at, TaskRun.id))
+
+async def chain(*sources: Batches) -> Batches:
+    for source in sources:
+        async for batch in source:
+            yield batch
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _isoformat(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+_json = json.JSONEncoder(default=_isoformat)
+
+async def encode_ndjson(batches: Batches, columns: List[str]) -> AsyncIterator[str]:
+    encode = _json.encode
+    async for batch in batches:
+        yield "".join([encode(dict(zip(columns, row))) + "\n" for row in batch])
+
+async def encode_csv(batches: Batches, columns: List[str]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+async def gzip_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Compress a text stream into a single gzip member as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(batches: Batches, columns: List[str], export_format: str,
+                    compress: bool, name: str) -> StreamingResponse:
+    """Streaming NDJSON or CSV download of row batches, optionally gzipped"""
+    encode = encode_ndjson if export_format == "ndjson" else encode_csv
+    body = encode(batches, columns)
+    filename = f"{name}.{export_format}"
+    media_type = FORMATS[export_format]
+    if compress:
+        body = gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -0,0 +1,196 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+import functools
+import heapq
+import pickle
+import threading
+import time
+
+from apscheduler.job import Job
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from sqlalchemy import func, select
+
+def _locked(method):
+    """Run a job store method under the store's lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class CachedSQLAlchemyJobStore(SQLAlchemyJobStore):
+    """
+    SQLAlchemy job store that answers the scheduler's per-tick reads from memory
+
+    Every change is still written through to the table, so jobs survive
+    restarts. Next run times falling inside a rolling window (`window_seconds`)
+    are kept in a heap and loaded jobs are cached, so a tick (finding due jobs
+    and the next wakeup) does not query the database; the table is only read
+    when the window moves on. Assumes this process is the only scheduler
+    using the table.
+
+    Methods take the store's own lock, so the batch writes (add_jobs,
+    remove_jobs) can be called from any thread and a scheduler tick never
+    sees half a batch.
+    """
+
+    def __init__(self, *args, window_seconds: int = 3600, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.window_seconds = window_seconds
+        self._lock = threading.RLock()
+        self._reset(0)
+
+    @_locked
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        self.reload()
+
+    @_locked
+    def reload(self):
+        """Rebuild the in-memory window from the table (after writing to it directly)"""
+        self._reset(0)
+        self._load_window(time.time() + self.window_seconds)
+
+    @_locked
+    def next_run_time(self, job_id: str) -> Optional[datetime]:
+        """A job's next run time without loading it"""
+        timestamp = self._next_run.get(job_id)
+        if timestamp is None:
+            with self.engine.connect() as connection:
+                timestamp = connection.execute(
+                    select(self.jobs_t.c.next_run_time).where(self.jobs_t.c.id == job_id)
+                ).scalar()
+        return utc_timestamp_to_datetime(timestamp)
+
+    @_locked
+    def lookup_job(self, job_id):
+        job = self._jobs.get(job_id)
+        return job if job is not None else super().lookup_job(job_id)
+
+    @_locked
+    def get_due_jobs(self, now):
+        timestamp = datetime_to_utc_timestamp(now)
+        if timestamp > self._loaded_until:
+            self._load_window(timestamp + self.window_seconds)
+        due_ids = [job_id for run_time, job_id in sorted(self._heap_head(timestamp))
+                   if self._next_run.get(job_id) == run_time]
+        if not due_ids:
+            return []
+
+        missing = [job_id for job_id in due_ids if job_id not in self._jobs]
+        if missing:
+            for job in self._get_jobs(self.jobs_t.c.id.in_(missing)):
+                self._jobs[job.id] = job
+        return [self._jobs[job_id] for job_id in due_ids if job_id in self._jobs]
+
+    @_locked
+    def get_next_run_time(self):
+        self._drop_stale()
+        if not self._heap:
+            # Nothing left in the window; move it to the next stored run time
+            with self.engine.connect() as connection:
+                earliest = connection.execute(
+                    select(func.min(self.jobs_t.c.next_run_time)).where(self.jobs_t.c.next_run_time > self._loaded_until)
+                ).scalar()
+            if earliest is None:
+                return None
+            self._load_window(earliest + self.window_seconds)
+            self._drop_stale()
+        return utc_timestamp_to_datetime(self._heap[0][0]) if self._heap else None
+
+    @_locked
+    def add_job(self, job):
+        super().add_job(job)
+        self._track(job)
+
+    @_locked
+    def update_job(self, job):
+        super().update_job(job)
+        self._track(job)
+
+    @_locked
+    def remove_job(self, job_id):
+        try:
+            super().remove_job(job_id)
+        finally:
+            self._forget(job_id)
+
+    @_locked
+    def add_jobs(self, jobs: List[Job]):
+        """Add or replace several jobs in one transaction"""
+        rows = [{
+            "id": job.id,
+            "next_run_time": datetime_to_utc_timestamp(job.next_run_time),
+            "job_state": pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        } for job in jobs]
+        with self.engine.begin() as connection:
+            connection.execute(self.jobs_t.delete().where(self.jobs_t.c.id.in_([job.id for job in jobs])))
+            connection.execute(self.jobs_t.insert(), rows)
+        for job in jobs:
+            job._jobstore_alias = self._alias
+            self._track(job)
+
+    @_locked
+    def remove_jobs(self, job_ids: List[str]):
+        """Remove several jobs in one statement; ids without a job are ignored"""
+        with self.engine.begin() as connection:
+            connection.execute(self.jobs_t.delete().where(self.jobs_t.c.id.in_(job_ids)))
+        for job_id in job_ids:
+            self._forget(job_id)
+
+    @_locked
+    def remove_all_jobs(self):
+        super().remove_all_jobs()
+        self._reset(self._loaded_until)
+
+    def _reset(self, loaded_until: float):
+        self._jobs: Dict[str, Job] = {}
+        self._next_run: Dict[str, float] = {}
+        self._heap: List[tuple] = []
+        self._loaded_until = loaded_until
+
+    def _load_window(self, until: float):
+        """Index the run times up to `until` that are not indexed yet"""
+        statement = select(self.jobs_t.c.id, self.jobs_t.c.next_run_time).where(self.jobs_t.c.next_run_time <= until)
+        if self._loaded_until:
+            statement = statement.where(self.jobs_t.c.next_run_time > self._loaded_until)
+        with self.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+        self._loaded_until = until
+        for row in rows:
+            if row.id not in self._next_run:
+                self._next_run[row.id] = row.next_run_time
+                heapq.heappush(self._heap, (row.next_run_time, row.id))
+
+    def _heap_head(self, timestamp: float) -> List[tuple]:
+        """Entries due at `timestamp`; they stay in the heap until their job is updated or removed"""
+        head = []
+        while self._heap and self._heap[0][0] <= timestamp:
+            head.append(heapq.heappop(self._heap))
+        for entry in head:
+            heapq.heappush(self._heap, entry)
+        return head
+
+    def _drop_stale(self):
+        # Entries of updated or removed jobs are left behind and skipped here
+        while self._heap and self._next_run.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _forget(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._next_run.pop(job_id, None)
+
+    def _track(self, job: Job):
+        timestamp = datetime_to_utc_timestamp(job.next_run_time)
+        if timestamp is None or timestamp > self._loaded_until:
+            # Paused, or beyond the window: picked up from the table when the window gets there
+            self._forget(job.id)
+            return
+        self._jobs[job.id] = job
+        self._next_run[job.id] = timestamp
+        heapq.heappush(self._heap, (timestamp, job.id))
+        # Updates leave stale entries behind; compact once they dominate
+        if len(self._heap) > 2 * len(self._next_run) + 1024:
+            self._heap = [(t, job_id) for job_id, t in self._next_run.items()]
+            heapq.heapify(self._heap)
@@ -1,22 +1,52 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from collections import Counter
+from itertools import islice
+from datetime import datetime, timedelta
 import asyncio
+import secrets
+import time
 
-from database import engine, get_db
+from database import sync_schema, get_async_db, AsyncSessionLocal, async_engine
+from config import settings
 from models import Base
-from schemas import UserCreate, User, Token, Agent, AgentCreate, Script, ScriptCreate, Task, TaskCreate, AuditLog
-import crud
+import models
+from schemas import (UserCreate, User, Token, Agent, AgentCreate, AgentBulkUpdate, Script, ScriptCreate, ScriptBulkUpdate,
+                     ScriptSummary, ScriptValidation, ScriptValidationRequest, Task, TaskCreate, TaskBulkUpdate,
+                     TaskScheduleInfo, TaskRun, TaskRunStats, TaskRunSearchHit, DashboardStats, AuditLog, AuditSearchHit, BulkIds, BulkDeleteResult, BulkExecuteResult)
+import async_crud
 import auth
-from scheduler import schedule_task, cancel_task_schedule, start_scheduler, stop_scheduler
-
-Base.metadata.create_all(bind=engine)
+import metrics
+from output_spool import find_run_output
+from script_store import migrate_script_contents
+from search import search_index, match_query
+from export import (AUDIT_EXPORT_COLUMNS, RUN_EXPORT_COLUMNS, audit_log_rows, archived_audit_rows, task_run_rows,
+                    chain, export_response)
+from cache import stats_cache
+from pagination import decode_cursor, set_next_cursor, NEXT_CURSOR_HEADER
+from conditional import make_etag, etag_matches, not_modified, set_etag
+from events import broker, format_sse, task_channel, CHANGES_CHANNEL
+from audit import audit_writer
+from audit_archive import audit_archive
+from passwords import hasher
+from scheduler import (schedule_task, schedule_tasks, reschedule_task, cancel_task_schedule, cancel_task_schedules, next_run_time,
+                       start_scheduler, stop_scheduler, set_task_status, set_tasks_status)
+from schedules import build_trigger, next_fire_times
+from executor import start_worker_pool, stop_worker_pool, validate_python_script
+from execution_engine import engine as execution_engine, EngineBusyError
+
+sync_schema(Base.metadata)
+migrate_script_contents()
+search_index.create()
 
 app = FastAPI()
+_stats_lock = asyncio.Lock()
 
 # Add CORS middleware
 app.add_middleware(
@@ -25,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 # Mount static files
@@ -32,49 +63,55 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize scheduler on startup"""
+    """Initialize scheduler and executor pool on startup"""
+    broker.bind(asyncio.get_running_loop())
+    audit_writer.start()
+    hasher.start()
+    start_worker_pool()
     start_scheduler()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Stop scheduler on shutdown"""
+    """Stop scheduler and executor pool on shutdown, flushing pending audit events"""
     stop_scheduler()
+    stop_worker_pool()
+    hasher.shutdown()
+    audit_writer.stop()
+    await async_engine.dispose()
 
 # Middleware for audit logging
 @app.middleware("http")
 async def audit_middleware(request: Request, call_next):
+    start_time = time.perf_counter()
     response = await call_next(request)
 
-    # Log API calls (excluding health checks and docs)
-    if not request.url.path.startswith(("/docs", "/redoc", "/openapi.json", "/favicon.ico")):
+    # Latency per route template (ids would make a series per object); streamed bodies count until they start
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    metrics.http_request_duration.labels(request.method, route_path).observe(time.perf_counter() - start_time)
+    metrics.http_requests.labels(request.method, route_path, response.status_code).inc()
+
+    # Log API calls (excluding health checks, docs and metrics scrapes)
+    if not request.url.path.startswith(("/docs", "/redoc", "/openapi.json", "/favicon.ico", "/metrics")):
         try:
             # Get current user if authenticated
             auth_header = request.headers.get("authorization", "")
             user_id = None
             if auth_header.startswith("Bearer "):
-                token = auth_header[7:]
-                try:
-                    payload = auth.jwt.decode(token, auth.settings.SECRET_KEY, algorithms=[auth.settings.ALGORITHM])
-                    email = payload.get("sub")
-                    if email:
-                        db = next(get_db())
-                        user = crud.get_user_by_email(db, email)
-                        user_id = user.id if user else None
-                        db.close()
-                except:
-                    pass
-
-            # Log the action
-            db = next(get_db())
-            crud.log_action(
-                db,
+                # Shares the principal cache with auth.get_current_user
+                email = auth.decode_subject(auth_header[7:])
+                if email:
+                    principal = await auth.get_principal(email)
+                    user_id = principal.id if principal else None
+
+            # Queue the action for the background audit writer
+            audit_writer.enqueue(
                 user_id=user_id,
                 action=f"{request.method} {request.url.path}",
                 resource_type="api",
                 details={"method": request.method, "path": request.url.path, "status_code": response.status_code},
                 ip_address=request.client.host if request.client else None
             )
-            db.close()
         except Exception as e:
             # Don't let audit logging break the API
             pass
@@ -82,9 +119,9 @@ async def audit_middleware(request: Request, call_next):
     return response
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -96,20 +133,26 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/register", response_model=User)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user (no authentication required)"""
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await async_crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    # Give the pooled connection back while bcrypt runs
+    await db.rollback()
+    hashed_password = await hasher.hash(user.password)
+    return await async_crud.create_user(db=db, user=user, hashed_password=hashed_password)
 
 @app.post("/users/", response_model=User)
-def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
     """Create user (requires authentication - for admin use)"""
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await async_crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    # Give the pooled connection back while bcrypt runs
+    await db.rollback()
+    hashed_password = await hasher.hash(user.password)
+    return await async_crud.create_user(db=db, user=user, hashed_password=hashed_password)
 
 @app.get("/users/me/", response_model=User)
 def read_users_me(current_user: User = Depends(auth.get_current_user)):
@@ -120,126 +163,472 @@ def logout():
     """Client-side logout endpoint (tokens are stateless, so just return success)"""
     return {"message": "Logged out successfully"}
 
+# Bulk endpoints: a batch is validated as a whole before anything is written,
+# then written in one transaction with one statement per table
+def _check_batch_size(size: int):
+    if size == 0:
+        raise HTTPException(status_code=422, detail="Empty batch")
+    if size > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_MAX_ITEMS} items per request")
+
+def _check_unique_ids(ids: List[int]):
+    duplicates = sorted(item_id for item_id, count in Counter(ids).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=422, detail={"message": "Duplicate ids", "ids": duplicates})
+
+async def _check_ids(db: AsyncSession, model, ids: List[int], label: str):
+    """Size, uniqueness and existence checks of the ids a bulk request works on"""
+    _check_batch_size(len(ids))
+    _check_unique_ids(ids)
+    missing = await async_crud.get_missing_ids(db, model, ids)
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": f"{label} not found", "ids": missing})
+
+async def _check_task_references(db: AsyncSession, tasks: list):
+    for model, field, label in ((models.Script, "script_id", "Script"), (models.Agent, "agent_id", "Agent")):
+        missing = await async_crud.get_missing_ids(db, model, list({getattr(task, field) for task in tasks}))
+        if missing:
+            raise HTTPException(status_code=422, detail={"message": f"{label} not found", "ids": missing})
+
 # Agent endpoints
 @app.get("/agents/", response_model=List[Agent])
-def read_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    agents = crud.get_agents(db, skip=skip, limit=limit)
+async def read_agents(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    agents = await async_crud.get_agents(db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, agents, limit, "id")
     return agents
 
+@app.post("/agents/bulk", response_model=List[Agent])
+async def create_agents(agents: List[AgentCreate], db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    _check_batch_size(len(agents))
+    return await async_crud.create_agents(db, agents)
+
+@app.put("/agents/bulk", response_model=List[Agent])
+async def update_agents(agents: List[AgentBulkUpdate], db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    await _check_ids(db, models.Agent, [agent.id for agent in agents], "Agent")
+    return await async_crud.update_agents(db, agents)
+
+@app.post("/agents/bulk/delete", response_model=BulkDeleteResult)
+async def delete_agents(batch: BulkIds, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    await _check_ids(db, models.Agent, batch.ids, "Agent")
+    return {"deleted": await async_crud.delete_agents(db, batch.ids)}
+
 @app.get("/agents/{agent_id}", response_model=Agent)
-def read_agent(agent_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_agent = crud.get_agent(db, agent_id=agent_id)
+async def read_agent(agent_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_agent = await async_crud.get_agent(db, agent_id=agent_id)
     if db_agent is None:
         raise HTTPException(status_code=404, detail="Agent not found")
     return db_agent
 
 @app.post("/agents/", response_model=Agent)
-def create_agent(agent: AgentCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    return crud.create_agent(db=db, agent=agent)
+async def create_agent(agent: AgentCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    return await async_crud.create_agent(db=db, agent=agent)
 
 @app.put("/agents/{agent_id}", response_model=Agent)
-def update_agent(agent_id: int, agent: AgentCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_agent = crud.update_agent(db, agent_id=agent_id, agent=agent)
+async def update_agent(agent_id: int, agent: AgentCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_agent = await async_crud.update_agent(db, agent_id=agent_id, agent=agent)
     if db_agent is None:
         raise HTTPException(status_code=404, detail="Agent not found")
     return db_agent
 
 @app.delete("/agents/{agent_id}", response_model=Agent)
-def delete_agent(agent_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_agent = crud.delete_agent(db, agent_id=agent_id)
+async def delete_agent(agent_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_agent = await async_crud.delete_agent(db, agent_id=agent_id)
     if db_agent is None:
         raise HTTPException(status_code=404, detail="Agent not found")
     return db_agent
 
 # Script endpoints
-@app.get("/scripts/", response_model=List[Script])
-def read_scripts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    scripts = crud.get_scripts(db, skip=skip, limit=limit)
+def _with_validation(db_script) -> Script:
+    """Script response with its validation result, which is computed once per content (at save time)"""
+    return Script.model_validate(db_script).model_copy(
+        update={"validation": ScriptValidation(**validate_python_script(db_script.content, db_script.content_hash))}
+    )
+
+@app.get("/scripts/", response_model=List[ScriptSummary])
+async def read_scripts(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    scripts = await async_crud.get_scripts(db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, scripts, limit, "id")
     return scripts
 
+@app.post("/scripts/bulk", response_model=List[Script])
+async def create_scripts(scripts: List[ScriptCreate], db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    _check_batch_size(len(scripts))
+    return [_with_validation(db_script) for db_script in await async_crud.create_scripts(db, scripts)]
+
+@app.put("/scripts/bulk", response_model=List[Script])
+async def update_scripts(scripts: List[ScriptBulkUpdate], db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    await _check_ids(db, models.Script, [script.id for script in scripts], "Script")
+    return [_with_validation(db_script) for db_script in await async_crud.update_scripts(db, scripts)]
+
+@app.post("/scripts/bulk/delete", response_model=BulkDeleteResult)
+async def delete_scripts(batch: BulkIds, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    await _check_ids(db, models.Script, batch.ids, "Script")
+    return {"deleted": await async_crud.delete_scripts(db, batch.ids)}
+
 @app.get("/scripts/{script_id}", response_model=Script)
-def read_script(script_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_script = crud.get_script(db, script_id=script_id)
+async def read_script(script_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    # Check If-None-Match against the version columns before loading the body
+    version = await async_crud.get_script_version(db, script_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+    etag = make_etag(*version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    db_script = await async_crud.get_script(db, script_id=script_id)
     if db_script is None:
         raise HTTPException(status_code=404, detail="Script not found")
-    return db_script
+    set_etag(response, make_etag(db_script.content_hash, db_script.updated_at))
+    return _with_validation(db_script)
+
+@app.post("/scripts/validate", response_model=ScriptValidation)
+async def validate_script(script: ScriptValidationRequest, current_user: User = Depends(auth.get_current_user)):
+    """Check a script body without saving it; results are cached by content hash"""
+    return validate_python_script(script.content)
 
 @app.post("/scripts/", response_model=Script)
-def create_script(script: ScriptCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    return crud.create_script(db=db, script=script)
+async def create_script(script: ScriptCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_script = await async_crud.create_script(db=db, script=script)
+    return _with_validation(db_script)
 
 @app.put("/scripts/{script_id}", response_model=Script)
-def update_script(script_id: int, script: ScriptCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_script = crud.update_script(db, script_id=script_id, script=script)
+async def update_script(script_id: int, script: ScriptCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_script = await async_crud.update_script(db, script_id=script_id, script=script)
     if db_script is None:
         raise HTTPException(status_code=404, detail="Script not found")
-    return db_script
+    return _with_validation(db_script)
 
 @app.delete("/scripts/{script_id}", response_model=Script)
-def delete_script(script_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_script = crud.delete_script(db, script_id=script_id)
+async def delete_script(script_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_script = await async_crud.delete_script(db, script_id=script_id)
     if db_script is None:
         raise HTTPException(status_code=404, detail="Script not found")
     return db_script
 
 # Task endpoints
 @app.get("/tasks/", response_model=List[Task])
-def read_tasks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    tasks = crud.get_tasks(db, skip=skip, limit=limit)
+async def read_tasks(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    tasks = await async_crud.get_tasks(db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, tasks, limit, "id")
     return tasks
 
+@app.post("/tasks/bulk", response_model=List[Task])
+async def create_tasks(tasks: List[TaskCreate], db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    _check_batch_size(len(tasks))
+    await _check_task_references(db, tasks)
+    db_tasks = await async_crud.create_tasks(db, tasks)
+    # Job store writes use the sync engine and may wait on the write lock; keep them off the event loop
+    await run_in_threadpool(schedule_tasks, [task for task in db_tasks if task.scheduled_time or task.cron_expression or task.interval_seconds])
+    return db_tasks
+
+@app.put("/tasks/bulk", response_model=List[Task])
+async def update_tasks(tasks: List[TaskBulkUpdate], db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    await _check_ids(db, models.Task, [task.id for task in tasks], "Task")
+    await _check_task_references(db, tasks)
+    db_tasks = await async_crud.update_tasks(db, tasks)
+    await run_in_threadpool(schedule_tasks, db_tasks)
+    return db_tasks
+
+@app.post("/tasks/bulk/delete", response_model=BulkDeleteResult)
+async def delete_tasks(batch: BulkIds, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    await _check_ids(db, models.Task, batch.ids, "Task")
+    deleted = await async_crud.delete_tasks(db, batch.ids)
+    await run_in_threadpool(cancel_task_schedules, deleted)
+    return {"deleted": deleted}
+
+@app.post("/tasks/bulk/execute", response_model=BulkExecuteResult)
+async def execute_tasks_now(batch: BulkIds, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Start or queue many tasks; those that do not fit in the execution queue are returned as rejected"""
+    from scheduler import execute_task
+
+    _check_batch_size(len(batch.ids))
+    _check_unique_ids(batch.ids)
+    agent_ids = await async_crud.get_task_agent_ids(db, batch.ids)
+    missing = sorted(set(batch.ids) - set(agent_ids))
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Task not found", "ids": missing})
+
+    result = BulkExecuteResult()
+    admissions = []
+    for task_id in batch.ids:
+        queued = not execution_engine.has_capacity(agent_ids[task_id])
+        try:
+            admissions.append((task_id, execution_engine.admit(agent_ids[task_id])))
+        except EngineBusyError:
+            result.rejected.append(task_id)
+            continue
+        (result.queued if queued else result.started).append(task_id)
+    if not admissions:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Execution queue is full",
+            headers={"Retry-After": "1"},
+        )
+    if result.queued:
+        await set_tasks_status(db, result.queued, "queued")
+
+    for task_id, admission in admissions:
+        asyncio.create_task(execute_task(task_id, admission))
+    return result
+
 @app.get("/tasks/{task_id}", response_model=Task)
-def read_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_task = crud.get_task(db, task_id=task_id)
+async def read_task(task_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_task = await async_crud.get_task(db, task_id=task_id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
 @app.post("/tasks/", response_model=Task)
-def create_task(task: TaskCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_task = crud.create_task(db=db, task=task)
+async def create_task(task: TaskCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_task = await async_crud.create_task(db=db, task=task)
 
-    # Schedule the task if it has a scheduled_time
-    if task.scheduled_time:
-        schedule_task(db_task.id, task.scheduled_time)
+    # Schedule the task if it has a scheduled_time or a recurring schedule
+    if task.scheduled_time or task.cron_expression or task.interval_seconds:
+        await run_in_threadpool(schedule_task, db_task.id, task.scheduled_time, task.cron_expression,
+                                task.interval_seconds, task.jitter_seconds)
 
     return db_task
 
 @app.put("/tasks/{task_id}", response_model=Task)
-def update_task(task_id: int, task: TaskCreate, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_task = crud.update_task(db, task_id=task_id, updates=task.dict())
+async def update_task(task_id: int, task: TaskCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_task = await async_crud.update_task(db, task_id=task_id, updates=task.dict())
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    await run_in_threadpool(reschedule_task, db_task)
     return db_task
 
+@app.get("/tasks/{task_id}/schedule", response_model=TaskScheduleInfo)
+async def read_task_schedule(task_id: int, count: int = Query(5, ge=1, le=100), db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Next run of a task's job and a preview of its upcoming fire times"""
+    db_task = await async_crud.get_task(db, task_id=task_id)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    trigger = build_trigger(db_task.scheduled_time, db_task.cron_expression, db_task.interval_seconds, db_task.jitter_seconds)
+    job_next_run = await run_in_threadpool(next_run_time, task_id)
+    return {
+        "task_id": task_id,
+        "recurring": bool(db_task.cron_expression or db_task.interval_seconds),
+        "next_run_time": job_next_run,
+        "upcoming": next_fire_times(trigger, count, next_run_time=job_next_run) if trigger else []
+    }
+
 @app.delete("/tasks/{task_id}", response_model=Task)
-def delete_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    db_task = crud.delete_task(db, task_id=task_id)
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_task = await async_crud.delete_task(db, task_id=task_id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    # Scheduled runs are persisted, so they would otherwise outlive the task
+    await run_in_threadpool(cancel_task_schedule, task_id)
     return db_task
 
 # Audit log endpoints
 @app.get("/audit/", response_model=List[AuditLog])
-def read_audit_logs(skip: int = 0, limit: int = 100, user_id: int = None, resource_type: str = None, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    audit_logs = crud.get_audit_logs(db, skip=skip, limit=limit, user_id=user_id, resource_type=resource_type)
+async def read_audit_logs(response: Response, skip: int = 0, limit: int = 100, user_id: int = None, resource_type: str = None, since: Optional[datetime] = None, until: Optional[datetime] = None, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    before = decode_cursor(cursor, (datetime, int)) if cursor else None
+    audit_logs = await async_crud.get_audit_logs(db, skip=skip, limit=limit, user_id=user_id, resource_type=resource_type, before=before, since=since, until=until)
+    set_next_cursor(response, audit_logs, limit, "timestamp", "id")
     return audit_logs
 
+def _search_query(q: str) -> str:
+    """FTS5 query for a search string; 503 without a search index, 422 for an empty search"""
+    if not search_index.enabled:
+        raise HTTPException(status_code=503, detail="Full-text search is not available")
+    query = match_query(q)
+    if query is None:
+        raise HTTPException(status_code=422, detail="Search query is empty")
+    return query
+
+def _search_hits(schema, rows) -> list:
+    return [schema.model_validate(obj).model_copy(update={"rank": rank, "snippet": snippet}) for obj, rank, snippet in rows]
+
+@app.get("/audit/search", response_model=List[AuditSearchHit])
+async def search_audit_logs(response: Response, q: str, limit: int = Query(100, ge=1, le=1000), user_id: int = None, resource_type: str = None, since: Optional[datetime] = None, until: Optional[datetime] = None, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Audit logs whose action, resource type or details match every term of `q`, best match first"""
+    after = decode_cursor(cursor, (float, int)) if cursor else None
+    rows = await async_crud.search_audit_logs(db, _search_query(q), limit=limit, user_id=user_id, resource_type=resource_type, since=since, until=until, after=after)
+    hits = _search_hits(AuditSearchHit, rows)
+    set_next_cursor(response, hits, limit, "rank", "id")
+    return hits
+
+@app.get("/audit/export")
+async def export_audit_logs(export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"), compress: bool = Query(False, alias="gzip"), user_id: int = None, resource_type: str = None, since: Optional[datetime] = None, until: Optional[datetime] = None, include_archive: bool = False, current_user: User = Depends(auth.get_current_user)):
+    """Stream audit logs, oldest first, as NDJSON or CSV; with `include_archive` archived months come first"""
+    rows = audit_log_rows(user_id, resource_type, since, until)
+    if include_archive:
+        rows = chain(archived_audit_rows(user_id, resource_type, since, until), rows)
+    return export_response(rows, AUDIT_EXPORT_COLUMNS, export_format, compress, "audit-logs")
+
+@app.get("/audit/archive", response_model=List[AuditLog])
+def read_audit_archive(response: Response, limit: int = Query(100, ge=1, le=10000), user_id: int = None, resource_type: str = None, since: Optional[datetime] = None, until: Optional[datetime] = None, cursor: Optional[str] = None, current_user: User = Depends(auth.get_current_user)):
+    """Archived audit events, oldest first; only the months between `since` and `until` are read"""
+    after = decode_cursor(cursor, (datetime, int)) if cursor else None
+    events = list(islice(audit_archive.read(since, until, user_id, resource_type, after), limit))
+    set_next_cursor(response, [AuditLog(**event) for event in events], limit, "timestamp", "id")
+    return events
+
+@app.get("/audit/archive/months")
+def read_audit_archive_months(current_user: User = Depends(auth.get_current_user)):
+    """Archived months with their part count and compressed size"""
+    return audit_archive.months()
+
+@app.get("/audit/stats")
+def read_audit_stats(current_user: User = Depends(auth.get_current_user)):
+    """Audit writer queue depth and write/drop counters"""
+    return audit_writer.stats()
+
 # Task execution endpoint
 @app.post("/tasks/{task_id}/execute")
-async def execute_task_now(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
+async def execute_task_now(task_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
     """Manually execute a task immediately"""
     from scheduler import execute_task
 
-    task = crud.get_task(db, task_id)
+    task = await async_crud.get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    # Reserve a place in the bounded execution queue
+    queued = not execution_engine.has_capacity(task.agent_id)
+    try:
+        admission = execution_engine.admit(task.agent_id)
+    except EngineBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Execution queue is full",
+            headers={"Retry-After": "1"},
+        )
+    if queued:
+        await set_task_status(db, task_id, "queued")
+
     # Run execution in background
-    import asyncio
-    asyncio.create_task(execute_task(task_id))
+    asyncio.create_task(execute_task(task_id, admission))
+
+    if queued:
+        return {"message": f"Task {task_id} queued for execution", "status": "queued"}
+    return {"message": f"Task {task_id} execution started", "status": "running"}
+
+@app.get("/tasks/runs/search", response_model=List[TaskRunSearchHit])
+async def search_task_runs(response: Response, q: str, limit: int = Query(100, ge=1, le=1000), task_id: Optional[int] = None, status: Optional[str] = None, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Task runs whose captured output or errors match every term of `q`, best match first"""
+    after = decode_cursor(cursor, (float, int)) if cursor else None
+    rows = await async_crud.search_task_runs(db, _search_query(q), limit=limit, task_id=task_id, status=status, after=after)
+    hits = _search_hits(TaskRunSearchHit, rows)
+    set_next_cursor(response, hits, limit, "rank", "id")
+    return hits
+
+@app.get("/tasks/runs/export")
+async def export_task_runs(export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"), compress: bool = Query(False, alias="gzip"), task_id: Optional[int] = None, status: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None, current_user: User = Depends(auth.get_current_user)):
+    """Stream the run history of all tasks (or one), oldest first, as NDJSON or CSV"""
+    rows = task_run_rows(task_id, status, since, until)
+    return export_response(rows, RUN_EXPORT_COLUMNS, export_format, compress, "task-runs")
+
+@app.get("/tasks/{task_id}/runs", response_model=List[TaskRun])
+async def read_task_runs(task_id: int, response: Response, skip: int = 0, limit: int = 100, status: Optional[str] = None, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Run history of a task, newest first"""
+    before = decode_cursor(cursor, (datetime, int)) if cursor else None
+    runs = await async_crud.get_task_runs(db, task_id, skip=skip, limit=limit, status=status, before=before)
+    set_next_cursor(response, runs, limit, "started_at", "id")
+    return runs
+
+@app.get("/tasks/{task_id}/runs/stats", response_model=TaskRunStats)
+async def read_task_run_stats(task_id: int, since: Optional[datetime] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Run count, failure rate and p50/p95 wall time of a task's runs, optionally since a point in time"""
+    return await async_crud.get_task_run_stats(db, task_id, since=since)
+
+@app.get("/tasks/{task_id}/runs/{run_id}", response_model=TaskRun)
+async def read_task_run(task_id: int, run_id: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    db_run = await async_crud.get_task_run(db, task_id, run_id)
+    if db_run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return db_run
+
+@app.get("/tasks/{task_id}/runs/{run_id}/output")
+def read_task_run_output(task_id: int, run_id: str, stream: str = "stdout", current_user: User = Depends(auth.get_current_user)):
+    """Serve the spooled stdout/stderr of a task run (supports HTTP Range requests)"""
+    path = find_run_output(task_id, run_id, stream)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Run output not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
+
+@app.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: int, request: Request, current_user: User = Depends(auth.get_stream_user)):
+    """Server-Sent Events stream of a task's status transitions and live output lines"""
+    async with AsyncSessionLocal() as db:
+        task = await async_crud.get_task(db, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    initial = {"type": "status", "task_id": task_id, "status": task.status, "run_id": None}
+
+    subscription = broker.subscribe(task_channel(task_id))
 
-    return {"message": f"Task {task_id} execution started"}
+    async def event_stream():
+        try:
+            yield format_sse(initial)
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=15)
+                # Comment lines keep proxies from closing an idle stream
+                yield format_sse(event) if event else ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/events")
+async def stream_changes(request: Request, resources: str = None, current_user: User = Depends(auth.get_stream_user)):
+    """
+    Server-Sent Events feed of created/updated/deleted agents, scripts, tasks and audit logs
+
+    `resources` optionally limits the feed to a comma-separated list of resource types.
+    A `resync` event is sent when the client fell behind and missed changes.
+    """
+    wanted = set(resources.split(",")) if resources else None
+    subscription = broker.subscribe(CHANGES_CHANNEL)
+
+    async def event_stream():
+        try:
+            yield format_sse({"type": "ready"})
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=15)
+                if subscription.dropped:
+                    subscription.dropped = 0
+                    yield format_sse({"type": "resync"})
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif wanted is None or event["resource"] in wanted:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/stats", response_model=DashboardStats)
+async def read_stats(window_hours: int = Query(24, ge=1, le=24 * 30), db: AsyncSession = Depends(get_async_db), current_user: User = Depends(auth.get_current_user)):
+    """Dashboard overview: counts by status and run activity over the last `window_hours`, cached for STATS_CACHE_TTL seconds"""
+    stats = stats_cache.get(window_hours)
+    if stats is None:
+        # One refresh at a time; requests arriving meanwhile get its result
+        async with _stats_lock:
+            stats = stats_cache.get(window_hours)
+            if stats is None:
+                now = datetime.utcnow()
+                stats = await async_crud.get_dashboard_stats(db, now - timedelta(hours=window_hours))
+                stats["generated_at"] = now
+                stats_cache.set(window_hours, stats)
+    return {**stats, "executor": execution_engine.stats()}
+
+@app.get("/metrics")
+def read_metrics(request: Request):
+    """Prometheus metrics; requires `Authorization: Bearer <METRICS_TOKEN>` when a token is configured"""
+    if settings.METRICS_TOKEN and not secrets.compare_digest(request.headers.get("authorization", ""),
+                                                            f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/executor/stats")
+def read_executor_stats(current_user: User = Depends(auth.get_current_user)):
+    """Execution queue depth, concurrency and wait-time counters"""
+    return execution_engine.stats()
 
 @app.get("/login")
 def get_login():
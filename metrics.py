@@ -0,0 +1,294 @@
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+import contextvars
+import functools
+import inspect
+import math
+import threading
+import time
+import weakref
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds, from a fast query to a long script run
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+registry: List[Any] = []
+# Set while a function wrapped by instrument_module() runs; calls nested in it are not observed again
+_in_timed_call = contextvars.ContextVar("in_timed_call", default=False)
+
+class _Sentinel:
+    """Per-thread object whose collection marks the thread as gone"""
+
+    __slots__ = ("__weakref__",)
+
+class _Shards:
+    """
+    Values of one metric child, kept per thread
+
+    Each thread only ever writes to its own array, so observations need no
+    lock and are never lost; the lock is only taken when a thread records its
+    first value, when a thread exits and when a scrape sums the arrays. The
+    array of a thread that has exited is folded into `_retired`, so short-lived
+    threads do not add up.
+    """
+
+    __slots__ = ("size", "local", "_arrays", "_retired", "_lock")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.local = threading.local()  # .array is the calling thread's values
+        self._arrays: List[list] = []
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def new_array(self) -> list:
+        """Create the calling thread's array on its first observation"""
+        array = [0] * self.size
+        with self._lock:
+            self._arrays.append(array)
+        self.local.array = array
+        # Freed with the thread's local storage when the thread exits
+        self.local.sentinel = sentinel = _Sentinel()
+        weakref.finalize(sentinel, self._retire, array)
+        return array
+
+    def _retire(self, array: list):
+        with self._lock:
+            for index, live in enumerate(self._arrays):
+                if live is array:
+                    del self._arrays[index]
+                    break
+            self._retired = [total + value for total, value in zip(self._retired, array)]
+
+    def totals(self) -> list:
+        with self._lock:
+            arrays = list(self._arrays)
+            retired = self._retired
+        return [sum(values) for values in zip(retired, *arrays)]
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def labels(self, *values):
+        """The child for a set of label values; look it up once and keep it on hot paths"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[Tuple[str, Tuple, Any]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_labels(labels)} {_number(value)}")
+        return lines
+
+class _CounterChild:
+    __slots__ = ("_shards", "_local")
+
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._local = self._shards.local
+
+    def inc(self, amount: float = 1):
+        try:
+            array = self._local.array
+        except AttributeError:
+            array = self._shards.new_array()
+        array[0] += amount
+
+class Counter(_Metric):
+    """Monotonic count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._default = None if self.labelnames else self.labels()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _samples(self):
+        return [("", tuple(zip(self.labelnames, values)), child._shards.totals()[0])
+                for values, child in list(self._children.items())]
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_shards", "_local")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One slot per bucket, one for +Inf, then the sum
+        self._shards = _Shards(len(bounds) + 2)
+        self._local = self._shards.local
+
+    def observe(self, value: float):
+        try:
+            array = self._local.array
+        except AttributeError:
+            array = self._shards.new_array()
+        array[bisect_left(self._bounds, value)] += 1
+        array[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+        self._default = None if self.labelnames else self.labels()
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _samples(self):
+        samples = []
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            totals = child._shards.totals()
+            if self.labelnames and not any(totals):
+                continue  # e.g. crud functions never called; keeps the scrape small
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), totals):
+                cumulative += count
+                samples.append(("_bucket", labels + (("le", bound),), cumulative))
+            samples.append(("_sum", labels, totals[-1]))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+class CallbackMetric(_Metric):
+    """Value read from the owning component when scraped, e.g. a queue depth"""
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float], kind: str = "gauge"):
+        self.kind = kind
+        self.fn = fn
+        super().__init__(name, documentation)
+
+    def _samples(self):
+        return [("", (), self.fn())]
+
+def instrument_module(namespace: Dict[str, Any], histogram: Histogram):
+    """
+    Time every public function defined in a module, labelled with its name
+
+    Call at the end of the module with globals(); other modules import the
+    wrapped functions. Children are created here, so a call only adds a
+    clock read and an observation. Module-internal calls go through the
+    wrappers too, so only the outermost timed call is observed (e.g.
+    update_agent, not the get_agent it calls).
+    """
+    module = namespace["__name__"]
+    for name, fn in list(namespace.items()):
+        if name.startswith("_") or not inspect.isfunction(fn) or fn.__module__ != module:
+            continue
+        namespace[name] = _timed(fn, histogram.labels(module, name))
+
+def _timed(fn: Callable, child: _HistogramChild) -> Callable:
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def timed(*args, **kwargs):
+            if _in_timed_call.get():
+                return await fn(*args, **kwargs)
+            token = _in_timed_call.set(True)
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+                _in_timed_call.reset(token)
+    else:
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if _in_timed_call.get():
+                return fn(*args, **kwargs)
+            token = _in_timed_call.set(True)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+                _in_timed_call.reset(token)
+    return timed
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format"""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def _labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(_number(value) if name == "le" else value)}"'
+                          for name, value in labels) + "}"
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: Any) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+# HTTP, from the middleware in main.py; the route is the path template, so ids do not create series
+http_request_duration = Histogram("http_request_duration_seconds", "Time until the response starts, per route",
+                                  ["method", "route"])
+http_requests = Counter("http_requests_total", "Responses per route and status code", ["method", "route", "status"])
+# Database, per crud/async_crud function
+db_query_duration = Histogram("db_query_duration_seconds", "Duration of crud functions", ["module", "function"])
+# Scheduler
+scheduler_lag = Histogram("scheduler_lag_seconds", "Delay between a job's scheduled time and its start")
+scheduler_missed_runs = Counter("scheduler_missed_runs_total", "Job runs skipped after the misfire grace time")
+# Executor
+executor_queue_wait = Histogram("executor_queue_wait_seconds", "Time runs waited for an execution slot")
+executor_spawn_duration = Histogram("executor_spawn_seconds", "Time to start an interpreter", ["kind"])
+executor_run_duration = Histogram("executor_run_seconds", "Script run time", ["mode"])
+executor_timeouts = Counter("executor_timeouts_total", "Runs killed at the executor timeout", ["mode"])
+# Audit writer
+audit_flush_duration = Histogram("audit_flush_duration_seconds", "Time to write one batch of audit events")
+audit_write_delay = Histogram("audit_write_delay_seconds", "Time from queueing the oldest event of a batch to its commit")
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -22,17 +22,31 @@ class Agent(Base):
 
     tasks = relationship("Task", back_populates="agent")
 
+class ScriptContent(Base):
+    __tablename__ = "script_contents"
+
+    hash = Column(String, primary_key=True)  # SHA-256 of the UTF-8 source
+    content = Column(String)  # The actual Python script content, shared by scripts with the same source
+    size = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Script(Base):
     __tablename__ = "scripts"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(String)
-    content = Column(String)  # The actual Python script content
+    content_hash = Column(String, ForeignKey("script_contents.hash"), index=True)
     filename = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    body = relationship("ScriptContent", lazy="joined")
     tasks = relationship("Task", back_populates="script")
 
+    @property
+    def content(self):
+        return self.body.content if self.body is not None else None
+
 class Task(Base):
     __tablename__ = "tasks"
 
@@ -42,22 +56,54 @@ class Task(Base):
     script_id = Column(Integer, ForeignKey("scripts.id"), index=True)
     agent_id = Column(Integer, ForeignKey("agents.id"), index=True)
     status = Column(String, default="pending")  # pending, running, completed, failed
-    scheduled_time = Column(DateTime, nullable=True)
+    scheduled_time = Column(DateTime, nullable=True)  # one-shot run, or first run of a recurring schedule
+    cron_expression = Column(String, nullable=True)  # five-field crontab, UTC
+    interval_seconds = Column(Integer, nullable=True)
+    jitter_seconds = Column(Integer, nullable=True)  # random delay added to each recurring run
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     script = relationship("Script", back_populates="tasks")
     agent = relationship("Agent", back_populates="tasks")
 
+class TaskRun(Base):
+    __tablename__ = "task_runs"
+    # Newest-first history and duration percentiles per task, recent runs of all tasks
+    __table_args__ = (
+        Index("ix_task_runs_task_id_started_at", "task_id", "started_at"),
+        Index("ix_task_runs_task_id_wall_time", "task_id", "wall_time"),
+        Index("ix_task_runs_started_at", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"))
+    run_id = Column(String, unique=True)  # also names the run's output spool files
+    status = Column(String)  # completed, failed
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    queue_wait = Column(Float, nullable=True)  # seconds between admission and getting a slot
+    wall_time = Column(Float, nullable=True)  # seconds
+    cpu_time = Column(Float, nullable=True)  # user + system seconds of the interpreter
+    peak_rss_kb = Column(Integer, nullable=True)
+    return_code = Column(Integer, nullable=True)
+    output_path = Column(String, nullable=True)
+    error_path = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Filtered, newest-first listings; the rowid (id) is the implicit tie-breaker in each index
+    __table_args__ = (
+        Index("ix_audit_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_audit_logs_resource_type_timestamp", "resource_type", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     action = Column(String)  # create, update, delete, execute, login, etc.
     resource_type = Column(String)  # agent, script, task, user
     resource_id = Column(Integer, nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     details = Column(String, nullable=True)  # JSON string with additional info
     ip_address = Column(String, nullable=True)
 
@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import Optional, Callable
+import logging
+import re
+import time
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RUN_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+STREAMS = ("stdout", "stderr")
+# Longest partial line held back before it is emitted anyway
+LINE_LIMIT = 64 * 1024
+
+class OutputSpool:
+    """
+    Size-capped spool file for one output stream of a run
+
+    The first `head_limit` bytes go straight to disk; after that only the
+    last `tail_limit` bytes are kept in a ring buffer and appended, behind a
+    truncation marker, when the spool is closed. Memory use is bounded by
+    the tail size however much a script prints. If `on_line` is given, every
+    complete line is also passed to it as it arrives.
+    """
+
+    def __init__(self, path: Path, head_limit: int = settings.RUN_OUTPUT_HEAD_BYTES,
+                 tail_limit: int = settings.RUN_OUTPUT_TAIL_BYTES,
+                 on_line: Optional[Callable[[str], None]] = None):
+        self.path = Path(path)
+        self.head_limit = head_limit
+        self.tail_limit = tail_limit
+        self.on_line = on_line
+        self.size = 0
+        self._head_written = 0
+        self._tail = bytearray()
+        self._partial = b""
+        self._file = open(self.path, "wb")
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > self.head_limit + self.tail_limit
+
+    def write(self, data: bytes):
+        """Append a chunk of output"""
+        self.size += len(data)
+        if self.on_line is not None:
+            self._emit_lines(data)
+        if self._head_written < self.head_limit:
+            head = data[:self.head_limit - self._head_written]
+            self._file.write(head)
+            self._head_written += len(head)
+            data = data[len(head):]
+        if data:
+            self._tail += data
+            if len(self._tail) > self.tail_limit:
+                del self._tail[:len(self._tail) - self.tail_limit]
+
+    def _emit_lines(self, data: bytes):
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        if len(self._partial) > LINE_LIMIT:
+            lines.append(self._partial)
+            self._partial = b""
+        for line in lines:
+            self.on_line(line.decode('utf-8', errors='ignore'))
+
+    def close(self):
+        """Flush the retained tail and close the file"""
+        if self._file.closed:
+            return
+        if self.on_line is not None and self._partial:
+            self.on_line(self._partial.decode('utf-8', errors='ignore'))
+            self._partial = b""
+        dropped = self.size - self._head_written - len(self._tail)
+        if dropped:
+            self._file.write(f"\n... [{dropped} bytes truncated] ...\n".encode())
+        self._file.write(self._tail)
+        self._tail = bytearray()
+        self._file.close()
+
+    def preview(self, limit: int = settings.RUN_OUTPUT_PREVIEW_BYTES) -> str:
+        """Beginning of the spooled output as text"""
+        with open(self.path, "rb") as f:
+            return f.read(limit).decode('utf-8', errors='ignore')
+
+    def excerpt(self, limit: int) -> str:
+        """Up to `limit` bytes of the spooled output as text: all of it, or its beginning and end"""
+        with open(self.path, "rb") as f:
+            data = f.read(limit + 1)
+            if len(data) > limit:
+                f.seek(-(limit - limit // 2), 2)
+                data = data[:limit // 2] + b"\n" + f.read()
+        return data.decode('utf-8', errors='ignore')
+
+def run_output_base(task_id: int, run_id: str) -> Path:
+    """Spool path prefix for a task run; the stream name is added as suffix"""
+    task_dir = Path(settings.RUN_OUTPUT_DIR) / str(task_id)
+    task_dir.mkdir(parents=True, exist_ok=True)
+    return task_dir / run_id
+
+def find_run_output(task_id: int, run_id: str, stream: str = "stdout") -> Optional[Path]:
+    """Locate a spooled output file, or None if it does not exist"""
+    if stream not in STREAMS or not RUN_ID_PATTERN.match(run_id):
+        return None
+    path = Path(settings.RUN_OUTPUT_DIR) / str(task_id) / f"{run_id}.{stream}"
+    return path if path.is_file() else None
+
+def prune_run_outputs(max_age_days: int = settings.RUN_OUTPUT_RETENTION_DAYS):
+    """Delete spooled output older than the retention period"""
+    root = Path(settings.RUN_OUTPUT_DIR)
+    if not root.is_dir():
+        return
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for task_dir in root.iterdir():
+        if not task_dir.is_dir():
+            continue
+        for path in task_dir.iterdir():
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        try:
+            task_dir.rmdir()
+        except OSError:
+            pass  # still has recent output
+    if removed:
+        logger.info(f"Pruned {removed} run output files")
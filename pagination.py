@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Any, List, Optional
+import base64
+import json
+
+from fastapi import HTTPException, Response
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: tuple) -> tuple:
+    """Decode a cursor into values of the given types; raises HTTP 400 if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of values")
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, values)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, rows: List[Any], limit: int, *columns: str) -> Optional[str]:
+    """Attach the next-page cursor to the response when the page is full"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    cursor = encode_cursor(*(getattr(last, column) for column in columns))
+    response.headers[NEXT_CURSOR_HEADER] = cursor
+    return cursor
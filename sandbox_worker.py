@@ -0,0 +1,260 @@
+"""
+Warm sandbox worker process used by the executor's interpreter pool.
+
+The worker is started once (with the resource limits already applied by the
+parent) and then runs scripts sent over a private command pipe. Each run is a
+child forked from the worker, in its own process group, so nothing a script
+changes (builtins, os.environ, sys.modules, threads, processes it started)
+outlives the run. Compiled scripts are kept by content hash, in memory and as
+``.pyc`` files in a cache directory shared by the workers, so the parent only
+sends the source when the worker asks for it. Script stdout/stderr go to the
+worker's own stdout/stderr, which the parent drains; results are reported back
+over a separate result pipe, which runs cannot reach, so script output can
+never corrupt the protocol.
+
+This module must only import the standard library: it runs outside the app.
+"""
+import atexit
+import builtins
+import gc
+import importlib.util
+import json
+import marshal
+import os
+import signal
+import struct
+import sys
+import threading
+import traceback
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+HEADER = struct.Struct("!I")
+# Code objects of recently run scripts, by content hash
+CODE_CACHE_SIZE = 64
+_code_cache = {}
+
+
+def send_message(fd: int, message: dict):
+    """Write one length-prefixed JSON message to a file descriptor"""
+    payload = json.dumps(message).encode("utf-8")
+    data = HEADER.pack(len(payload)) + payload
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _read_exact(fd: int, size: int):
+    chunks = []
+    while size:
+        chunk = os.read(fd, size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_message(fd: int):
+    """Read one length-prefixed JSON message, or None on EOF"""
+    header = _read_exact(fd, HEADER.size)
+    if header is None:
+        return None
+    payload = _read_exact(fd, HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload)
+
+
+def _exit_code(exc: SystemExit) -> int:
+    """Map a SystemExit to the return code the interpreter would use"""
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _print_script_traceback(exc: BaseException):
+    """Print a traceback without the worker's own frame"""
+    tb = exc.__traceback__.tb_next if exc.__traceback__ else None
+    traceback.print_exception(type(exc), exc, tb)
+
+
+def _set_cpu_budget(timeout: int):
+    """Allow the next run `timeout` CPU seconds on top of what was used so far"""
+    if not HAS_RESOURCE:
+        return
+    try:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + timeout + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _pyc_path(message: dict):
+    if not message.get("hash") or not message.get("cache_dir"):
+        return None
+    return os.path.join(message["cache_dir"], f"{message['hash']}.{sys.implementation.cache_tag}.pyc")
+
+
+def _cached_code(message: dict):
+    """Code object for the message's content hash from memory or the .pyc cache, or None"""
+    content_hash = message.get("hash")
+    if not content_hash:
+        return None
+    code = _code_cache.get(content_hash)
+    path = _pyc_path(message)
+    if code is None and path:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            if data[:len(importlib.util.MAGIC_NUMBER)] == importlib.util.MAGIC_NUMBER:
+                code = marshal.loads(data[len(importlib.util.MAGIC_NUMBER):])
+        except (OSError, ValueError, EOFError, TypeError):
+            code = None
+        if code is not None:
+            _remember(content_hash, code)
+    return code
+
+
+def _compile(message: dict):
+    """Compile the message's source, caching the code object when it has a content hash"""
+    # A stable file name, as the code object outlives the run's directory
+    code = compile(message["source"], message["name"], "exec")
+    if message.get("hash"):
+        _remember(message["hash"], code)
+        path = _pyc_path(message)
+        if path:
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+                os.replace(temp_path, path)
+            except OSError:
+                pass
+    return code
+
+
+def _remember(content_hash: str, code):
+    if len(_code_cache) >= CODE_CACHE_SIZE:
+        _code_cache.pop(next(iter(_code_cache)))
+    _code_cache[content_hash] = code
+
+
+def run_script(message: dict, result_fd: int, worker_fds=()) -> dict:
+    """Run one script in a child forked from this worker and return its result"""
+    code = _cached_code(message)
+    if code is None:
+        if message.get("source") is None:
+            return {"need_source": True}
+        # Compiled here rather than in the run, so the code is cached for the next one
+        try:
+            code = _compile(message)
+        except BaseException as e:
+            _print_script_traceback(e)
+            sys.stderr.flush()
+            return {"return_code": 1, "cpu_time": 0.0, "peak_rss_kb": None}
+
+    pid = os.fork()
+    if pid == 0:
+        for fd in worker_fds:
+            os.close(fd)
+        _run_child(code, message)
+    # Lets the parent kill the run's process group if it times out
+    send_message(result_fd, {"started": pid})
+
+    # Kill whatever the run left behind before reaping it, so its pid (the group id) cannot be reused meanwhile
+    os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    _, status, usage = os.wait4(pid, 0)
+    return {
+        "return_code": os.waitstatus_to_exitcode(status),
+        "cpu_time": round(usage.ru_utime + usage.ru_stime, 4),
+        "peak_rss_kb": usage.ru_maxrss
+    }
+
+
+def _run_child(code, message: dict):
+    """Body of a forked run; exits the process with the script's return code"""
+    os.setpgid(0, 0)
+    cwd = message["cwd"]
+    script_path = os.path.join(cwd, message["name"])
+    os.chdir(cwd)
+    sys.path[0] = cwd
+    sys.argv = [script_path]
+    _set_cpu_budget(message["timeout"])
+    if HAS_RESOURCE and message.get("nproc_limit"):
+        # Set here rather than on the worker, which must be able to fork
+        try:
+            resource.setrlimit(resource.RLIMIT_NPROC, (message["nproc_limit"], message["nproc_limit"]))
+        except (ValueError, OSError):
+            pass
+
+    namespace = {"__name__": "__main__", "__file__": script_path, "__builtins__": builtins}
+    try:
+        exec(code, namespace)
+        return_code = 0
+    except SystemExit as e:
+        return_code = _exit_code(e)
+    except BaseException as e:
+        _print_script_traceback(e)
+        return_code = 1
+    _exit(return_code)
+
+
+def _exit(return_code: int):
+    """
+    End a run as the interpreter would end a script
+
+    Non-daemon threads are joined, atexit handlers run and the streams are
+    flushed; the worker's modules are not torn down, which would take longer
+    than the run itself.
+    """
+    current = threading.current_thread()
+    while True:
+        pending = [thread for thread in threading.enumerate() if thread is not current and not thread.daemon]
+        if not pending:
+            break
+        for thread in pending:
+            thread.join()
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(return_code & 0xFF)
+
+
+def main():
+    command_fd, result_fd = int(sys.argv[1]), int(sys.argv[2])
+    # Do not expose the application directory to scripts
+    sys.path[0] = os.getcwd()
+    # Keep the collector away from the worker's objects in runs, which would copy their pages
+    gc.freeze()
+
+    send_message(result_fd, {"ready": True, "pid": os.getpid()})
+    while True:
+        message = read_message(command_fd)
+        if message is None:
+            break
+        send_message(result_fd, run_script(message, result_fd, (command_fd, result_fd)))
+
+
+if __name__ == "__main__":
+    main()
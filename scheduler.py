@@ -1,129 +1,376 @@
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.date import DateTrigger
-from datetime import datetime
-from sqlalchemy.orm import Session
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from datetime import datetime, timezone
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import asyncio
+import functools
 import logging
+import pickle
+import time
+import uuid
 
-from database import get_db
-from crud import get_task, update_task, log_action, get_script
+from database import engine as db_engine, get_db, AsyncSessionLocal, async_write_session
+from async_crud import get_task, update_task, log_action, get_script_content_hash, create_task_run
+import async_crud
 from executor import execute_python_script
+from execution_engine import engine, Admission
+from output_spool import run_output_base, prune_run_outputs
+from audit_archive import archive_audit_logs
+from script_store import load_script_content
+from events import broker, task_channel
+from jobstore import CachedSQLAlchemyJobStore
+from schedules import build_trigger
+from schemas import TaskRunCreate
 from config import settings
+from metrics import scheduler_lag, scheduler_missed_runs
 
 logger = logging.getLogger(__name__)
 
-scheduler = AsyncIOScheduler()
+# Task jobs persist in the application database, so they survive restarts without
+# being rebuilt; maintenance jobs are re-added on every start and stay in memory.
+# Task times are naive UTC, so the scheduler runs in UTC.
+jobstore = CachedSQLAlchemyJobStore(engine=db_engine, tablename="apscheduler_jobs")
+# Applied again with the running event loop on every start
+_scheduler_options = dict(
+    jobstores={"default": jobstore, "memory": MemoryJobStore()},
+    job_defaults={
+        "coalesce": settings.SCHEDULER_COALESCE,
+        "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS or None,
+        "max_instances": 1
+    },
+    timezone=timezone.utc
+)
+scheduler = AsyncIOScheduler(**_scheduler_options)
 
-async def execute_task(task_id: int):
-    """Execute a scheduled task"""
-    db = next(get_db())
+async def set_task_status(db: AsyncSession, task_id: int, status: str, run_id: Optional[str] = None):
+    """Update a task's status and notify live subscribers"""
+    async with async_write_session(db):
+        await update_task(db, task_id, {"status": status})
+    broker.publish(task_channel(task_id), {"type": "status", "task_id": task_id, "status": status, "run_id": run_id})
+
+async def set_tasks_status(db: AsyncSession, task_ids: List[int], status: str):
+    """set_task_status() for many tasks with one UPDATE"""
+    async with async_write_session(db):
+        await async_crud.set_tasks_status(db, task_ids, status)
+    for task_id in task_ids:
+        broker.publish(task_channel(task_id), {"type": "status", "task_id": task_id, "status": status, "run_id": None})
+
+def _output_publisher(task_id: int, run_id: str):
+    """Executor callback that streams output lines to the task's subscribers"""
+    channel = task_channel(task_id)
+
+    def on_output(stream: str, line: str):
+        broker.publish(channel, {"type": "output", "task_id": task_id, "run_id": run_id, "stream": stream, "line": line})
+
+    return on_output
+
+def _task_run(task_id: int, run_id: str, admission: Admission, started_at: datetime, wall_time: float,
+              result: Optional[dict] = None, error: Optional[str] = None) -> TaskRunCreate:
+    """History row for a run that got an execution slot"""
+    result = result or {}
+    error = error or result.get("error")
+    return TaskRunCreate(
+        task_id=task_id,
+        run_id=run_id,
+        status="completed" if result.get("success") else "failed",
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+        queue_wait=round(admission.wait_time, 4) if admission.wait_time is not None else None,
+        wall_time=round(wall_time, 4),
+        cpu_time=result.get("cpu_time"),
+        peak_rss_kb=result.get("peak_rss_kb"),
+        return_code=result.get("return_code"),
+        output_path=result.get("output_path"),
+        error_path=result.get("error_path"),
+        error=error[:500] if error else None
+    )
+
+async def execute_task(task_id: int, admission: Optional[Admission] = None):
+    """Execute a scheduled task, recording the run in the task's history"""
+    db = AsyncSessionLocal()
     task = None
+    run_id = uuid.uuid4().hex
+    started_at = None
+    started = None
     try:
-        task = get_task(db, task_id)
+        task = await get_task(db, task_id)
         if not task:
             logger.error(f"Task {task_id} not found")
             return
 
-        # Update task status to running
-        update_task(db, task_id, {"status": "running"})
+        # Reserve a place in the execution queue (raises EngineBusyError when full)
+        if admission is None:
+            queued = not engine.has_capacity(task.agent_id)
+            admission = engine.admit(task.agent_id)
+            if queued:
+                await set_task_status(db, task_id, "queued", run_id)
+
+        async with admission:
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            # Update task status to running
+            await set_task_status(db, task_id, "running", run_id)
 
-        logger.info(f"Executing task {task_id}: {task.name}")
+            logger.info(f"Executing task {task_id}: {task.name}")
 
-        # Get the script content
-        script = get_script(db, task.script_id)
-        if not script:
-            raise Exception(f"Script {task.script_id} not found")
+            # Only the content hash; pool workers run cached bytecode and the source is read on a miss
+            content_hash = await get_script_content_hash(db, task.script_id)
+            if not content_hash:
+                raise Exception(f"Script {task.script_id} not found")
 
-        # Execute the script
-        from executor import execute_python_script
-        result = await asyncio.get_event_loop().run_in_executor(
-            None, execute_python_script, script.content, f"task_{task_id}.py"
-        )
+            # Execute the script, spooling its output to disk and streaming it live
+            result = await admission.run(
+                execute_python_script, None, f"task_{task_id}.py",
+                run_output_base(task_id, run_id), _output_publisher(task_id, run_id),
+                content_hash, functools.partial(load_script_content, content_hash)
+            )
+            wall_time = time.perf_counter() - started
 
         # Update task status based on execution result
         if result["success"]:
-            update_task(db, task_id, {"status": "completed"})
+            await set_task_status(db, task_id, "completed", run_id)
             logger.info(f"Task {task_id} completed successfully")
         else:
-            update_task(db, task_id, {"status": "failed"})
+            await set_task_status(db, task_id, "failed", run_id)
             logger.error(f"Task {task_id} failed: {result['error']}")
 
-        # Log the execution
-        log_action(
-            db,
-            action="execute",
-            resource_type="task",
-            resource_id=task_id,
-            details={
-                "status": "completed" if result["success"] else "failed",
-                "script_id": task.script_id,
-                "execution_time": result["execution_time"],
-                "output": result["output"][:500] if result["output"] else None,  # Truncate output
-                "error": result["error"][:500] if result["error"] else None
-            }
-        )
+        # Record the run and log the execution
+        async with async_write_session(db):
+            await create_task_run(db, _task_run(task_id, run_id, admission, started_at, wall_time, result),
+                                  result.get("search_output"), result.get("search_errors"))
+            started_at = None  # recorded
+            await log_action(
+                db,
+                action="execute",
+                resource_type="task",
+                resource_id=task_id,
+                details={
+                    "status": "completed" if result["success"] else "failed",
+                    "script_id": task.script_id,
+                    "run_id": run_id,
+                    "execution_time": result["execution_time"],
+                    "queue_wait": round(admission.wait_time, 3),
+                    "output": result["output"][:500] if result["output"] else None,  # Truncate output
+                    "error": result["error"][:500] if result["error"] else None,
+                    "output_size": result["output_size"],
+                    "output_truncated": result["output_truncated"]
+                }
+            )
 
     except Exception as e:
         logger.error(f"Error executing task {task_id}: {str(e)}")
         if task:
-            update_task(db, task_id, {"status": "failed"})
-
-        log_action(
-            db,
-            action="execute",
-            resource_type="task",
-            resource_id=task_id,
-            details={"status": "failed", "error": str(e)}
-        )
+            await set_task_status(db, task_id, "failed", run_id)
+
+        async with async_write_session(db):
+            if started_at is not None:
+                wall_time = time.perf_counter() - started
+                await create_task_run(db, _task_run(task_id, run_id, admission, started_at, wall_time, error=str(e)),
+                                      errors=str(e))
+            await log_action(
+                db,
+                action="execute",
+                resource_type="task",
+                resource_id=task_id,
+                details={"status": "failed", "run_id": run_id, "error": str(e)}
+            )
     finally:
-        db.close()
+        if admission:
+            admission.cancel()
+        await db.close()
+
+def schedule_task(task_id: int, scheduled_time: Optional[datetime] = None, cron_expression: Optional[str] = None,
+                  interval_seconds: Optional[int] = None, jitter_seconds: Optional[int] = None):
+    """Schedule a task for execution, once at `scheduled_time` or recurring by cron expression or interval"""
+    recurring = bool(cron_expression or interval_seconds)
+    if not recurring and (scheduled_time is None or scheduled_time <= datetime.utcnow()):
+        return
+    trigger = build_trigger(scheduled_time, cron_expression, interval_seconds, jitter_seconds)
+    scheduler.add_job(
+        execute_task,
+        trigger=trigger,
+        args=[task_id],
+        id=f"task_{task_id}",
+        replace_existing=True
+    )
+    logger.info(f"Scheduled task {task_id}: {trigger}")
+
+def reschedule_task(task):
+    """Replace a task's job after its schedule changed, or cancel it if it no longer has one"""
+    if task.cron_expression or task.interval_seconds or (task.scheduled_time and task.scheduled_time > datetime.utcnow()):
+        schedule_task(task.id, task.scheduled_time, task.cron_expression, task.interval_seconds, task.jitter_seconds)
+    else:
+        cancel_task_schedule(task.id)
 
-def schedule_task(task_id: int, scheduled_time: datetime):
-    """Schedule a task for execution"""
-    if scheduled_time > datetime.utcnow():
-        scheduler.add_job(
-            execute_task,
-            trigger=DateTrigger(run_date=scheduled_time),
-            args=[task_id],
-            id=f"task_{task_id}",
-            replace_existing=True
-        )
-        logger.info(f"Scheduled task {task_id} for {scheduled_time}")
+def schedule_tasks(tasks) -> int:
+    """
+    reschedule_task() for many tasks with one write to the job store
+
+    Jobs are built directly, as in import_scheduled_tasks(), instead of going
+    through scheduler.add_job() once per task. Returns the number scheduled.
+    Blocks on the database, like the other schedule changes; call it from a thread.
+    """
+    jobs, cancelled = [], []
+    # Tasks in a batch usually share schedules; triggers are immutable, so build each one once
+    triggers = {}
+    now = datetime.utcnow()
+    for task in tasks:
+        job = None
+        if task.cron_expression or task.interval_seconds or (task.scheduled_time and task.scheduled_time > now):
+            schedule = (task.scheduled_time, task.cron_expression, task.interval_seconds, task.jitter_seconds)
+            if schedule not in triggers:
+                triggers[schedule] = build_trigger(*schedule)
+            job = _task_job(task, triggers[schedule])
+        if job is not None and job.next_run_time is not None:
+            jobs.append(job)
+        else:
+            cancelled.append(f"task_{task.id}")
+    if cancelled:
+        jobstore.remove_jobs(cancelled)
+    if jobs:
+        jobstore.add_jobs(jobs)
+        if scheduler.running:
+            scheduler.wakeup()
+        logger.info(f"Scheduled {len(jobs)} tasks")
+    return len(jobs)
+
+def next_run_time(task_id: int) -> Optional[datetime]:
+    """When the task's job fires next, from the job store's in-memory index"""
+    return jobstore.next_run_time(f"task_{task_id}")
 
 def cancel_task_schedule(task_id: int):
     """Cancel a scheduled task"""
     try:
         scheduler.remove_job(f"task_{task_id}")
         logger.info(f"Cancelled schedule for task {task_id}")
+    except JobLookupError:
+        pass  # not scheduled
     except Exception as e:
         logger.warning(f"Could not cancel schedule for task {task_id}: {str(e)}")
 
-def load_scheduled_tasks():
-    """Load all pending scheduled tasks from database"""
+def cancel_task_schedules(task_ids: List[int]):
+    """Cancel the schedules of many tasks with one delete"""
+    jobstore.remove_jobs([f"task_{task_id}" for task_id in task_ids])
+
+def _task_job(task, trigger=None) -> Job:
+    """The job schedule_task() would create, built without touching the job store"""
+    if trigger is None:
+        trigger = build_trigger(task.scheduled_time, task.cron_expression, task.interval_seconds, task.jitter_seconds)
+    return Job(
+        scheduler,
+        id=f"task_{task.id}",
+        func=execute_task,
+        trigger=trigger,
+        executor="default",
+        args=(task.id,),
+        kwargs={},
+        name="execute_task",
+        misfire_grace_time=settings.SCHEDULER_MISFIRE_GRACE_SECONDS or None,
+        coalesce=settings.SCHEDULER_COALESCE,
+        max_instances=1,
+        next_run_time=trigger.get_next_fire_time(None, datetime.now(timezone.utc))
+    )
+
+def import_scheduled_tasks(batch_size: int = 1000) -> int:
+    """
+    Bulk-load pending one-shot and all recurring tasks into an empty job store
+
+    Only does work on a new database or the first start after upgrading from
+    the in-memory store; afterwards jobs are already persisted. Overdue tasks
+    are included and handled by the misfire policy.
+    """
+    with db_engine.connect() as connection:
+        if connection.execute(select(jobstore.jobs_t.c.id).limit(1)).first() is not None:
+            return 0
+
+    from models import Task
     db = next(get_db())
+    imported = 0
     try:
-        # Get all tasks with scheduled_time in the future and status pending
-        from models import Task
-        pending_tasks = db.query(Task).filter(
-            Task.scheduled_time.isnot(None),
-            Task.scheduled_time > datetime.utcnow(),
-            Task.status == "pending"
-        ).all()
-
-        for task in pending_tasks:
-            schedule_task(task.id, task.scheduled_time)
-
-        logger.info(f"Loaded {len(pending_tasks)} scheduled tasks")
+        pending = db.query(
+            Task.id, Task.scheduled_time, Task.cron_expression, Task.interval_seconds, Task.jitter_seconds
+        ).filter(or_(
+            and_(Task.scheduled_time.isnot(None), Task.status == "pending"),
+            Task.cron_expression.isnot(None),
+            Task.interval_seconds.isnot(None)
+        )).yield_per(batch_size)
+
+        batch = []
+        for task in pending:
+            try:
+                job = _task_job(task)
+            except ValueError as e:
+                logger.error(f"Task {task.id} has an invalid schedule: {str(e)}")
+                continue
+            if job.next_run_time is None:
+                continue
+            batch.append({
+                "id": job.id,
+                "next_run_time": datetime_to_utc_timestamp(job.next_run_time),
+                "job_state": pickle.dumps(job.__getstate__(), jobstore.pickle_protocol)
+            })
+            if len(batch) >= batch_size:
+                imported += _insert_jobs(batch)
+                batch = []
+        if batch:
+            imported += _insert_jobs(batch)
     finally:
         db.close()
 
+    if imported:
+        logger.info(f"Imported {imported} scheduled tasks into the job store")
+    return imported
+
+def _insert_jobs(rows: list) -> int:
+    with db_engine.begin() as connection:
+        connection.execute(jobstore.jobs_t.insert(), rows)
+    return len(rows)
+
+def _on_job_submitted(event):
+    # Runs right before the job starts; a job catching up on several missed times counts from the last
+    scheduler_lag.observe((datetime.now(timezone.utc) - event.scheduled_run_times[-1]).total_seconds())
+
+def _on_job_missed(event):
+    scheduler_missed_runs.inc()
+    logger.warning(f"Job {event.job_id} missed its run time {event.scheduled_run_time} (misfire grace exceeded)")
+
 def start_scheduler():
     """Start the APScheduler"""
-    load_scheduled_tasks()
+    # Bind to the current loop; AsyncIOScheduler otherwise keeps the loop of its first start
+    scheduler.configure(event_loop=asyncio.get_running_loop(), **_scheduler_options)
+    scheduler.add_job(
+        prune_run_outputs,
+        trigger=IntervalTrigger(hours=1),
+        id="prune_run_outputs",
+        jobstore="memory",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        archive_audit_logs,
+        trigger=IntervalTrigger(hours=1),
+        id="archive_audit_logs",
+        jobstore="memory",
+        replace_existing=True
+    )
+    scheduler.add_listener(_on_job_missed, EVENT_JOB_MISSED)
+    scheduler.add_listener(_on_job_submitted, EVENT_JOB_SUBMITTED)
+    engine.start()
     scheduler.start()
+    # The store's table exists once the scheduler has started
+    if import_scheduled_tasks():
+        jobstore.reload()
+        scheduler.wakeup()
     logger.info("Scheduler started")
 
 def stop_scheduler():
-    """Stop the APScheduler"""
+    """Stop the APScheduler and the execution engine"""
     scheduler.shutdown()
+    engine.shutdown()
     logger.info("Scheduler stopped")
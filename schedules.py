@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+import re
+
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+_CRONTAB_DAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")
+
+def _crontab_day_name(match) -> str:
+    number = int(match.group())
+    if number > 7:
+        raise ValueError(f"Invalid day of week {number} (0-7)")
+    return _CRONTAB_DAYS[number % 7]
+
+def _crontab_day_steps(part: str) -> str:
+    """Expand a stepped day-of-week range (`*/2`, `1-5/2`, `3/2`) into a list of crontab day numbers"""
+    base, step = part.split("/", 1)
+    try:
+        if base == "*":
+            first, last = 0, 6
+        elif "-" in base:
+            first, last = (int(value) for value in base.split("-"))
+        else:
+            first, last = int(base), 6
+        step = int(step)
+    except ValueError:
+        raise ValueError(f"Invalid day of week step {part} (numbers only)")
+    if step < 1:
+        raise ValueError(f"Invalid day of week step {part}")
+    return ",".join(str(day) for day in range(first, last + 1, step))
+
+def _crontab_day_of_week(field: str) -> str:
+    """
+    Translate a crontab day-of-week field to APScheduler's notation
+
+    Crontab counts from Sunday (0 or 7), APScheduler from Monday, so numbers
+    are replaced by day names; steps are expanded first, since APScheduler
+    would count them from Monday.
+    """
+    parts = []
+    for part in field.split(","):
+        if "/" in part:
+            part = _crontab_day_steps(part)
+        # Sunday is the last day for APScheduler, so "sun-fri" would be an invalid range
+        part = re.sub(r"^0-(\d+)", lambda m: f"0,1-{m.group(1)}", part)
+        parts.append(re.sub(r"(?<![/\d])\d+", _crontab_day_name, part))
+    return ",".join(parts)
+
+def crontab_trigger(expression: str, jitter: Optional[int] = None,
+                    start_date: Optional[datetime] = None) -> CronTrigger:
+    """CronTrigger (UTC) for a standard five-field crontab expression; raises ValueError if invalid"""
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"Cron expression needs 5 fields, got {len(fields)}")
+    minute, hour, day, month, day_of_week = fields
+    return CronTrigger(
+        minute=minute, hour=hour, day=day, month=month,
+        day_of_week=_crontab_day_of_week(day_of_week),
+        start_date=start_date, jitter=jitter or None, timezone=timezone.utc
+    )
+
+def build_trigger(scheduled_time: Optional[datetime] = None, cron_expression: Optional[str] = None,
+                  interval_seconds: Optional[int] = None, jitter_seconds: Optional[int] = None) -> Optional[BaseTrigger]:
+    """
+    Trigger for a task's schedule, or None if it has none
+
+    A cron expression or interval makes the task recurring, with
+    `scheduled_time` as the first possible run; on its own `scheduled_time`
+    is a one-shot run.
+    """
+    if cron_expression:
+        return crontab_trigger(cron_expression, jitter_seconds, scheduled_time)
+    if interval_seconds:
+        return IntervalTrigger(seconds=interval_seconds, start_date=scheduled_time,
+                               jitter=jitter_seconds or None, timezone=timezone.utc)
+    if scheduled_time:
+        return DateTrigger(run_date=scheduled_time, timezone=timezone.utc)
+    return None
+
+def next_fire_times(trigger: BaseTrigger, count: int, now: Optional[datetime] = None,
+                    next_run_time: Optional[datetime] = None) -> List[datetime]:
+    """
+    The next `count` fire times of a trigger (without jitter)
+
+    With `next_run_time`, the time the task's job fires next, the preview
+    starts there and follows on from it as the scheduler will, instead of
+    from a trigger anchored at `now` (interval triggers without a start date).
+    """
+    now = now or datetime.now(timezone.utc)
+    if getattr(trigger, "jitter", None):
+        # Jitter is random per run; preview the unjittered times
+        trigger = _without_jitter(trigger)
+    times = []
+    previous = None
+    if next_run_time is not None:
+        times.append(next_run_time)
+        previous = now = next_run_time
+    while len(times) < count:
+        fire_time = trigger.get_next_fire_time(previous, now)
+        # A one-shot trigger returns its run date even when it has passed
+        if fire_time is None or fire_time < now:
+            break
+        times.append(fire_time)
+        previous = fire_time
+        now = fire_time
+    return times
+
+def _without_jitter(trigger: BaseTrigger) -> BaseTrigger:
+    state = trigger.__getstate__()
+    clone = trigger.__class__.__new__(trigger.__class__)
+    clone.__setstate__({**state, "jitter": None})
+    return clone
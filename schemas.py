@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+from schedules import crontab_trigger
+
 class UserCreate(BaseModel):
     email: str
     password: str
@@ -28,6 +30,9 @@ class AgentBase(BaseModel):
 class AgentCreate(AgentBase):
     pass
 
+class AgentBulkUpdate(AgentCreate):
+    id: int
+
 class Agent(AgentBase):
     id: int
 
@@ -43,8 +48,36 @@ class ScriptBase(BaseModel):
 class ScriptCreate(ScriptBase):
     pass
 
+class ScriptBulkUpdate(ScriptCreate):
+    id: int
+
+class ScriptValidationRequest(BaseModel):
+    content: str
+
+class ScriptValidation(BaseModel):
+    content_hash: str
+    valid: bool
+    warnings: List[str] = []
+    errors: List[str] = []
+
 class Script(ScriptBase):
     id: int
+    content_hash: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    validation: Optional[ScriptValidation] = None
+
+    class Config:
+        from_attributes = True
+
+class ScriptSummary(BaseModel):
+    """List view of a script; the body is only served by GET /scripts/{id}"""
+    id: int
+    name: str
+    description: str
+    filename: str
+    size: Optional[int] = None
+    content_hash: Optional[str] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -55,19 +88,119 @@ class TaskBase(BaseModel):
     script_id: int
     agent_id: int
 
-class TaskCreate(TaskBase):
+class TaskSchedule(BaseModel):
     scheduled_time: Optional[datetime] = None
+    cron_expression: Optional[str] = None
+    interval_seconds: Optional[int] = Field(default=None, gt=0)
+    jitter_seconds: Optional[int] = Field(default=None, ge=0)
+
+    @field_validator("cron_expression")
+    @classmethod
+    def check_cron_expression(cls, value):
+        if value:
+            crontab_trigger(value)
+        return value or None
+
+    @model_validator(mode="after")
+    def check_single_recurrence(self):
+        if self.cron_expression and self.interval_seconds:
+            raise ValueError("Use either cron_expression or interval_seconds, not both")
+        return self
+
+class TaskCreate(TaskBase, TaskSchedule):
+    pass
+
+class TaskBulkUpdate(TaskCreate):
+    id: int
 
 class Task(TaskBase):
     id: int
     status: str
     scheduled_time: Optional[datetime]
+    cron_expression: Optional[str] = None
+    interval_seconds: Optional[int] = None
+    jitter_seconds: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class BulkIds(BaseModel):
+    ids: List[int]
+
+class BulkDeleteResult(BaseModel):
+    deleted: List[int]
+
+class BulkExecuteResult(BaseModel):
+    started: List[int] = []
+    queued: List[int] = []
+    rejected: List[int] = []  # the execution queue was full
+
+class TaskScheduleInfo(BaseModel):
+    task_id: int
+    recurring: bool
+    next_run_time: Optional[datetime]
+    upcoming: List[datetime]
+
+class TaskRunBase(BaseModel):
+    task_id: int
+    run_id: str
+    status: str
+    started_at: datetime
+    finished_at: datetime
+    queue_wait: Optional[float] = None
+    wall_time: Optional[float] = None
+    cpu_time: Optional[float] = None
+    peak_rss_kb: Optional[int] = None
+    return_code: Optional[int] = None
+    output_path: Optional[str] = None
+    error_path: Optional[str] = None
+    error: Optional[str] = None
+
+class TaskRunCreate(TaskRunBase):
+    pass
+
+class TaskRun(TaskRunBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class TaskRunSearchHit(TaskRun):
+    rank: Optional[float] = None  # bm25; lower is a better match
+    snippet: Optional[str] = None
+
+class RunStats(BaseModel):
+    runs: int
+    failures: int
+    failure_rate: float
+    p50_wall_time: Optional[float]
+    p95_wall_time: Optional[float]
+    max_wall_time: Optional[float]
+    avg_queue_wait: Optional[float]
+    avg_cpu_time: Optional[float]
+    max_peak_rss_kb: Optional[int]
+
+class TaskRunStats(RunStats):
+    task_id: int
+
+class RecentRunStats(RunStats):
+    since: datetime
+
+class StatusCounts(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+
+class DashboardStats(BaseModel):
+    agents: StatusCounts
+    scripts: int
+    tasks: StatusCounts
+    runs: RecentRunStats  # all tasks, since `window_hours` ago
+    audit_events: int  # since the same time
+    executor: Dict[str, Any]
+    generated_at: datetime
+
 class TaskUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -93,3 +226,7 @@ class AuditLog(AuditLogBase):
 
     class Config:
         from_attributes = True
+
+class AuditSearchHit(AuditLog):
+    rank: Optional[float] = None  # bm25; lower is a better match
+    snippet: Optional[str] = None
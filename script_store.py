@@ -0,0 +1,53 @@
+from typing import Optional
+import hashlib
+import logging
+
+from sqlalchemy import inspect, select, text
+
+from database import engine, write_session
+from models import ScriptContent
+
+logger = logging.getLogger(__name__)
+
+def hash_content(source: str) -> str:
+    """Content address of a script body"""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+def load_script_content(content_hash: str) -> Optional[str]:
+    """Read a script body by hash; called from execution threads on a bytecode cache miss"""
+    with engine.connect() as connection:
+        return connection.execute(
+            select(ScriptContent.content).where(ScriptContent.hash == content_hash)
+        ).scalar()
+
+def migrate_script_contents(batch_size: int = 500) -> int:
+    """
+    Move script bodies from the legacy `scripts.content` column into script_contents
+
+    Runs at startup and only does work on databases created before scripts
+    were content-addressed; the legacy column is emptied once its body has moved.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("scripts")}
+    if "content" not in columns:
+        return 0
+
+    migrated = 0
+    while True:
+        with write_session() as db:
+            rows = db.execute(text(
+                "SELECT id, content FROM scripts WHERE content IS NOT NULL LIMIT :limit"
+            ), {"limit": batch_size}).all()
+            for script_id, source in rows:
+                digest = hash_content(source)
+                if db.get(ScriptContent, digest) is None:
+                    db.add(ScriptContent(hash=digest, content=source, size=len(source.encode("utf-8"))))
+                    db.flush()
+                db.execute(text("UPDATE scripts SET content_hash = :hash, content = NULL WHERE id = :id"),
+                           {"hash": digest, "id": script_id})
+        migrated += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if migrated:
+        logger.info(f"Moved {migrated} script bodies into content-addressed storage")
+    return migrated
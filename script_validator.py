@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import ast
+import builtins
+
+from cache import TTLCache
+from config import settings
+from script_store import hash_content
+
+# Calls reported as potentially dangerous, by fully resolved name
+DANGEROUS_CALLS = {
+    "eval", "exec", "compile", "__import__", "breakpoint",
+    "os.system", "os.popen", "os.fork", "os.forkpty", "os.kill", "os.killpg", "os._exit",
+    "os.execl", "os.execle", "os.execlp", "os.execlpe", "os.execv", "os.execve", "os.execvp", "os.execvpe",
+    "os.spawnl", "os.spawnle", "os.spawnlp", "os.spawnlpe", "os.spawnv", "os.spawnve", "os.spawnvp", "os.spawnvpe",
+    "os.posix_spawn", "os.posix_spawnp", "sys.exit", "pty.spawn",
+}
+# Any call into these modules is reported as potentially dangerous
+DANGEROUS_MODULES = {"subprocess", "importlib", "ctypes"}
+# Calls reported as file operations
+FILE_CALLS = {
+    "open", "io.open", "os.open", "os.remove", "os.unlink", "os.rename", "os.replace",
+    "os.rmdir", "os.removedirs", "os.mkdir", "os.makedirs", "os.truncate", "os.chmod", "os.chown",
+}
+FILE_MODULES = {"shutil"}
+# pathlib methods; the receiver's type is unknown, so these match by method name
+FILE_METHODS = {"read_text", "read_bytes", "write_text", "write_bytes", "unlink", "rmdir", "touch"}
+_BUILTINS = set(dir(builtins))
+
+class _Visitor(ast.NodeVisitor):
+    """Collects calls with their import-resolved names in one pass over the tree"""
+
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}
+        self.bound: Set[str] = set()
+        self.imports: List[Tuple[int, str]] = []
+        self.calls: List[Tuple[int, str, bool]] = []  # line, name, whether it is a bare builtin name
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            if alias.asname:
+                self.aliases[alias.asname] = alias.name
+            else:
+                # `import os.path` binds `os`
+                top = alias.name.partition(".")[0]
+                self.aliases[top] = top
+            self.imports.append((node.lineno, alias.name))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        module = node.module or ""
+        for alias in node.names:
+            if alias.name != "*" and not node.level:
+                self.aliases[alias.asname or alias.name] = f"{module}.{alias.name}"
+            self.imports.append((node.lineno, module))
+
+    def visit_FunctionDef(self, node):
+        self.bound.add(node.name)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def visit_Name(self, node: ast.Name):
+        if not isinstance(node.ctx, ast.Load):
+            self.bound.add(node.id)
+
+    def visit_arg(self, node: ast.arg):
+        self.bound.add(node.arg)
+
+    def visit_Call(self, node: ast.Call):
+        name = self._resolve(node.func)
+        if name is not None:
+            self.calls.append((node.lineno, name, isinstance(node.func, ast.Name) and node.func.id not in self.aliases))
+        elif isinstance(node.func, ast.Attribute):
+            self.calls.append((node.lineno, f".{node.func.attr}", False))
+        self.generic_visit(node)
+
+    def _resolve(self, node: ast.expr) -> Optional[str]:
+        """Dotted name of an attribute chain with its root import alias expanded"""
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self.aliases.get(node.id, node.id))
+        return ".".join(reversed(parts))
+
+def _module(name: str) -> str:
+    return name.partition(".")[0]
+
+def validate_source(source: str) -> Dict[str, Any]:
+    """
+    Static check of a script for dangerous and file operations
+
+    Parses the script once and reports real imports and calls (resolving
+    import aliases, and skipping builtins the script rebinds), so names that
+    merely contain a pattern, comments and strings are not reported.
+    """
+    result = {
+        "valid": True,
+        "warnings": [],
+        "errors": []
+    }
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        result["valid"] = False
+        result["errors"].append(f"Line {e.lineno}: {e.msg}")
+        return result
+    except ValueError as e:
+        # e.g. null bytes in the source
+        result["valid"] = False
+        result["errors"].append(str(e))
+        return result
+
+    visitor = _Visitor()
+    visitor.visit(tree)
+
+    findings = set()
+    for line, module in visitor.imports:
+        if _module(module) in DANGEROUS_MODULES:
+            findings.add((line, f"Line {line}: Potentially dangerous import '{module}' detected"))
+    for line, name, bare in visitor.calls:
+        if bare and (name in visitor.bound or name not in _BUILTINS):
+            continue
+        if name in DANGEROUS_CALLS or (_module(name) in DANGEROUS_MODULES and "." in name):
+            findings.add((line, f"Line {line}: Potentially dangerous operation '{name}' detected"))
+        elif name in FILE_CALLS or (_module(name) in FILE_MODULES and "." in name):
+            findings.add((line, f"Line {line}: File operation '{name}()' detected - ensure proper sandboxing"))
+        elif "." in name and name.rpartition(".")[2] in FILE_METHODS:
+            findings.add((line, f"Line {line}: File operation '.{name.rpartition('.')[2]}()' detected - ensure proper sandboxing"))
+    result["warnings"] = [message for _, message in sorted(findings)]
+    return result
+
+# Results by content hash; they only depend on the source, so they never expire
+validation_cache = TTLCache(maxsize=settings.SCRIPT_VALIDATION_CACHE_SIZE, ttl=float("inf"))
+
+def validate_script(source: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Validation result of a script body, computed once per content hash"""
+    content_hash = content_hash or hash_content(source)
+    result = validation_cache.get(content_hash)
+    if result is None:
+        result = validate_source(source)
+        validation_cache.set(content_hash, result)
+    # Fresh lists, so a caller changing its result cannot change the cached one
+    return {**result, "warnings": list(result["warnings"]), "errors": list(result["errors"]),
+            "content_hash": content_hash}
@@ -0,0 +1,98 @@
+from typing import Optional
+import logging
+import re
+
+from sqlalchemy import column, func, literal_column, table
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# Escaped newlines and tabs in the JSON details read as spaces, so \nKeyError is indexed as KeyError
+_DETAILS_TEXT = "replace(replace(replace({row}.details, '\\n', ' '), '\\r', ' '), '\\t', ' ')"
+# FTS5 index over audit_logs. The index stores no copy of the text (its content is a view of
+# audit_logs), and triggers keep it in step with every insert and delete, including archival.
+AUDIT_SEARCH_DDL = [
+    "CREATE VIEW IF NOT EXISTS audit_search_content AS "
+    f"SELECT id, action, resource_type, {_DETAILS_TEXT.format(row='audit_logs')} AS details FROM audit_logs",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS audit_search USING fts5("
+    "action, resource_type, details, content='audit_search_content', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_search_insert AFTER INSERT ON audit_logs BEGIN "
+    "INSERT INTO audit_search(rowid, action, resource_type, details) "
+    f"VALUES (new.id, new.action, new.resource_type, {_DETAILS_TEXT.format(row='new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_search_delete AFTER DELETE ON audit_logs BEGIN "
+    "INSERT INTO audit_search(audit_search, rowid, action, resource_type, details) "
+    f"VALUES ('delete', old.id, old.action, old.resource_type, {_DETAILS_TEXT.format(row='old')}); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_search_update AFTER UPDATE ON audit_logs BEGIN "
+    "INSERT INTO audit_search(audit_search, rowid, action, resource_type, details) "
+    f"VALUES ('delete', old.id, old.action, old.resource_type, {_DETAILS_TEXT.format(row='old')}); "
+    "INSERT INTO audit_search(rowid, action, resource_type, details) "
+    f"VALUES (new.id, new.action, new.resource_type, {_DETAILS_TEXT.format(row='new')}); END",
+]
+# FTS5 index over captured run output, one row per task run (rowid = task_runs.id). Output lives in
+# spool files, so the recorder inserts the text; the trigger drops it with the run.
+RUN_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS run_output_search USING fts5(output, errors)",
+    "CREATE TRIGGER IF NOT EXISTS task_runs_search_delete AFTER DELETE ON task_runs BEGIN "
+    "DELETE FROM run_output_search WHERE rowid = old.id; END",
+]
+
+# Lightweight table constructs for queries; the tables are created above, not by the metadata
+audit_search = table("audit_search", column("rowid"), column("rank"), column("audit_search"))
+run_output_search = table("run_output_search", column("rowid"), column("rank"), column("output"),
+                          column("errors"), column("run_output_search"))
+
+# Markers around matched terms in snippets
+SNIPPET_OPEN = "[["
+SNIPPET_CLOSE = "]]"
+SNIPPET_TOKENS = 16
+
+_TERM = re.compile(r'"[^"]*"|\S+')
+
+class SearchIndex:
+    """Availability of the FTS5 indexes, which need SQLite built with FTS5"""
+
+    def __init__(self):
+        self.enabled = False
+
+    def create(self) -> bool:
+        """Create the indexes and triggers; an audit index created on an existing table is filled from it"""
+        if engine.dialect.name != "sqlite":
+            logger.info("Full-text search needs SQLite; search endpoints are disabled")
+            return False
+        try:
+            with engine.begin() as connection:
+                existed = connection.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_search'"
+                ).first() is not None
+                for statement in AUDIT_SEARCH_DDL + RUN_SEARCH_DDL:
+                    connection.exec_driver_sql(statement)
+                if not existed:
+                    connection.exec_driver_sql("INSERT INTO audit_search(audit_search) VALUES ('rebuild')")
+        except Exception as e:
+            logger.warning(f"Full-text search is not available: {str(e)}")
+            return False
+        self.enabled = True
+        return True
+
+search_index = SearchIndex()
+
+def match_query(text: str) -> Optional[str]:
+    """
+    FTS5 query matching every term of a search string
+
+    Terms are quoted so punctuation in error messages and paths is not
+    parsed as query syntax; "quoted phrases" are kept together and a
+    trailing * matches a prefix. Returns None if there is nothing to search for.
+    """
+    terms = []
+    for term in _TERM.findall(text):
+        prefix = term.endswith("*") and not term.startswith('"')
+        term = term.rstrip("*") if prefix else term.strip('"')
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " AND ".join(terms) or None
+
+def snippet(index, column_index: int = -1):
+    """Best matching fragment of a row, with the matched terms marked"""
+    return func.snippet(literal_column(index.name), column_index, SNIPPET_OPEN, SNIPPET_CLOSE, "...", SNIPPET_TOKENS)
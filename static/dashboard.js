@@ -213,7 +213,18 @@ function loginWithToken() {
     showMainApp();
 }
 
-function logout() {
+async function logout() {
+    try {
+        // Call server logout endpoint
+        await fetch('/logout', {
+            method: 'POST',
+            headers: getAuthHeaders()
+        });
+    } catch (error) {
+        console.error('Logout error:', error);
+    }
+
+    // Clear client-side data
     authToken = null;
     localStorage.removeItem('authToken');
     stopAutoRefresh();
@@ -269,20 +280,147 @@ function resetSettings() {
     }
 }
 
-// Auto refresh functionality
-let autoRefreshInterval = null;
+// Live updates: one change feed per tab instead of polling every collection
+let changeEventSource = null;
+let fallbackRefreshInterval = null;
+
+// Client-side copies of the collections, kept current by the change feed
+const dashboardState = {
+    agents: new Map(),
+    scripts: new Map(),
+    tasks: new Map(),
+    logs: [],
+    // Server-side counts from /stats; the collections above only hold the first page
+    stats: null
+};
+let currentSection = 'dashboard';
+let statsReloadTimeout = null;
 
 function startAutoRefresh() {
-    stopAutoRefresh(); // Clear any existing interval
-    if (settings.autoRefresh) {
-        autoRefreshInterval = setInterval(refreshData, settings.refreshInterval * 1000);
+    stopAutoRefresh(); // Close any existing connection
+    if (!settings.autoRefresh) {
+        return;
     }
+
+    // EventSource cannot send headers, so the token goes in the query string
+    changeEventSource = new EventSource(`/events?token=${encodeURIComponent(authToken)}`);
+
+    // Resynchronise in full whenever the stream (re)connects or reports missed changes
+    changeEventSource.addEventListener('ready', () => {
+        stopFallbackRefresh();
+        refreshData();
+    });
+    changeEventSource.addEventListener('resync', refreshData);
+    changeEventSource.addEventListener('change', event => applyChange(JSON.parse(event.data)));
+
+    // Poll while the stream is down; the browser keeps trying to reconnect
+    changeEventSource.onerror = startFallbackRefresh;
 }
 
 function stopAutoRefresh() {
-    if (autoRefreshInterval) {
-        clearInterval(autoRefreshInterval);
-        autoRefreshInterval = null;
+    if (changeEventSource) {
+        changeEventSource.close();
+        changeEventSource = null;
+    }
+    stopFallbackRefresh();
+}
+
+function startFallbackRefresh() {
+    if (!fallbackRefreshInterval) {
+        fallbackRefreshInterval = setInterval(refreshData, settings.refreshInterval * 1000);
+    }
+}
+
+function stopFallbackRefresh() {
+    if (fallbackRefreshInterval) {
+        clearInterval(fallbackRefreshInterval);
+        fallbackRefreshInterval = null;
+    }
+}
+
+// Without the live feed, reload so a change made from this tab shows up
+function refreshIfNotLive() {
+    if (!changeEventSource || changeEventSource.readyState !== EventSource.OPEN) {
+        refreshData();
+    }
+}
+
+function applyChange(change) {
+    if (change.resource === 'audit') {
+        dashboardState.logs.unshift(change.data);
+        dashboardState.logs.length = Math.min(dashboardState.logs.length, settings.maxLogEntries);
+        if (currentSection === 'logs') {
+            displayLogs(dashboardState.logs);
+        }
+        return;
+    }
+
+    const collection = dashboardState[change.resource + 's'];
+    if (!collection) {
+        return;
+    }
+    scheduleStatsReload();
+    if (change.action === 'deleted') {
+        collection.delete(change.id);
+    } else {
+        collection.set(change.id, { ...collection.get(change.id), ...change.data });
+    }
+    renderState();
+}
+
+// Coalesce the counter reloads caused by bursts of changes
+function scheduleStatsReload() {
+    if (!statsReloadTimeout) {
+        statsReloadTimeout = setTimeout(() => {
+            statsReloadTimeout = null;
+            loadStats();
+        }, 1000);
+    }
+}
+
+async function loadStats() {
+    try {
+        const response = await fetch('/stats', { headers: getAuthHeaders() });
+        if (response.ok) {
+            dashboardState.stats = await response.json();
+            renderCounters();
+        }
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
+}
+
+function renderCounters() {
+    const stats = dashboardState.stats;
+    if (!stats) {
+        return;
+    }
+    document.getElementById('agents-count').textContent = stats.agents.total;
+    document.getElementById('scripts-count').textContent = stats.scripts;
+    document.getElementById('tasks-count').textContent = stats.tasks.total;
+    document.getElementById('running-tasks').textContent = stats.tasks.by_status.running || 0;
+}
+
+function setCollection(collection, items) {
+    collection.clear();
+    items.forEach(item => collection.set(item.id, item));
+}
+
+function renderState() {
+    const tasks = [...dashboardState.tasks.values()];
+    renderCounters();
+    displayRecentTasks(tasks.slice(0, 5));
+
+    switch(currentSection) {
+        case 'agents':
+            displayAgents([...dashboardState.agents.values()]);
+            break;
+        case 'scripts':
+            displayScripts([...dashboardState.scripts.values()]);
+            break;
+        case 'tasks':
+            displayTasks(tasks);
+            break;
     }
 }
 
@@ -351,6 +489,7 @@ function showSection(sectionName) {
         link.classList.remove('active');
     });
     document.querySelector(`[href="#${sectionName}"]`).classList.add('active');
+    currentSection = sectionName;
 
     // Load section data
     switch(sectionName) {
@@ -371,30 +510,32 @@ function showSection(sectionName) {
 
 async function refreshData() {
     try {
-        const [agentsRes, scriptsRes, tasksRes] = await Promise.all([
+        const [agentsRes, scriptsRes, tasksRes, statsRes] = await Promise.all([
             fetch('/agents/', { headers: getAuthHeaders() }),
             fetch('/scripts/', { headers: getAuthHeaders() }),
-            fetch('/tasks/', { headers: getAuthHeaders() })
+            fetch('/tasks/', { headers: getAuthHeaders() }),
+            fetch('/stats', { headers: getAuthHeaders() })
         ]);
 
+        if (statsRes.ok) {
+            dashboardState.stats = await statsRes.json();
+        }
+
         if (agentsRes.ok) {
-            const agents = await agentsRes.json();
-            document.getElementById('agents-count').textContent = agents.length;
+            setCollection(dashboardState.agents, await agentsRes.json());
         }
 
         if (scriptsRes.ok) {
-            const scripts = await scriptsRes.json();
-            document.getElementById('scripts-count').textContent = scripts.length;
+            setCollection(dashboardState.scripts, await scriptsRes.json());
         }
 
         if (tasksRes.ok) {
-            const tasks = await tasksRes.json();
-            document.getElementById('tasks-count').textContent = tasks.length;
-            const runningTasks = tasks.filter(t => t.status === 'running').length;
-            document.getElementById('running-tasks').textContent = runningTasks;
+            setCollection(dashboardState.tasks, await tasksRes.json());
+        }
 
-            // Show recent tasks
-            displayRecentTasks(tasks.slice(0, 5));
+        renderState();
+        if (currentSection === 'logs') {
+            loadLogs();
         }
     } catch (error) {
         console.error('Error refreshing data:', error);
@@ -427,6 +568,7 @@ async function loadAgents() {
         const response = await fetch('/agents/', { headers: getAuthHeaders() });
         if (response.ok) {
             const agents = await response.json();
+            setCollection(dashboardState.agents, agents);
             displayAgents(agents);
         }
     } catch (error) {
@@ -461,6 +603,7 @@ async function loadScripts() {
         const response = await fetch('/scripts/', { headers: getAuthHeaders() });
         if (response.ok) {
             const scripts = await response.json();
+            setCollection(dashboardState.scripts, scripts);
             displayScripts(scripts);
         }
     } catch (error) {
@@ -501,6 +644,7 @@ async function loadTasks() {
         const response = await fetch('/tasks/', { headers: getAuthHeaders() });
         if (response.ok) {
             const tasks = await response.json();
+            setCollection(dashboardState.tasks, tasks);
             displayTasks(tasks);
         }
     } catch (error) {
@@ -531,6 +675,9 @@ function displayTasks(tasks) {
                         <button class="btn btn-outline-primary" onclick="executeTask(${task.id})">
                             <i class="fas fa-play"></i> Run
                         </button>
+                        <button class="btn btn-outline-secondary" onclick="watchTask(${task.id})">
+                            <i class="fas fa-terminal"></i> Live Output
+                        </button>
                         <button class="btn btn-outline-danger" onclick="deleteTask(${task.id})">
                             <i class="fas fa-trash"></i> Delete
                         </button>
@@ -545,8 +692,8 @@ async function loadLogs() {
     try {
         const response = await fetch('/audit/', { headers: getAuthHeaders() });
         if (response.ok) {
-            const logs = await response.json();
-            displayLogs(logs);
+            dashboardState.logs = (await response.json()).slice(0, settings.maxLogEntries);
+            displayLogs(dashboardState.logs);
         }
     } catch (error) {
         console.error('Error loading logs:', error);
@@ -595,6 +742,7 @@ function getStatusColor(status) {
     switch(status) {
         case 'completed': return 'success';
         case 'running': return 'primary';
+        case 'queued': return 'info';
         case 'failed': return 'danger';
         case 'pending': return 'warning';
         default: return 'secondary';
@@ -605,6 +753,7 @@ function getStatusIcon(status) {
     switch(status) {
         case 'completed': return 'fa-check-circle';
         case 'running': return 'fa-play-circle';
+        case 'queued': return 'fa-hourglass-half';
         case 'failed': return 'fa-times-circle';
         case 'pending': return 'fa-clock';
         default: return 'fa-question-circle';
@@ -631,8 +780,7 @@ async function saveAgent() {
 
         if (response.ok) {
             bootstrap.Modal.getInstance(document.getElementById('agentModal')).hide();
-            loadAgents();
-            refreshData();
+            refreshIfNotLive();
         } else {
             alert('Error saving agent');
         }
@@ -662,8 +810,7 @@ async function saveScript() {
 
         if (response.ok) {
             bootstrap.Modal.getInstance(document.getElementById('scriptModal')).hide();
-            loadScripts();
-            refreshData();
+            refreshIfNotLive();
         } else {
             alert('Error saving script');
         }
@@ -695,8 +842,7 @@ async function saveTask() {
 
         if (response.ok) {
             bootstrap.Modal.getInstance(document.getElementById('taskModal')).hide();
-            loadTasks();
-            refreshData();
+            refreshIfNotLive();
         } else {
             alert('Error creating task');
         }
@@ -714,8 +860,11 @@ async function executeTask(taskId) {
         });
 
         if (response.ok) {
-            alert('Task execution started');
-            refreshData();
+            const data = await response.json();
+            alert(data.status === 'queued' ? 'Task queued for execution' : 'Task execution started');
+            refreshIfNotLive();
+        } else if (response.status === 429) {
+            alert('Execution queue is full, please try again shortly');
         } else {
             alert('Error executing task');
         }
@@ -729,6 +878,59 @@ function refreshLogs() {
     loadLogs();
 }
 
+// Live task output over Server-Sent Events
+let taskEventSource = null;
+
+function watchTask(taskId) {
+    stopWatchingTask();
+    const output = document.getElementById('taskLogOutput');
+    const statusBadge = document.getElementById('taskLogStatus');
+    output.textContent = '';
+    document.getElementById('taskLogTitle').textContent = `Task ${taskId} - Live Output`;
+
+    // EventSource cannot send headers, so the token goes in the query string
+    taskEventSource = new EventSource(`/tasks/${taskId}/events?token=${encodeURIComponent(authToken)}`);
+
+    taskEventSource.addEventListener('status', event => {
+        const data = JSON.parse(event.data);
+        statusBadge.className = `badge bg-${getStatusColor(data.status)}`;
+        statusBadge.innerHTML = `<i class="fas ${getStatusIcon(data.status)} me-1"></i>${data.status}`;
+        if (data.status === 'running') {
+            output.textContent = '';
+        }
+    });
+
+    taskEventSource.addEventListener('output', event => {
+        const data = JSON.parse(event.data);
+        const atBottom = output.scrollTop + output.clientHeight >= output.scrollHeight - 5;
+        const line = document.createElement('span');
+        if (data.stream === 'stderr') {
+            line.className = 'text-danger';
+        }
+        line.textContent = data.line + '\n';
+        output.appendChild(line);
+        if (atBottom) {
+            output.scrollTop = output.scrollHeight;
+        }
+    });
+
+    taskEventSource.onerror = () => {
+        statusBadge.className = 'badge bg-secondary';
+        statusBadge.textContent = 'reconnecting';
+    };
+
+    new bootstrap.Modal(document.getElementById('taskLogModal')).show();
+}
+
+function stopWatchingTask() {
+    if (taskEventSource) {
+        taskEventSource.close();
+        taskEventSource = null;
+    }
+}
+
+document.getElementById('taskLogModal').addEventListener('hidden.bs.modal', stopWatchingTask);
+
 // Load agents and scripts for task creation
 document.getElementById('taskModal').addEventListener('show.bs.modal', async function() {
     try {
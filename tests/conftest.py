@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import time, so point the app at a scratch directory first
+_directory = tempfile.mkdtemp(prefix="automa-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_directory}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["RUN_OUTPUT_DIR"] = os.path.join(_directory, "run_output")
+os.environ["BYTECODE_CACHE_DIR"] = os.path.join(_directory, "bytecode_cache")
+os.environ["AUDIT_ARCHIVE_DIR"] = os.path.join(_directory, "audit_archive")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["EXECUTOR_POOL_SIZE"] = "0"
+os.environ["EXECUTOR_CGROUPS"] = "off"
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client for the app; one for the session, as the async engine is bound to its event loop"""
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as test_client:
+        test_client.post("/register", json={"email": "test@example.com", "password": "test-password"})
+        token = test_client.post("/token", data={"username": "test@example.com", "password": "test-password"})
+        test_client.headers["Authorization"] = f"Bearer {token.json()['access_token']}"
+        yield test_client
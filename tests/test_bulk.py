@@ -0,0 +1,97 @@
+import pytest
+
+def agents(count: int, prefix: str = "agent") -> list:
+    return [{"name": f"{prefix} {i}", "description": "bulk test", "status": "active"} for i in range(count)]
+
+@pytest.fixture
+def agent_ids(client) -> list:
+    response = client.post("/agents/bulk", json=agents(3))
+    assert response.status_code == 200
+    return [agent["id"] for agent in response.json()]
+
+@pytest.fixture
+def script_id(client) -> int:
+    response = client.post("/scripts/bulk", json=[
+        {"name": "bulk script", "description": "bulk test", "content": "print('hi')\n", "filename": "bulk.py"}
+    ])
+    assert response.status_code == 200
+    return response.json()[0]["id"]
+
+def test_create_agents_keeps_the_order(client):
+    response = client.post("/agents/bulk", json=agents(5, "ordered"))
+    assert response.status_code == 200
+    created = response.json()
+    assert [agent["name"] for agent in created] == [f"ordered {i}" for i in range(5)]
+    assert [client.get(f"/agents/{agent['id']}").json()["name"] for agent in created] == [f"ordered {i}" for i in range(5)]
+
+@pytest.mark.parametrize("path", ["/agents/bulk", "/scripts/bulk", "/tasks/bulk"])
+def test_empty_batch_is_rejected(client, path):
+    assert client.post(path, json=[]).status_code == 422
+
+def test_update_agents(client, agent_ids):
+    response = client.put("/agents/bulk", json=[
+        {"id": agent_id, "name": f"renamed {agent_id}", "description": "updated", "status": "inactive"}
+        for agent_id in agent_ids
+    ])
+    assert response.status_code == 200
+    for agent_id in agent_ids:
+        assert client.get(f"/agents/{agent_id}").json()["name"] == f"renamed {agent_id}"
+
+def test_update_with_an_unknown_id_changes_nothing(client, agent_ids):
+    response = client.put("/agents/bulk", json=[
+        {"id": agent_ids[0], "name": "should not stick", "description": "", "status": "active"},
+        {"id": 999999, "name": "missing", "description": "", "status": "active"},
+    ])
+    assert response.status_code == 404
+    assert response.json()["detail"]["ids"] == [999999]
+    assert client.get(f"/agents/{agent_ids[0]}").json()["name"] != "should not stick"
+
+def test_duplicate_ids_are_rejected(client, agent_ids):
+    response = client.post("/agents/bulk/delete", json={"ids": [agent_ids[0], agent_ids[0]]})
+    assert response.status_code == 422
+    assert response.json()["detail"]["ids"] == [agent_ids[0]]
+
+def test_delete_agents(client, agent_ids):
+    response = client.post("/agents/bulk/delete", json={"ids": agent_ids[:2]})
+    assert response.status_code == 200
+    assert sorted(response.json()["deleted"]) == sorted(agent_ids[:2])
+    assert client.get(f"/agents/{agent_ids[0]}").status_code == 404
+    assert client.get(f"/agents/{agent_ids[2]}").status_code == 200
+
+def test_delete_with_an_unknown_id_deletes_nothing(client, agent_ids):
+    response = client.post("/agents/bulk/delete", json={"ids": [agent_ids[0], 999999]})
+    assert response.status_code == 404
+    assert client.get(f"/agents/{agent_ids[0]}").status_code == 200
+
+def test_create_tasks_schedules_them(client, agent_ids, script_id):
+    response = client.post("/tasks/bulk", json=[
+        {"name": "hourly", "description": "", "script_id": script_id, "agent_id": agent_ids[0], "interval_seconds": 3600},
+        {"name": "manual", "description": "", "script_id": script_id, "agent_id": agent_ids[1]},
+    ])
+    assert response.status_code == 200
+    hourly, manual = response.json()
+    assert client.get(f"/tasks/{hourly['id']}/schedule").json()["next_run_time"] is not None
+    assert client.get(f"/tasks/{manual['id']}/schedule").json()["next_run_time"] is None
+
+    response = client.post("/tasks/bulk/delete", json={"ids": [hourly["id"], manual["id"]]})
+    assert response.status_code == 200
+    assert client.get(f"/tasks/{hourly['id']}").status_code == 404
+
+def test_create_tasks_with_an_unknown_reference_creates_nothing(client, agent_ids, script_id):
+    before = len(client.get("/tasks/", params={"limit": 1000}).json())
+    response = client.post("/tasks/bulk", json=[
+        {"name": "valid", "description": "", "script_id": script_id, "agent_id": agent_ids[0]},
+        {"name": "invalid", "description": "", "script_id": script_id, "agent_id": 999999},
+    ])
+    assert response.status_code == 422
+    assert response.json()["detail"] == {"message": "Agent not found", "ids": [999999]}
+    assert len(client.get("/tasks/", params={"limit": 1000}).json()) == before
+
+def test_update_and_delete_scripts(client, script_id):
+    response = client.put("/scripts/bulk", json=[
+        {"id": script_id, "name": "bulk script", "description": "updated", "content": "print('bye')\n", "filename": "bulk.py"}
+    ])
+    assert response.status_code == 200
+    assert client.get(f"/scripts/{script_id}").json()["content"] == "print('bye')\n"
+    assert client.post("/scripts/bulk/delete", json={"ids": [script_id]}).json() == {"deleted": [script_id]}
+    assert client.get(f"/scripts/{script_id}").status_code == 404
@@ -0,0 +1,36 @@
+import pytest
+from starlette.requests import Request
+
+from conditional import etag_matches, make_etag, not_modified
+
+def request_with(if_none_match=None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+def test_etag_depends_on_every_part():
+    etag = make_etag(1, "2024-01-01T00:00:00")
+    assert etag == make_etag(1, "2024-01-01T00:00:00")
+    assert etag != make_etag(1, "2024-01-01T00:00:01")
+    assert etag != make_etag(2, "2024-01-01T00:00:00")
+    assert etag.startswith('"') and etag.endswith('"')
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ("{etag}", True),
+    ("W/{etag}", True),
+    ('"other", {etag}', True),
+    ('"other", W/"another"', False),
+])
+def test_if_none_match(header, matches):
+    etag = make_etag("script", 7)
+    if header is not None:
+        header = header.format(etag=etag)
+    assert etag_matches(request_with(header), etag) is matches
+
+def test_not_modified_keeps_the_etag():
+    etag = make_etag("script", 7)
+    response = not_modified(etag)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from execution_engine import EngineBusyError, ExecutionEngine
+
+def run_two(engine: ExecutionEngine) -> list:
+    """Two runs on a fresh event loop; the second waits for the first's slot"""
+    async def run_one(admission):
+        async with admission:
+            return await admission.run(sum, [1, 2, 3])
+
+    async def main():
+        return await asyncio.gather(run_one(engine.admit(1)), run_one(engine.admit(1)))
+
+    return asyncio.run(main())
+
+def test_engine_restarts_after_shutdown():
+    engine = ExecutionEngine(workers=1, queue_size=2, per_agent_limit=1)
+    for _ in range(2):
+        engine.start()
+        assert run_two(engine) == [6, 6]
+        engine.shutdown()
+    assert engine.stats()["completed_total"] == 4
+
+def test_full_queue_rejects():
+    engine = ExecutionEngine(workers=1, queue_size=1, per_agent_limit=1)
+    engine.admit(1)
+    assert not engine.has_capacity(1)
+    with pytest.raises(EngineBusyError):
+        engine.admit(2)
+    assert engine.stats()["rejected_total"] == 1
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from executor import ScriptExecutor
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="the worker pool needs fork()")
+
+@pytest.fixture
+def executor(tmp_path):
+    executor = ScriptExecutor(timeout=2, pool_size=1, pool_max_runs=50, bytecode_cache_dir=str(tmp_path / "cache"))
+    executor.start_pool()
+    yield executor
+    executor.stop_pool()
+
+def test_runs_in_a_pool_worker(executor):
+    result = executor.execute_script("print('hello')\n", "hello.py")
+    assert result["success"]
+    assert result["output"] == "hello\n"
+    assert executor._pool._total == 1
+
+def test_runs_do_not_see_each_other(executor):
+    leaky = (
+        "import builtins, json, os, threading, time\n"
+        "builtins.SECRET = 'leaked'\n"
+        "os.environ['LEAKED'] = '1'\n"
+        "json.LEAKED = True\n"
+        "def chatter():\n"
+        "    while True:\n"
+        "        print('chatter', flush=True)\n"
+        "        time.sleep(0.01)\n"
+        "threading.Thread(target=chatter, daemon=True).start()\n"
+    )
+    assert executor.execute_script(leaky, "leaky.py")["success"]
+    result = executor.execute_script(
+        "import builtins, json, os, time\n"
+        "time.sleep(0.1)\n"
+        "print(getattr(builtins, 'SECRET', None), os.environ.get('LEAKED'), getattr(json, 'LEAKED', None))\n",
+        "check.py"
+    )
+    assert result["output"] == "None None None\n"
+
+def test_background_processes_are_killed(executor, tmp_path):
+    marker = tmp_path / "marker"
+    script = f"import subprocess\nsubprocess.Popen(['sh', '-c', 'sleep 0.3; touch {marker}'])\n"
+    assert executor.execute_script(script, "spawn.py")["success"]
+    time.sleep(0.6)
+    assert not marker.exists()
+
+def test_timeout_replaces_the_worker(executor):
+    result = executor.execute_script("while True:\n    pass\n", "loop.py")
+    assert result["return_code"] == -1
+    assert "timed out" in result["error"]
+    assert executor.execute_script("print('next')\n", "next.py")["output"] == "next\n"
+
+@pytest.mark.parametrize("script, return_code", [
+    ("import sys\nsys.exit(3)\n", 3),
+    ("raise RuntimeError('boom')\n", 1),
+    ("x = (\n", 1),
+])
+def test_return_codes(executor, script, return_code):
+    result = executor.execute_script(script, "fail.py")
+    assert result["return_code"] == return_code
+    assert not result["success"]
+
+def test_output_streams_while_running(executor):
+    lines = []
+
+    def on_output(stream, line):
+        lines.append((stream, line, time.monotonic()))
+
+    script = "import sys, time\nprint('first')\ntime.sleep(0.5)\nprint('oops', file=sys.stderr)\n"
+    result = executor.execute_script(script, "stream.py", on_output=on_output)
+    finished = time.monotonic()
+    assert [(stream, line.rstrip("\n")) for stream, line, _ in lines] == [("stdout", "first"), ("stderr", "oops")]
+    # Unbuffered: the first line arrives before the script sleeps, not when it exits
+    assert finished - lines[0][2] >= 0.4
+    assert result["output"] == "first\n"
+    assert result["error"] == "oops\n"
+
+def test_cached_code_runs_without_the_source(executor):
+    source = "print('cached')\n"
+    content_hash = hashlib.sha256(source.encode()).hexdigest()
+    loads = []
+
+    def load_source():
+        loads.append(content_hash)
+        return source
+
+    for _ in range(2):
+        result = executor.execute_script(None, "cached.py", content_hash=content_hash, load_source=load_source)
+        assert result["output"] == "cached\n"
+    assert len(loads) == 1
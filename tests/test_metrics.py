@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from metrics import Histogram, instrument_module
+
+def make_module(histogram: Histogram) -> dict:
+    namespace = {"__name__": "fake_crud"}
+    exec(
+        "def get_item(item_id):\n"
+        "    return {'id': item_id}\n"
+        "def update_item(item_id):\n"
+        "    return get_item(item_id)\n"
+        "async def get_row(row_id):\n"
+        "    return row_id\n"
+        "async def update_row(row_id):\n"
+        "    return await get_row(row_id)\n",
+        namespace
+    )
+    instrument_module(namespace, histogram)
+    return namespace
+
+def count(histogram: Histogram, name: str) -> int:
+    return sum(histogram.labels("fake_crud", name)._shards.totals()[:-1])
+
+def test_nested_calls_are_observed_once():
+    histogram = Histogram("test_nested_seconds", "test", ["module", "function"])
+    module = make_module(histogram)
+    module["update_item"](1)
+    module["get_item"](1)
+    asyncio.run(module["update_row"](1))
+    assert count(histogram, "update_item") == 1
+    assert count(histogram, "get_item") == 1
+    assert count(histogram, "update_row") == 1
+    assert count(histogram, "get_row") == 0
+
+def test_threads_fold_into_the_totals():
+    histogram = Histogram("test_threads_seconds", "test")
+    threads = [threading.Thread(target=histogram.observe, args=(0.01,)) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    totals = histogram.labels()._shards.totals()
+    assert sum(totals[:-1]) == 50
+    assert len(histogram.labels()._shards._arrays) <= 1
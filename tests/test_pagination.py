@@ -0,0 +1,29 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, set_next_cursor
+
+def test_cursor_round_trip():
+    created = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    cursor = encode_cursor(created, 42)
+    assert decode_cursor(cursor, (datetime, int)) == (created, 42)
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", encode_cursor(1), encode_cursor("x", 2)])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, (datetime, int))
+    assert error.value.status_code == 400
+
+def test_next_cursor_points_after_a_full_page():
+    rows = [SimpleNamespace(id=i) for i in (3, 2, 1)]
+    response = Response()
+    set_next_cursor(response, rows, 3, "id")
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], (int,)) == (1,)
+
+def test_no_next_cursor_on_a_short_page():
+    response = Response()
+    set_next_cursor(response, [SimpleNamespace(id=1)], 3, "id")
+    assert NEXT_CURSOR_HEADER not in response.headers
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from schedules import build_trigger, crontab_trigger, next_fire_times
+
+NOW = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)  # a Monday
+
+def test_build_trigger_kinds():
+    assert build_trigger() is None
+    assert isinstance(build_trigger(scheduled_time=NOW), DateTrigger)
+    assert isinstance(build_trigger(interval_seconds=60), IntervalTrigger)
+    assert isinstance(build_trigger(scheduled_time=NOW, cron_expression="0 * * * *"), CronTrigger)
+
+@pytest.mark.parametrize("field, weekdays", [
+    ("0", {6}),
+    ("7", {6}),
+    ("1-5", {0, 1, 2, 3, 4}),
+    ("0-2", {6, 0, 1}),
+    ("5,6,0", {4, 5, 6}),
+])
+def test_crontab_day_of_week_counts_from_sunday(field, weekdays):
+    trigger = crontab_trigger(f"0 9 * * {field}")
+    assert {fire_time.weekday() for fire_time in next_fire_times(trigger, 14, now=NOW)} == weekdays
+
+@pytest.mark.parametrize("expression", ["* * * *", "0 9 * * 8", "61 * * * *"])
+def test_invalid_crontab_raises_value_error(expression):
+    with pytest.raises(ValueError):
+        crontab_trigger(expression)
+
+def test_cron_fire_times():
+    trigger = build_trigger(cron_expression="30 */6 * * *")
+    assert next_fire_times(trigger, 3, now=NOW) == [
+        NOW.replace(hour=12, minute=30), NOW.replace(hour=18, minute=30), NOW.replace(day=2, hour=0, minute=30)
+    ]
+
+def test_one_shot_in_the_past_has_no_fire_times():
+    assert next_fire_times(build_trigger(scheduled_time=NOW - timedelta(hours=1)), 5, now=NOW) == []
+    assert next_fire_times(build_trigger(scheduled_time=NOW + timedelta(hours=1)), 5, now=NOW) == [NOW + timedelta(hours=1)]
+
+def test_preview_leaves_out_jitter():
+    trigger = build_trigger(scheduled_time=NOW, interval_seconds=60, jitter_seconds=30)
+    assert next_fire_times(trigger, 3, now=NOW) == [NOW + timedelta(seconds=60 * i) for i in range(3)]
+    assert trigger.jitter == 30
+
+def test_preview_follows_on_from_the_next_run_time():
+    # Without a start date the trigger anchors at `now`, unlike the job created earlier
+    trigger = build_trigger(interval_seconds=3600)
+    next_run_time = NOW + timedelta(minutes=10)
+    assert next_fire_times(trigger, 3, now=NOW, next_run_time=next_run_time) == [
+        next_run_time, next_run_time + timedelta(hours=1), next_run_time + timedelta(hours=2)
+    ]
+
+@pytest.mark.parametrize("field, weekdays", [
+    ("*/2", {6, 1, 3, 5}),
+    ("1-5/2", {0, 2, 4}),
+    ("3/2", {2, 4}),
+    ("*/3,1", {6, 2, 5, 0}),
+])
+def test_crontab_day_of_week_steps_count_from_sunday(field, weekdays):
+    trigger = crontab_trigger(f"0 0 * * {field}")
+    assert {fire_time.weekday() for fire_time in next_fire_times(trigger, 14, now=NOW)} == weekdays
+
+@pytest.mark.parametrize("field", ["*/0", "mon-fri/2", "1-9/2"])
+def test_invalid_day_of_week_step_raises_value_error(field):
+    with pytest.raises(ValueError):
+        crontab_trigger(f"0 0 * * {field}")
@@ -0,0 +1,20 @@
+from script_validator import validate_script
+
+def test_dangerous_calls_are_reported():
+    result = validate_script("import subprocess\nsubprocess.run(['ls'])\n")
+    assert result["valid"]
+    assert any("subprocess" in warning for warning in result["warnings"])
+
+def test_syntax_errors_make_the_script_invalid():
+    result = validate_script("x = (\n")
+    assert not result["valid"]
+    assert result["errors"]
+
+def test_callers_cannot_change_the_cached_result():
+    source = "eval('1 + 1')\n"
+    first = validate_script(source)
+    first["warnings"].append("added by a caller")
+    first["errors"].append("added by a caller")
+    second = validate_script(source)
+    assert "added by a caller" not in second["warnings"]
+    assert second["errors"] == []